@@ -0,0 +1,91 @@
+"""
+Benchmark of ReferencesBibExtractor.extract with a fake LLM (fixed latency, a fraction of malformed
+responses), comparing serial batches with concurrent batches. The DOI pre-pass and the heuristic
+splitter are disabled, so every entry goes to the LLM. All runs must extract the same references,
+in the same order.
+
+Usage:
+    python benchmarks/bench_bib_extract.py [--refs 2000] [--workers 1 8 32] [--latency-ms 500] [--rpm 600] [--malformed-rate 0.1]
+"""
+import argparse
+import json
+import random
+import threading
+from time import perf_counter, sleep
+
+from langchain_core.messages import AIMessage
+
+from aisurveywriter.res_extract.reference_extract import ReferencesBibExtractor
+
+class FakeLLM:
+    """
+    Stands for LLMHandler: answers with one reference per line of the batch
+    """
+    name = "fake-llm"
+
+    def __init__(self, latency_ms: float, malformed_rate: float, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def bind_prompt(self, prompt):
+        return self
+
+    def invoke(self, input_variables: dict) -> AIMessage:
+        with self._lock:
+            self.requests += 1
+            malformed = self._rng.random() < self.malformed_rate
+        sleep(self.latency)
+        if malformed:
+            return AIMessage(content='{"bibliography": [{"title": "truncated')
+        lines = [line for line in input_variables["references"].splitlines() if line.strip()]
+        bibliography = [{"title": line.split(". ", 1)[-1], "authors": line.split(". ", 1)[0]} for line in lines]
+        return AIMessage(content=json.dumps({"bibliography": bibliography}))
+
+class FakeStore:
+    def __init__(self, sections: list[str]):
+        self.sections = sections
+
+    def bibliography_sections(self) -> list[str]:
+        return self.sections
+
+def synthetic_sections(n_refs: int, refs_per_paper: int = 50) -> list[str]:
+    sections = []
+    for start in range(0, n_refs, refs_per_paper):
+        entries = [f"[{i + 1}] Doe{start + i}, J. Study number {start + i} of layout analysis. J. Doc. 2020, {i}, 1-10."
+                   for i in range(min(refs_per_paper, n_refs - start))]
+        sections.append("References\n" + "\n".join(entries))
+    return sections
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refs", type=int, default=2000, help="References in total (50 per paper)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--rpm", type=float, default=600, help="Requests per minute of the concurrent runs")
+    parser.add_argument("--malformed-rate", type=float, default=0.1)
+    parser.add_argument("--output-tokens", type=int, default=1024, help="Output token budget per request")
+    args = parser.parse_args()
+
+    store = FakeStore(synthetic_sections(args.refs))
+    baseline = None
+    print(f"{'workers':>7} | {'time (s)':>8} | {'requests':>8} | {'refs':>6}")
+    for workers in args.workers:
+        llm = FakeLLM(args.latency_ms, args.malformed_rate)
+        extractor = ReferencesBibExtractor(llm, store, request_cooldown_sec=0, doi_prepass=False, heuristic_split=False,
+                                           output_token_budget=args.output_tokens, max_workers=workers, requests_per_minute=args.rpm,
+                                           parse_retries=5)
+        start = perf_counter()
+        bib_info = extractor.extract()
+        elapsed = perf_counter() - start
+
+        titles = [ref.title for ref in bib_info]
+        if baseline is None:
+            baseline = titles
+        assert titles == baseline, f"references differ from the first run with {workers} workers"
+        print(f"{workers:>7} | {elapsed:>8.2f} | {llm.requests:>8} | {len(bib_info):>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark of ReferencesBibExtractor.to_bibtex_db against the local fake CrossRef server,
+comparing serial resolution (1 worker) with concurrent resolution. Both must produce the
+same entries, in the same order, after duplicate filtering.
+
+The bibliography cache is disabled, so every reference goes to the server.
+
+References repeat earlier ones (--duplicate-rate), half of them with small title variations,
+and are collapsed into unique works before resolution.
+
+Usage:
+    python benchmarks/bench_crossref_resolve.py [--refs 200] [--workers 1 8 16] [--mode works] [--latency-ms 100] [--error-rate 0.02] [--duplicate-rate 0.4]
+"""
+import argparse
+import random
+from time import perf_counter
+
+from fake_crossref_server import FakeCrossrefServer
+
+from aisurveywriter.utils.bib_cache import BibCacheSettings, configure_bib_cache
+from aisurveywriter.utils.crossref import CrossrefSettings, configure_crossref
+from aisurveywriter.res_extract.reference_extract import ReferencesBibExtractor, BibliographyInfo
+
+WORDS = ("layout model detection survey neural network document analysis text recognition learning graph "
+         "molecule catalysis synthesis polymer spectroscopy transformer attention segmentation retrieval").split()
+
+def title_variant(title: str, rng: random.Random) -> str:
+    """
+    The same title as extracted from another paper: different case, punctuation or a word hyphenated across lines
+    """
+    match rng.randrange(3):
+        case 0:
+            return title.upper()
+        case 1:
+            return title + "."
+        case _:
+            words = title.split()
+            k = rng.randrange(len(words))
+            words[k] = words[k][:len(words[k]) // 2] + "- " + words[k][len(words[k]) // 2:]
+            return " ".join(words)
+
+def synthetic_references(n: int, rng: random.Random, duplicate_rate: float) -> list[BibliographyInfo]:
+    refs = []
+    for i in range(n):
+        if refs and rng.random() < duplicate_rate:
+            # duplicated reference, cited in different papers
+            ref = rng.choice(refs).model_copy()
+            if rng.random() < 0.5:
+                ref.title = title_variant(ref.title, rng)
+            refs.append(ref)
+            continue
+        title = " ".join(rng.choice(WORDS) for _ in range(6)) + f" {i}"
+        if rng.random() < 0.05:
+            title = "unresolvable " + title
+        refs.append(BibliographyInfo(title=title, authors="Doe, J.; Roe, R."))
+    return refs
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refs", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--rps", type=float, default=50.0, help="Client rate limit (requests per second)")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--duplicate-rate", type=float, default=0.4, help="Fraction of references citing an earlier work again")
+    parser.add_argument("--mode", choices=["works", "negotiation"], default="negotiation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configure_bib_cache(BibCacheSettings(cache_dir=None))
+    refs = synthetic_references(args.refs, random.Random(args.seed), args.duplicate_rate)
+
+    # to_bibtex_db only needs the resolver, not the LLM used by extract()
+    extractor = ReferencesBibExtractor.__new__(ReferencesBibExtractor)
+    extractor._doi_entries = {}
+
+    baseline = None
+    with FakeCrossrefServer(latency_ms=args.latency_ms, error_rate=args.error_rate, seed=args.seed) as server:
+        print(f"{'workers':>7} | {'time (s)':>8} | {'refs/s':>7} | {'entries':>7} | {'requests':>8}")
+        for workers in args.workers:
+            configure_crossref(CrossrefSettings(max_workers=workers, requests_per_second=args.rps, backoff_base_sec=0.2, mode=args.mode,
+                                                crossref_url=server.url, doi_url=f"{server.url}/doi"))
+            requests_before = server.request_count
+            start = perf_counter()
+            bibtex_db = extractor.to_bibtex_db(refs)
+            elapsed = perf_counter() - start
+
+            titles = [(entry["ID"], entry.get("title")) for entry in bibtex_db.entries]
+            if baseline is None:
+                baseline = titles
+            assert titles == baseline, f"entries differ from the first run with {workers} workers"
+            print(f"{workers:>7} | {elapsed:>8.2f} | {len(refs) / elapsed:>7.1f} | {len(bibtex_db.entries):>7} | {server.request_count - requests_before:>8}")
+
+if __name__ == "__main__":
+    main()
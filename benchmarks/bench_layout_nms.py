@@ -0,0 +1,117 @@
+"""
+Micro-benchmark of the vectorized layout_nms / suppress_overlapping_blocks against
+the original pairwise implementation (KDTree neighbours + blocks_iou per pair).
+
+The original loop visited each block's KDTree neighbours in whatever order query_ball_point
+returned them, so which duplicate survives could depend on that order. The reference below
+visits neighbours in index order, like layout_nms, and both are checked to keep the same blocks.
+
+Usage:
+    python benchmarks/bench_layout_nms.py [--sizes 20 100 500] [--repeat 20]
+"""
+import argparse
+from time import perf_counter
+
+import numpy as np
+import layoutparser as lp
+from scipy.spatial import KDTree
+
+from aisurveywriter.core.pdf_processor import blocks_iou, layout_nms, suppress_overlapping_blocks
+
+def reference_layout_nms(blocks, iou_threshold: float = 0.8, neighbors_radius: float = 1.5) -> lp.Layout:
+    if not blocks:
+        return blocks
+
+    centers = np.array([[(b.coordinates[0] + b.coordinates[2]) / 2,
+                        (b.coordinates[1] + b.coordinates[3]) / 2] for b in blocks])
+    blocks_kdtree = KDTree(centers)
+
+    avg_width = np.mean([b.coordinates[2] - b.coordinates[0] for b in blocks])
+    avg_height = np.mean([b.coordinates[3] - b.coordinates[1] for b in blocks])
+    search_radius = max(avg_width, avg_height) * neighbors_radius
+
+    blocks_to_remove = set()
+    for i, block in enumerate(blocks):
+        if i in blocks_to_remove:
+            continue
+
+        # sorted: query_ball_point gives no ordering guarantee
+        neighbor_indices = sorted(blocks_kdtree.query_ball_point(centers[i], search_radius))
+        for j in neighbor_indices:
+            if i == j or j in blocks_to_remove or block.type != blocks[j].type:
+                continue
+
+            if blocks_iou(blocks[i], blocks[j]) < iou_threshold:
+                continue
+
+            area_i = (block.coordinates[2] - block.coordinates[0]) * (block.coordinates[3] - block.coordinates[1])
+            area_j = (blocks[j].coordinates[2] - blocks[j].coordinates[0]) * (blocks[j].coordinates[3] - blocks[j].coordinates[1])
+            if area_i < area_j:
+                blocks_to_remove.add(i)
+                break
+            else:
+                blocks_to_remove.add(j)
+
+    return lp.Layout([b for i, b in enumerate(blocks) if i not in blocks_to_remove])
+
+def reference_suppress(text_blocks, figure_blocks, iou_threshold: float = 0.8) -> lp.Layout:
+    return lp.Layout([b for b in text_blocks if not any(blocks_iou(b, b_fig) > iou_threshold for b_fig in figure_blocks)])
+
+def synthetic_page_blocks(n: int, rng: np.random.Generator, page_width: int = 1700, page_height: int = 2200) -> lp.Layout:
+    """
+    Random blocks on a page, where about a third of them are slightly jittered
+    duplicates of other blocks (like the ones Detectron2 outputs on dense pages)
+    """
+    blocks = []
+    n_unique = max(1, n - n // 3)
+    for _ in range(n_unique):
+        x1 = rng.uniform(0, page_width - 200)
+        y1 = rng.uniform(0, page_height - 60)
+        w, h = rng.uniform(100, 700), rng.uniform(20, 200)
+        block_type = rng.choice(["Text", "Title", "List", "Figure"], p=[0.7, 0.1, 0.1, 0.1])
+        blocks.append(lp.TextBlock(lp.Rectangle(x1, y1, min(x1 + w, page_width), min(y1 + h, page_height)), type=block_type))
+
+    for _ in range(n - n_unique):
+        src = blocks[rng.integers(0, n_unique)]
+        x1, y1, x2, y2 = src.coordinates
+        jitter = rng.uniform(-4, 4, size=4)
+        blocks.append(lp.TextBlock(lp.Rectangle(x1 + jitter[0], y1 + jitter[1], x2 + jitter[2], y2 + jitter[3]), type=src.type))
+
+    order = rng.permutation(len(blocks))
+    return lp.Layout([blocks[i] for i in order])
+
+def best_time(func, repeat: int, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        func(*args)
+        best = min(best, perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 300, 500], help="Number of blocks per page")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions per measurement (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'blocks':>7} | {'nms ref (ms)':>12} | {'nms vec (ms)':>12} | {'speedup':>7} | {'supp ref (ms)':>13} | {'supp vec (ms)':>13} | {'speedup':>7}")
+    for n in args.sizes:
+        blocks = synthetic_page_blocks(n, rng)
+        text_blocks = lp.Layout([b for b in blocks if b.type != "Figure"])
+        figure_blocks = lp.Layout([b for b in blocks if b.type == "Figure"])
+
+        # same blocks as the pairwise baseline visiting neighbours in index order
+        assert [id(b) for b in reference_layout_nms(blocks)] == [id(b) for b in layout_nms(blocks)]
+        assert [id(b) for b in reference_suppress(text_blocks, figure_blocks)] == [id(b) for b in suppress_overlapping_blocks(text_blocks, figure_blocks)]
+
+        nms_ref = best_time(reference_layout_nms, args.repeat, blocks)
+        nms_vec = best_time(layout_nms, args.repeat, blocks)
+        supp_ref = best_time(reference_suppress, args.repeat, text_blocks, figure_blocks)
+        supp_vec = best_time(suppress_overlapping_blocks, args.repeat, text_blocks, figure_blocks)
+        print(f"{n:>7} | {nms_ref*1e3:>12.3f} | {nms_vec*1e3:>12.3f} | {nms_ref/nms_vec:>6.1f}x | "
+              f"{supp_ref*1e3:>13.3f} | {supp_vec*1e3:>13.3f} | {supp_ref/supp_vec:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
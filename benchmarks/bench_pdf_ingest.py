@@ -0,0 +1,182 @@
+"""
+Offline benchmark of the PDF ingestion path (PDFProcessor and ReferenceStore.create_store).
+
+Generates synthetic two-column articles (title, authors, text, figures with captions and a
+bibliography section) and parses them in every requested mode, reporting pages per second,
+peak memory and the per-stage cost per page. The bibtex lookup is replaced by a stub, so
+nothing is requested over the network; the layout model weights must already be in the
+model cache directory and tesseract must be installed.
+
+Each mode runs in a fresh process, so its peak RSS is not affected by the previous modes.
+
+Usage:
+    python benchmarks/bench_pdf_ingest.py [--docs 4] [--pages 8] [--workers 1 2 4] [--store]
+"""
+import argparse
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from time import perf_counter
+
+import numpy as np
+import pymupdf
+from PIL import Image, ImageDraw
+
+import aisurveywriter.core.pdf_processor as pdf_processor
+from aisurveywriter.core.lp_handler import LayoutParserSettings
+from aisurveywriter.core.parse_stats import PARSE_STAGES, ParseStats
+from aisurveywriter.store.reference_store import ReferenceStore
+
+def stub_bibtex_entry(title, cache=None):
+    return {"ENTRYTYPE": "article", "ID": "stub", "title": title or "", "author": "Doe, Jane and Roe, Richard", "year": "2024"}
+
+# replaced at import time, so spawned processes (which import this script as __mp_main__) use the stub too
+pdf_processor.get_bibtex_entry = stub_bibtex_entry
+
+WORDS = ("layout model detection survey figure results method dataset neural network training "
+         "document analysis page block text recognition accuracy performance evaluation baseline "
+         "approach proposed experiments table section paper image caption reference large language").split()
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN, GUTTER = 50, 20
+FONT_SIZE = 9
+
+def random_text(rng: np.random.Generator, n_words: int) -> str:
+    words = rng.choice(WORDS, size=n_words)
+    return (" ".join(words) + ".").capitalize()
+
+def random_figure_png(rng: np.random.Generator, width: int = 600, height: int = 400) -> bytes:
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    n_bars = int(rng.integers(4, 10))
+    bar_width = width // (n_bars * 2)
+    for i in range(n_bars):
+        bar_height = int(rng.integers(height // 5, height - 20))
+        color = tuple(int(c) for c in rng.integers(0, 200, size=3))
+        x = bar_width // 2 + i * 2 * bar_width
+        draw.rectangle([x, height - bar_height, x + bar_width, height - 10], fill=color)
+    draw.line([5, height - 10, width - 5, height - 10], fill="black", width=3)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def make_article_pdf(path: str, pages: int, rng: np.random.Generator, figure_every: int = 2, bib_entries: int = 30):
+    """
+    Write a synthetic two-column article: title and authors on the first page, text paragraphs,
+    a captioned figure every "figure_every" pages and a bibliography section on the last page
+    """
+    doc = pymupdf.open()
+    column_width = (PAGE_WIDTH - 2 * MARGIN - GUTTER) / 2
+    columns = [MARGIN, MARGIN + column_width + GUTTER]
+    figure_id = 1
+
+    for page_num in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        top = MARGIN
+        if page_num == 0:
+            page.insert_textbox(pymupdf.Rect(MARGIN, top, PAGE_WIDTH - MARGIN, top + 50), random_text(rng, 6).title(),
+                                fontsize=18, fontname="hebo", align=pymupdf.TEXT_ALIGN_CENTER)
+            page.insert_textbox(pymupdf.Rect(MARGIN, top + 55, PAGE_WIDTH - MARGIN, top + 75), "Jane Doe, Richard Roe, Alex Smith",
+                                fontsize=11, align=pymupdf.TEXT_ALIGN_CENTER)
+            top += 100
+
+        is_last = page_num == pages - 1
+        for column_i, x in enumerate(columns):
+            y = top
+            # bibliography fills the right column of the last page
+            if is_last and column_i == 1:
+                page.insert_textbox(pymupdf.Rect(x, y, x + column_width, y + 25), "References", fontsize=12, fontname="hebo")
+                y += 30
+                for ref_i in range(bib_entries):
+                    entry = f"[{ref_i+1}] J. Doe, R. Roe. {random_text(rng, 8)} Journal of {rng.choice(WORDS).title()}, {int(rng.integers(1, 40))}, {int(rng.integers(1990, 2025))}."
+                    if y + 30 > PAGE_HEIGHT - MARGIN:
+                        break
+                    page.insert_textbox(pymupdf.Rect(x, y, x + column_width, y + 30), entry, fontsize=7)
+                    y += 30
+                continue
+
+            if column_i == 0 and page_num % figure_every == 0:
+                figure_rect = pymupdf.Rect(x, y, x + column_width, y + column_width * 2 / 3)
+                page.insert_image(figure_rect, stream=random_figure_png(rng))
+                y = figure_rect.y1 + 8
+                caption = f"Figure {figure_id}. {random_text(rng, 15)}"
+                page.insert_textbox(pymupdf.Rect(x, y, x + column_width, y + 40), caption, fontsize=8)
+                figure_id += 1
+                y += 50
+
+            while y + 90 < PAGE_HEIGHT - MARGIN:
+                page.insert_textbox(pymupdf.Rect(x, y, x + column_width, y + 80), random_text(rng, 32), fontsize=FONT_SIZE)
+                y += 90
+
+    doc.save(path)
+    doc.close()
+
+def run_mode(pdf_paths: list[str], lp_settings: LayoutParserSettings, images_dir: str, store: bool) -> dict:
+    """
+    Parse all PDFs once with lp_settings (in a fresh process). Returns the parse stats,
+    and the create_store wall time if "store" is set
+    """
+    processor = pdf_processor.PDFProcessor(pdf_paths, lp_settings, images_dir, parse_on_init=False)
+    processor.parse_pdfs()
+    result = {"parse_stats": processor.parse_stats.model_dump(), "store_sec": None}
+
+    if store:
+        start = perf_counter()
+        ReferenceStore.create_store(pdf_paths, lp_settings, images_dir)
+        result["store_sec"] = perf_counter() - start
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=4, help="Number of synthetic PDFs")
+    parser.add_argument("--pages", type=int, default=8, help="Pages per PDF")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2], help="Parse worker counts to measure (1 = serial)")
+    parser.add_argument("--torch-threads", type=int, default=None)
+    parser.add_argument("--raster-backend", choices=["pdf2image", "pymupdf"], default="pdf2image")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--layout-batch-size", type=int, default=1)
+    parser.add_argument("--text-layer", action="store_true", help="Read text from the PDF text layer")
+    parser.add_argument("--ocr-backend", choices=["block", "page"], default="block")
+    parser.add_argument("--figure-source", choices=["crop", "embedded"], default="crop")
+    parser.add_argument("--lp-config", default="lp://PubLayNet/mask_rcnn_X_101_32x8d_FPN_3x/config")
+    parser.add_argument("--model-cache-dir", default=None, help="Directory with the layout model weights")
+    parser.add_argument("--store", action="store_true", help="Also measure ReferenceStore.create_store end to end")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory(prefix="bench_pdf_ingest_") as tmp_dir:
+        pdf_paths = []
+        for doc_i in range(args.docs):
+            path = os.path.join(tmp_dir, f"article{doc_i}.pdf")
+            make_article_pdf(path, args.pages, rng)
+            pdf_paths.append(path)
+        print(f"generated {args.docs} PDFs with {args.pages} pages each")
+
+        print(f"{'workers':>7} | {'wall (s)':>8} | {'pages/s':>7} | {'peak RSS (MB)':>13} | {'store (s)':>9} | per-page stage cost (ms)")
+        mp_context = multiprocessing.get_context("spawn")
+        for workers in args.workers:
+            # the parse cache is disabled, so every mode parses every PDF
+            lp_settings = LayoutParserSettings(
+                config_path=args.lp_config, raster_backend=args.raster_backend, raster_dpi=args.dpi,
+                use_text_layer=args.text_layer, ocr_backend=args.ocr_backend, figure_source=args.figure_source,
+                layout_batch_size=args.layout_batch_size, parse_workers=workers, torch_threads=args.torch_threads,
+                parse_cache_dir=None, model_cache_dir=args.model_cache_dir,
+            )
+            images_dir = os.path.join(tmp_dir, f"images_w{workers}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as executor:
+                result = executor.submit(run_mode, pdf_paths, lp_settings, images_dir, args.store).result()
+
+            stats = ParseStats.model_validate(result["parse_stats"])
+            totals = stats.stage_totals()
+            n_pages = max(1, stats.page_count())
+            stage_costs = ", ".join(f"{stage}: {totals[stage] / n_pages * 1e3:.1f}" for stage in PARSE_STAGES if stage in totals)
+            store_sec = f"{result['store_sec']:>9.2f}" if result["store_sec"] is not None else f"{'-':>9}"
+            peak_rss = f"{stats.peak_rss_mb:>13.1f}" if stats.peak_rss_mb is not None else f"{'-':>13}"
+            print(f"{workers:>7} | {stats.wall_time_sec:>8.2f} | {stats.pages_per_sec():>7.2f} | {peak_rss} | {store_sec} | {stage_costs}")
+
+if __name__ == "__main__":
+    main()
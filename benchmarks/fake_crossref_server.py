@@ -0,0 +1,171 @@
+"""
+Local fake of the CrossRef API and doi.org content negotiation, for testing and benchmarking
+the reference resolution offline:
+
+    GET /works?query.title=...&query.author=...&rows=1   -> search results (one item)
+    GET /works/<doi>                                     -> work record with abstract
+    GET /doi/<doi>  (Accept: application/x-bibtex)       -> bibtex entry
+
+DOIs are derived from the query title, so the same title always resolves to the same DOI.
+Titles containing "unresolvable" return no items. It can add latency, fail a fraction of
+requests with 429/503 and rate limit clients, to exercise retries and backoff.
+
+Point the resolver to it with:
+    AISURVEYWRITER_CROSSREF_URL=http://127.0.0.1:<port>
+    AISURVEYWRITER_DOI_URL=http://127.0.0.1:<port>/doi
+or with CrossrefSettings(crossref_url=..., doi_url=...).
+
+Usage:
+    python benchmarks/fake_crossref_server.py [--port 8765] [--latency-ms 100] [--error-rate 0.05] [--max-rps 50]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+from urllib.parse import urlparse, parse_qs, unquote
+
+def fake_doi(title: str) -> str:
+    return f"10.5555/fake.{hashlib.sha1(title.strip().lower().encode('utf-8')).hexdigest()[:12]}"
+
+def fake_work(doi: str, title: str = "") -> dict:
+    suffix = doi.rsplit(".", 1)[-1]
+    return {
+        "DOI": doi,
+        "type": "journal-article",
+        "title": [title or f"Fake work {suffix}"],
+        "author": [{"given": "Jane", "family": "Doe"}, {"given": "Richard", "family": "Roe"}],
+        "container-title": ["Journal of Fake Results"],
+        "published": {"date-parts": [[2000 + int(suffix[:2], 16) % 25, 1, 1]]},
+        "volume": str(int(suffix[2:4], 16) % 40 + 1),
+        "page": "1-10",
+        "abstract": f"<jats:p>Abstract of the fake work {suffix}.</jats:p>",
+    }
+
+class FakeCrossrefServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, error_rate: float = 0,
+                 max_rps: float = 0, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = monotonic()
+        self._window_count = 0
+        self.request_count = 0
+        self.titles: dict[str, str] = {}
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeCrossrefServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _rate_limited(self) -> bool:
+        if not self.max_rps:
+            return False
+        with self._lock:
+            now = monotonic()
+            if now - self._window_start >= 1:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            return self._window_count > self.max_rps
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, body: str = "", content_type: str = "application/json", headers: dict = None):
+        data = body.encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        with self._lock:
+            self.request_count += 1
+            fail = self._rng.random() < self.error_rate
+        if self.latency:
+            sleep(self.latency)
+        if self._rate_limited():
+            return self._send(handler, 429, "rate limited", "text/plain", {"Retry-After": "1"})
+        if fail:
+            return self._send(handler, 503, "unavailable", "text/plain")
+
+        url = urlparse(handler.path)
+        path = unquote(url.path)
+        if path == "/works":
+            query = parse_qs(url.query)
+            title = query.get("query.title", [""])[0]
+            if not title or "unresolvable" in title.lower():
+                items = []
+            else:
+                doi = fake_doi(title)
+                with self._lock:
+                    self.titles[doi] = title
+                items = [fake_work(doi, title)]
+            return self._send(handler, 200, json.dumps({"status": "ok", "message": {"items": items}}))
+
+        if path.startswith("/works/"):
+            doi = path[len("/works/"):]
+            return self._send(handler, 200, json.dumps({"status": "ok", "message": fake_work(doi, self.titles.get(doi, ""))}))
+
+        if path.startswith("/doi/"):
+            doi = path[len("/doi/"):]
+            work = fake_work(doi, self.titles.get(doi, ""))
+            authors = "; ".join(f"{a['family']}, {a['given']}" for a in work["author"])
+            bibtex = (f"@article{{{doi.rsplit('.', 1)[-1]},\n  title={{{work['title'][0]}}},\n  author={{{authors}}},\n"
+                      f"  journal={{{work['container-title'][0]}}},\n  year={{{work['published']['date-parts'][0][0]}}},\n"
+                      f"  doi={{{doi}}}\n}}")
+            return self._send(handler, 200, bibtex, "application/x-bibtex")
+
+        self._send(handler, 404, "not found", "text/plain")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--max-rps", type=float, default=0, help="Answer 429 above this many requests per second (0 = no limit)")
+    args = parser.parse_args()
+
+    server = FakeCrossrefServer(args.host, args.port, args.latency_ms, args.error_rate, args.max_rps)
+    print(f"fake CrossRef server on {server.url} (doi url: {server.url}/doi)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,11 @@ def parse_args():
     parser.add_argument("--no-tex-review", action="store_true", help="Skip TEX review")
     parser.add_argument("--no-review", action="store_true", help="Skip content/writing review step")
     parser.add_argument("--cooldown", "-w", type=int, default=30, help="Cooldown between two consecutive requests made to the LLM API")
+    parser.add_argument("--llm-rpm", type=float, default=None, help="Requests per minute allowed by the LLM provider. With --llm-rpm/--llm-tpm, requests only wait when a budget would be exceeded, instead of sleeping the cooldown")
+    parser.add_argument("--llm-tpm", type=int, default=None, help="Tokens per minute allowed by the LLM provider")
+    parser.add_argument("--llm-max-attempts", type=int, default=6, help="Attempts of each LLM request on transient errors (rate limits, timeouts, 5xx), with jittered exponential backoff that honours Retry-After hints. Default is 6")
+    parser.add_argument("--llm-cache", choices=["off", "readwrite", "readonly"], default="off", help="Persistent cache of LLM responses, keyed by model, temperature and messages: readwrite stores and replays responses, readonly only replays them. Default is off")
+    parser.add_argument("--llm-cache-strict", action="store_true", help="With --llm-cache readonly, stop with an error when a response isn't cached instead of requesting it to the LLM (deterministic replays)")
     parser.add_argument("--embed-cooldown", type=int, default=0, help="Cooldown between two consecutive requests made to the text embedding model API")
     parser.add_argument("--tex-template", type=str, default=os.path.abspath(os.path.join(os.path.dirname(__file__), "../../templates/paper_template.tex")), help="Path to custom .tex template")
     parser.add_argument("--prompt-store", type=str, default=None, help="Path to a JSON containing custom prompts used in the system. If none is provided, the default prompts are used")
@@ -45,6 +50,17 @@ def parse_args():
     parser.add_argument("--fig-max", type=int, default=30, help="Maximum number of Figures to add (not counting TikZ generated).")
     parser.add_argument("--tesseract", type=str, default="tesseract", help="Tessearact executable/command")
     parser.add_argument("--reference-store", type=str, default=None, help="Path to local .pkl reference store")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="Number of worker processes used to parse reference PDFs. Default is 1 (serial)")
+    parser.add_argument("--pdf-torch-threads", type=int, default=None, help="Torch threads used by each PDF parsing worker. Default is torch's own default")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Directory for caches shared between runs (e.g. parsed PDFs). Default is $AISURVEYWRITER_CACHE_DIR or ~/.cache/aisurveywriter")
+    parser.add_argument("--crossref-workers", type=int, default=8, help="Number of references resolved concurrently through CrossRef. Default is 8")
+    parser.add_argument("--crossref-mailto", type=str, default=None, help="Contact e-mail sent to CrossRef to use its polite pool")
+    parser.add_argument("--crossref-mode", choices=["works", "negotiation"], default="negotiation", help="Build BibTeX from a single CrossRef works query (works) or through doi.org content negotiation (negotiation). Default is negotiation")
+    parser.add_argument("--bib-extract-input-tokens", type=int, default=None, help="Input token budget of each reference extraction request. Default is derived from the model context window")
+    parser.add_argument("--bib-extract-output-tokens", type=int, default=None, help="Output token budget of each reference extraction request. Default is derived from the model output limit")
+    parser.add_argument("--bib-extract-workers", type=int, default=1, help="Reference extraction requests sent concurrently to the LLM. Default is 1 (serial, with the request cooldown)")
+    parser.add_argument("--bib-extract-rpm", type=float, default=None, help="Requests per minute allowed for concurrent reference extraction. Default is one request per cooldown")
+    parser.add_argument("--no-bib-cache", action="store_true", help="Don't use the persistent cache of DOI/BibTeX lookups (all references are resolved over the network)")
     return parser.parse_args()
 
 def main():
@@ -73,6 +89,17 @@ def main():
             
             local_reference_store=args.reference_store,
             tesseract_executable=args.tesseract,
+            pdf_parse_workers=args.pdf_workers,
+            pdf_torch_threads=args.pdf_torch_threads,
+            cache_dir=os.path.abspath(args.cache_dir) if args.cache_dir else None,
+            bib_cache=not args.no_bib_cache,
+            crossref_workers=args.crossref_workers,
+            crossref_mailto=args.crossref_mailto,
+            crossref_mode=args.crossref_mode,
+            bib_extract_input_tokens=args.bib_extract_input_tokens,
+            bib_extract_output_tokens=args.bib_extract_output_tokens,
+            bib_extract_workers=args.bib_extract_workers,
+            bib_extract_rpm=args.bib_extract_rpm,
             
             no_ref_faiss=args.no_ref_rag,
             no_review=args.no_review,
@@ -92,6 +119,11 @@ def main():
             images_dir=os.path.abspath(args.images) if args.images else None,
 
             llm_request_cooldown_sec=args.cooldown,
+            llm_requests_per_minute=args.llm_rpm,
+            llm_tokens_per_minute=args.llm_tpm,
+            llm_max_attempts=args.llm_max_attempts,
+            llm_cache=args.llm_cache,
+            llm_cache_strict=args.llm_cache_strict,
             embed_request_cooldown_sec=args.embed_cooldown,
 
             ref_max_per_section=args.ref_max_section,
@@ -6,6 +6,7 @@ import re
 from .core.file_handler import read_credentials
 from .survey_context import SurveyContext, SurveyAgentType, SurveyContextConfig
 from .core.llm_handler import LLMHandler, LLMConfig
+from .core.llm_retry import RetryPolicy
 from .core.text_embedding import EmbeddingsHandler
 
 from .store.prompt_store import PromptStore, default_prompt_store
@@ -51,6 +52,17 @@ def generate_paper_survey(
 
     local_reference_store: Optional[str] = None,
     tesseract_executable: str = "tesseract",
+    pdf_parse_workers: int = 1,
+    pdf_torch_threads: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    bib_cache: bool = True,
+    crossref_workers: int = 8,
+    crossref_mailto: Optional[str] = None,
+    crossref_mode: str = "negotiation",
+    bib_extract_input_tokens: Optional[int] = None,
+    bib_extract_output_tokens: Optional[int] = None,
+    bib_extract_workers: int = 1,
+    bib_extract_rpm: Optional[float] = None,
     
     no_ref_faiss = False,
     no_review = False,
@@ -70,7 +82,12 @@ def generate_paper_survey(
 
     images_dir: Optional[str] = None,
     
-    llm_request_cooldown_sec: int = 30,
+    llm_request_cooldown_sec: Optional[int] = 30,
+    llm_requests_per_minute: Optional[float] = None,
+    llm_tokens_per_minute: Optional[int] = None,
+    llm_max_attempts: int = 6,
+    llm_cache: str = "off",
+    llm_cache_strict: bool = False,
     embed_request_cooldown_sec: int = 0,
     
     pipeline_status_queue: queue.Queue = None,
@@ -84,10 +101,14 @@ def generate_paper_survey(
 ):
     setup_credentials(credentials_yaml_path)
     
+    retry_policy = RetryPolicy(max_attempts=llm_max_attempts)
     agent_llms = {
-        SurveyAgentType.StructureGenerator: LLMConfig(model=structure_model, model_type=structure_model_type, temperature=temperature),
-        SurveyAgentType.Writer: LLMConfig(model=writer_model, model_type=writer_model_type, temperature=temperature),
-        SurveyAgentType.Reviewer: LLMConfig(model=reviewer_model, model_type=reviewer_model_type, temperature=temperature),
+        SurveyAgentType.StructureGenerator: LLMConfig(model=structure_model, model_type=structure_model_type, temperature=temperature,
+                                                      requests_per_minute=llm_requests_per_minute, tokens_per_minute=llm_tokens_per_minute, retry=retry_policy),
+        SurveyAgentType.Writer: LLMConfig(model=writer_model, model_type=writer_model_type, temperature=temperature,
+                                          requests_per_minute=llm_requests_per_minute, tokens_per_minute=llm_tokens_per_minute, retry=retry_policy),
+        SurveyAgentType.Reviewer: LLMConfig(model=reviewer_model, model_type=reviewer_model_type, temperature=temperature,
+                                            requests_per_minute=llm_requests_per_minute, tokens_per_minute=llm_tokens_per_minute, retry=retry_policy),
     }
 
     config = SurveyContextConfig(
@@ -103,6 +124,17 @@ def generate_paper_survey(
         reference_store_path=local_reference_store,
         
         tesseract_executable=tesseract_executable,
+        pdf_parse_workers=pdf_parse_workers,
+        pdf_torch_threads=pdf_torch_threads,
+        cache_dir=cache_dir,
+        bib_cache=bib_cache,
+        crossref_workers=crossref_workers,
+        crossref_mailto=crossref_mailto,
+        crossref_mode=crossref_mode,
+        bib_extract_input_tokens=bib_extract_input_tokens,
+        bib_extract_output_tokens=bib_extract_output_tokens,
+        bib_extract_workers=bib_extract_workers,
+        bib_extract_requests_per_minute=bib_extract_rpm,
         
         no_ref_faiss=no_ref_faiss,
         no_review=no_review,
@@ -126,6 +158,8 @@ def generate_paper_survey(
         faisscontent_path=faisscontent_path,
         faiss_confidence=faiss_confidence,
         llm_request_cooldown_sec=llm_request_cooldown_sec,
+        llm_cache=llm_cache,
+        llm_cache_strict=llm_cache_strict,
         embed_request_cooldown_sec=embed_request_cooldown_sec
     )
 
@@ -10,6 +10,8 @@ from ..store.reference_store import ReferenceStore
 from .agent_rags import AgentRAG
 from .paper import PaperData
 from ..store.prompt_store import PromptStore
+from .llm_cache import is_cached_response
+from ..utils.logger import cooldown_log
 
 @dataclass
 class AgentContext:
@@ -45,4 +47,15 @@ class AgentContext:
             rags=self.rags,
             output_dir=self.output_dir,
             _working_paper=self._working_paper,
-        )
\ No newline at end of file
+        )
+
+    def llm_cooldown_wait(self, caller, response=None):
+        """
+        Sleep the LLM cooldown after a request. The cooldown is only a fallback for LLMs without
+        requests/tokens per minute budgets: with them, the rate limiter waits only when needed.
+        Responses replayed from the LLM cache made no request, so they don't wait.
+        """
+        if response is not None and is_cached_response(response):
+            return
+        if self.llm_cooldown and not (self.llm_handler and self.llm_handler.rate_limiter):
+            cooldown_log(caller, self.llm_cooldown)
\ No newline at end of file
@@ -7,6 +7,7 @@ from pydantic import BaseModel
 import numpy as np
 import os
 import bibtexparser
+from bibtexparser.bibdatabase import BibDatabase
 import re
 
 from langchain_community.docstore.document import Document
@@ -16,8 +17,10 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from .text_embedding import EmbeddingsHandler
 from .llm_handler import LLMHandler
 from ..store.reference_store import ReferenceStore, DocFigure
+from ..store.bib_store import DocumentBibStore, DocumentBib, BibManifest, entry_identity
 from ..res_extract import ReferencesBibExtractor
 from ..utils.helpers import random_str
+from ..utils.crossref import crossref_settings
 from ..utils.logger import named_log
 
 class RAGType(IntFlag):
@@ -120,7 +123,10 @@ class AgentRAG:
     def __init__(self, embeddings: EmbeddingsHandler, llm: LLMHandler = None, 
                  bib_faiss_path: Optional[str] = None, figures_faiss_path: Optional[str] = None, 
                  content_faiss_path: Optional[str] = None, ref_bib_extractor: Optional[ReferencesBibExtractor] = None, 
-                 request_cooldown_sec: int = 30, output_dir: str = "out", confidence: float = 0.6):
+                 request_cooldown_sec: int = 30, output_dir: str = "out", confidence: float = 0.6,
+                 bib_input_token_budget: Optional[int] = None, bib_output_token_budget: Optional[int] = None,
+                 bib_extract_workers: int = 1, bib_extract_requests_per_minute: Optional[float] = None,
+                 bib_store_dir: Optional[str] = None):
         self._embed = embeddings
         self._llm = llm
 
@@ -149,6 +155,12 @@ class AgentRAG:
         self.ref_bib_extractor = ref_bib_extractor
 
         self._cooldown = request_cooldown_sec
+        self._bib_input_token_budget = bib_input_token_budget
+        self._bib_output_token_budget = bib_output_token_budget
+        self._bib_extract_workers = bib_extract_workers
+        self._bib_extract_rpm = bib_extract_requests_per_minute
+        # per-document store of extracted bibliographies (None = <output_dir>/refextract-docs)
+        self._bib_store_dir = bib_store_dir
         self.output_dir = os.path.abspath(output_dir)
 
     def create_rags(self, rag_types: RAGType, references: ReferenceStore):
@@ -182,34 +194,191 @@ class AgentRAG:
     
     def create_bib_rag(self, references: ReferenceStore): 
         if not self.ref_bib_extractor:
-            self.ref_bib_extractor = ReferencesBibExtractor(self._llm, references, request_cooldown_sec=self._cooldown, n_batches=150)
+            self.ref_bib_extractor = ReferencesBibExtractor(self._llm, references, request_cooldown_sec=self._cooldown,
+                                                           input_token_budget=self._bib_input_token_budget, output_token_budget=self._bib_output_token_budget,
+                                                           max_workers=self._bib_extract_workers, requests_per_minute=self._bib_extract_rpm)
         
-        if not references.bibtex_db_path:
-            bib_info = self.ref_bib_extractor.extract()
-
-            references.bibtex_db_path = os.path.join(self.output_dir, "refextract-bibdb.bib")
-            bibtex_db = self.ref_bib_extractor.to_bibtex_db(bib_info)
-            
-            # insert keys from loaded references at the beginning
-            bibtex_db.entries = references.bibtex_entries() + bibtex_db.entries
-
-            with open(references.bibtex_db_path, "w", encoding="utf-8") as f:
-                bibtexparser.dump(bibtex_db, f)
-            
-        else:
+        if references.bibtex_db_path:
             with open(references.bibtex_db_path, "r", encoding="utf-8") as f:
                 bibtex_db = bibtexparser.load(f)
+            return AgentRAG.create_faiss(self._embed, self._bib_data(bibtex_db.entries), save_path=references.bibtex_db_path.replace(".bib", ".faiss"))
+
+        references.bibtex_db_path = os.path.join(self.output_dir, "refextract-bibdb.bib")
+        bibtex_db, previous_db = self._update_extracted_bib(references)
+        return self._update_bib_faiss(bibtex_db, previous_db, references.bibtex_db_path.replace(".bib", ".faiss"))
+
+    def _update_extracted_bib(self, references: ReferenceStore) -> tuple[BibDatabase, Optional[BibDatabase]]:
+        """
+        Update the bibtex database extracted from the references bibliographies (references.bibtex_db_path).
+        Bibliographies are extracted and resolved only for documents not in the bibliography store yet;
+        the entries of documents merged by a previous run keep their keys, entries of new documents are
+        added (or mapped to the same work already in the database), and entries no longer cited by any
+        document are removed.
+
+        Returns:
+            bibtex_db (BibDatabase): the updated database, with the loaded references' own entries first
+            previous_db (Optional[BibDatabase]): the database of the previous run, if it can be updated
+        """
+        store = DocumentBibStore(self._bib_store_dir or os.path.join(self.output_dir, "refextract-docs"),
+                                 settings={"llm": self._llm.name, "crossref_mode": crossref_settings().mode})
+        sections = references.bibliography_sections()
+        # references.paths isn't updated when references are added, so take each path from its document
+        key_sections = {store.key(bib): (bib, doc.path) for bib, doc in zip(sections, references.documents)}
+        doc_keys = list(key_sections)
+        doc_bibs = {key: store.load(key) for key in doc_keys}
+        
+        missing = [key for key in doc_keys if doc_bibs[key] is None]
+        named_log(self, f"bibliography store: {len(doc_keys) - len(missing)} documents stored, extracting {len(missing)}")
+        complete = {key: True for key in doc_keys}
+        if missing:
+            sections_info, sections_complete = self.ref_bib_extractor.extract_sections([key_sections[key][0] for key in missing])
+            for key, section_info, section_complete in zip(missing, sections_info, sections_complete):
+                doc_bibs[key] = DocumentBib(source=key_sections[key][1], references=section_info, entries=[None] * len(section_info))
+                complete[key] = section_complete
+        
+        # resolve the references of new documents, and those that failed to resolve in previous runs
+        unresolved = [(key, i) for key in doc_keys for i in doc_bibs[key].unresolved()]
+        changed = set(missing)
+        if unresolved:
+            results = self.ref_bib_extractor.resolve([doc_bibs[key].references[i] for key, i in unresolved])
+            for (key, i), entry in zip(unresolved, results):
+                if isinstance(entry, dict) and entry:
+                    doc_bibs[key].entries[i] = {k: v for k, v in entry.items() if k != "ID"}
+                    changed.add(key)
+            failed = sum(1 for entry in results if not isinstance(entry, dict) or not entry)
+            if failed:
+                named_log(self, f"bibliography store: {failed} references not resolved, they'll be resolved again in the next run")
+        
+        for key in changed:
+            if complete[key]:
+                store.save(key, doc_bibs[key])
+            else:
+                named_log(self, f"bibliography store: extraction of {os.path.basename(key_sections[key][1])} failed in part, not storing it")
+        
+        previous_manifest = BibManifest.load(references.bibtex_db_path)
+        previous_db = None
+        if previous_manifest:
+            with open(references.bibtex_db_path, "r", encoding="utf-8") as f:
+                previous_db = bibtexparser.load(f)
+        previous_entries = {entry["ID"]: entry for entry in previous_db.entries} if previous_db else {}
+        
+        manifest = BibManifest()
+        merged: dict[str, dict] = {}
+        doi_keys: dict[str, str] = {}
+        title_keys: dict[str, str] = {}
+        def add_entry(key: str, entry: dict):
+            merged[key] = entry
+            doi, title = entry_identity(entry)
+            if doi:
+                doi_keys.setdefault(doi, key)
+            if title:
+                title_keys.setdefault(title, key)
+        
+        # documents merged by the previous run keep their entries and keys (unless more of their references were resolved)
+        for doc_key in doc_keys:
+            keys = previous_manifest.documents.get(doc_key) if previous_manifest else None
+            if keys is not None and doc_key not in changed and all(key in previous_entries for key in keys):
+                manifest.documents[doc_key] = keys
+                for key in keys:
+                    if key not in merged:
+                        add_entry(key, previous_entries[key])
+        
+        # works already in the previous database keep their keys when merged again
+        previous_keys: dict[tuple, str] = {}
+        previous_loaded_keys = set(previous_manifest.loaded_keys) if previous_manifest else set()
+        for key, entry in previous_entries.items():
+            if key in previous_loaded_keys:
+                continue
+            doi, title = entry_identity(entry)
+            if doi:
+                previous_keys.setdefault(("doi", doi), key)
+            if title:
+                previous_keys.setdefault(("title", title), key)
+        
+        next_id = 1 + max((int(key[3:]) for key in previous_entries if re.fullmatch(r"key\d+", key)), default=-1)
+        added_docs = [doc_key for doc_key in doc_keys if doc_key not in manifest.documents]
+        for doc_key in added_docs:
+            keys = []
+            for entry in doc_bibs[doc_key].resolved_entries():
+                doi, title = entry_identity(entry)
+                key = doi_keys.get(doi) if doi else None
+                key = key or (title_keys.get(title) if title else None)
+                if not key:
+                    key = previous_keys.get(("doi", doi)) or previous_keys.get(("title", title))
+                    if key and key not in merged:
+                        add_entry(key, previous_entries[key])
+                if not key:
+                    key = f"key{next_id}"
+                    next_id += 1
+                    add_entry(key, dict(entry, ID=key))
+                if key not in keys:
+                    keys.append(key)
+            manifest.documents[doc_key] = keys
+        
+        # insert keys from loaded references at the beginning
+        loaded_entries = references.bibtex_entries()
+        manifest.loaded_keys = [entry["ID"] for entry in loaded_entries]
+        bibtex_db = BibDatabase()
+        bibtex_db.entries = loaded_entries + list(merged.values())
+        
+        removed_docs = len(previous_manifest.documents.keys() - manifest.documents.keys()) if previous_manifest else 0
+        named_log(self, f"bibtex database: {len(added_docs)} documents added, {removed_docs} removed, "
+                        f"{len(merged.keys() - previous_entries.keys())} entries added, {len(previous_entries.keys() - merged.keys() - set(manifest.loaded_keys))} removed")
+        
+        with open(references.bibtex_db_path, "w", encoding="utf-8") as f:
+            bibtexparser.dump(bibtex_db, f)
+        manifest.save(references.bibtex_db_path)
+        return bibtex_db, previous_db
+
+    def _update_bib_faiss(self, bibtex_db: BibDatabase, previous_db: Optional[BibDatabase], save_path: str) -> FAISS:
+        """
+        Update the FAISS of the previous bibtex database with the entries added, removed or changed since,
+        or create it from every entry when there is no previous database (or FAISS)
+        """
+        splitter = RecursiveCharacterTextSplitter()
+        def documents(entries: List[dict]) -> tuple[List[Document], List[str]]:
+            # every chunk is identified by its bibtex key, so the chunks of an entry can be removed later
+            docs, ids = [], []
+            for data in self._bib_data(entries):
+                for n, doc in enumerate(splitter.split_documents([data.to_document()])):
+                    docs.append(doc)
+                    ids.append(f"{data.bibtex_key}#{n}")
+            return docs, ids
+        
+        entries = {entry["ID"]: entry for entry in bibtex_db.entries}
+        if previous_db is None or not os.path.isdir(save_path):
+            docs, ids = documents(list(entries.values()))
+            faiss = FAISS.from_documents(docs, self._embed.model, ids=ids)
+            faiss.save_local(save_path)
+            return faiss
+        
+        faiss = FAISS.load_local(save_path, self._embed.model, allow_dangerous_deserialization=True)
+        previous_entries = {entry["ID"]: entry for entry in previous_db.entries}
+        removed = {key for key, entry in previous_entries.items() if entries.get(key) != entry}
+        added = [entry for key, entry in entries.items() if previous_entries.get(key) != entry]
+        
+        removed_ids = [doc_id for doc_id in faiss.index_to_docstore_id.values() if doc_id.split("#", 1)[0] in removed]
+        if removed_ids:
+            faiss.delete(removed_ids)
+        if added:
+            docs, ids = documents(added)
+            faiss.add_documents(docs, ids=ids)
+        named_log(self, f"FAISS: {len(added)} bibtex entries embedded, {len(removed)} removed")
+        
+        faiss.save_local(save_path)
+        return faiss
 
+    @staticmethod
+    def _bib_data(entries: List[dict]) -> List[BibTexData]:
         bib_data: List[BibTexData] = []
-        for entry in bibtex_db.entries:
+        for entry in entries:
             bib_data.append(BibTexData(
                 title=entry.get("title", "Unknown"),
                 abstract=entry.get("abstract", ""),
                 keywords=entry.get("keyword", ""),
                 bibtex_key=entry.get("ID", random_str()),
             ))
-        
-        return AgentRAG.create_faiss(self._embed, bib_data, save_path=references.bibtex_db_path.replace(".bib", ".faiss"))
+        return bib_data
 
 
     def create_content_rag(self, references: ReferenceStore):
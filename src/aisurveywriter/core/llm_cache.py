@@ -0,0 +1,130 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from time import time
+import threading
+import hashlib
+import sqlite3
+import json
+import os
+
+from langchain_core.messages import AIMessage, BaseMessage, messages_to_dict, messages_from_dict
+
+from ..utils.logger import global_log
+
+class LLMCacheMiss(RuntimeError):
+    pass
+
+# response_metadata flag set on responses replayed from the cache
+CACHE_HIT_METADATA_KEY = "llm_cache_hit"
+
+def is_cached_response(response) -> bool:
+    """
+    Whether "response" was replayed from the LLM cache instead of requested to the provider
+    """
+    metadata = getattr(response, "response_metadata", None) or {}
+    return bool(metadata.get(CACHE_HIT_METADATA_KEY, False))
+
+class LLMCacheSettings(BaseModel):
+    # off: no cache; readwrite: serve cached responses and store new ones;
+    # readonly: replay cached responses without storing new ones
+    mode: Literal["off", "readwrite", "readonly"] = "off"
+    # directory of the cache database
+    cache_dir: Optional[str] = None
+    # readonly only: raise LLMCacheMiss instead of calling the LLM when a response isn't cached
+    strict: bool = False
+
+class LLMCache:
+    """
+    Persistent content-addressed cache of LLM responses, keyed by the model, temperature and
+    rendered messages of each request, stored in a SQLite database shared by every run:
+
+        <cache_dir>/llm_cache.sqlite3
+
+    Responses are stored with their metadata (usage_metadata, response_metadata), so a rerun with
+    unchanged inputs replays them without any request to the provider.
+    """
+    def __init__(self, settings: LLMCacheSettings):
+        self.settings = settings
+        os.makedirs(settings.cache_dir, exist_ok=True)
+        self.path = os.path.join(settings.cache_dir, "llm_cache.sqlite3")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses ("
+                               "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, created REAL NOT NULL)")
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def writable(self) -> bool:
+        return self.settings.mode == "readwrite"
+
+    @staticmethod
+    def key(model_type: str, model: str, temperature: float, messages: List[BaseMessage]) -> str:
+        request = {
+            "model_type": model_type,
+            "model": model,
+            "temperature": temperature,
+            "messages": [[message.type, message.content] for message in messages],
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return messages_from_dict([json.loads(row[0])])[0]
+
+    def set(self, key: str, model: str, response: AIMessage):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, model, response, created) VALUES (?, ?, ?, ?)",
+                               (key, model, json.dumps(messages_to_dict([response])[0]), time()))
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        return f"{self.hits / lookups if lookups else 0:.0%} hit rate ({self.hits} hits, {self.misses} misses, mode: {self.settings.mode})"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# process-wide cache used by every LLMHandler
+_llm_cache_settings = LLMCacheSettings()
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+def configure_llm_cache(settings: LLMCacheSettings):
+    """
+    Set the LLM response cache used by this process (mode "off" disables it)
+    """
+    global _llm_cache_settings, _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is not None:
+            _llm_cache.close()
+        if settings.mode != "off" and not settings.cache_dir:
+            from ..utils.helpers import default_cache_dir
+            settings = settings.model_copy(update={"cache_dir": os.path.join(default_cache_dir(), "llm")})
+        _llm_cache_settings = settings
+        _llm_cache = None
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Get the process-wide LLM response cache, opening it on first use.
+    Returns None if the cache is off or can't be opened.
+    """
+    global _llm_cache, _llm_cache_settings
+    with _llm_cache_lock:
+        if _llm_cache is None and _llm_cache_settings.mode != "off":
+            try:
+                _llm_cache = LLMCache(_llm_cache_settings)
+            except (OSError, sqlite3.Error) as e:
+                global_log("(LLMCache) unable to open LLM response cache, disabling it:", e)
+                _llm_cache_settings = LLMCacheSettings(mode="off")
+        return _llm_cache
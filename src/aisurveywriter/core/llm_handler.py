@@ -1,15 +1,26 @@
 from enum import Enum, auto
-from typing import Optional, Union
+from typing import Any, List, Optional, Union
+from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import hashlib
+import json
 import re
+import asyncio
 from time import sleep
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, AIMessage
+from langchain_core.messages import SystemMessage, AIMessage, BaseMessage, HumanMessage, convert_to_messages
 from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
 
 from ..utils import named_log
+from ..utils.rate_limit import get_request_rate_limiter
+from .token_budget import estimate_tokens
+from .llm_cache import get_llm_cache, LLMCacheMiss, CACHE_HIT_METADATA_KEY
+from .llm_retry import RetryPolicy, classify_error, backoff_delay
 
 class LLMType(Enum):
     OpenAI = auto()
@@ -33,16 +44,86 @@ class LLMConfig(BaseModel):
     model: str
     model_type: str
     temperature: float = 0.5
+    # provider budgets, shared by every handler of the same model (None = not limited)
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[int] = None
+    # retries of transient failures (rate limits, timeouts, 5xx)
+    retry: RetryPolicy = RetryPolicy()
+
+
+@dataclass(frozen=True)
+class BoundPrompt:
+    """
+    A prompt template compiled into a chain with the model of an LLMHandler.
+    It's immutable, so threads and coroutines can share one handler, each calling it with a
+    different prompt, without changing the handler chain (see LLMHandler.bind_prompt)
+    """
+    handler: "LLMHandler"
+    prompt: ChatPromptTemplate
+    chain: Any
+
+    def invoke(self, input_variables: dict = None) -> AIMessage:
+        return self.handler._invoke_prompt(self.prompt, self.chain, input_variables)
+
+    async def ainvoke(self, input_variables: dict = None) -> AIMessage:
+        return await self.handler._ainvoke_prompt(self.prompt, self.chain, input_variables)
+
+    async def abatch_invoke(self, inputs: List[dict], max_concurrency: int = 4, return_exceptions: bool = False) -> List[AIMessage | Exception]:
+        return await _gather_limited(self.ainvoke, inputs, max_concurrency, return_exceptions)
+
+    def batch_invoke(self, inputs: List[dict], max_concurrency: int = 4, return_exceptions: bool = False) -> List[AIMessage | Exception]:
+        return _map_limited(self.invoke, inputs, max_concurrency, return_exceptions)
+
+async def _gather_limited(ainvoke, inputs: List[dict], max_concurrency: int, return_exceptions: bool) -> List[AIMessage | Exception]:
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    async def invoke_one(input_variables: dict):
+        async with semaphore:
+            return await ainvoke(input_variables)
+    return await asyncio.gather(*(invoke_one(input_variables) for input_variables in inputs), return_exceptions=return_exceptions)
+
+def _map_limited(invoke, inputs: List[dict], max_concurrency: int, return_exceptions: bool) -> List[AIMessage | Exception]:
+    """
+    Blocking counterpart of _gather_limited: runs the sync invoke on a thread pool, so it works with
+    or without a running event loop and reuses the model sync clients instead of a new loop per batch
+    """
+    def invoke_one(input_variables: dict):
+        try:
+            return invoke(input_variables)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+    if not inputs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(inputs)))) as executor:
+        return list(executor.map(invoke_one, inputs))
+
+def _prompt_key(prompt: ChatPromptTemplate) -> str:
+    """
+    Identifies a prompt by its templates, so equal prompts built separately share a BoundPrompt
+    """
+    # (model_dump leaves out the templates of message prompts, but their repr has every field)
+    return hashlib.sha256(repr((prompt.messages, prompt.partial_variables)).encode("utf-8")).hexdigest()
+
+# bound prompts kept per handler (least recently used ones are dropped first)
+BOUND_PROMPTS_MAXSIZE = 128
 
 
 class LLMHandler:
-    def __init__(self, model: str, model_type: Union[LLMType, str], temperature: float = 0.5):
-        self.config = LLMConfig(model=model, model_type=model_type, temperature=temperature)
+    def __init__(self, model: str, model_type: Union[LLMType, str], temperature: float = 0.5,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[int] = None,
+                 retry_policy: Optional[RetryPolicy] = None):
+        self.config = LLMConfig(model=model, model_type=model_type if isinstance(model_type, str) else model_type.name, temperature=temperature,
+                                requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute,
+                                retry=retry_policy or RetryPolicy())
         
         self.name = model
         if isinstance(model_type, str):
             model_type = LLMType.from_str(model_type)
         self.model_type = model_type
+        
+        # requests only wait when they would exceed the provider budgets
+        self.rate_limiter = get_request_rate_limiter(model_type.name, model, requests_per_minute, tokens_per_minute)
         match model_type:
             case LLMType.OpenAI:
                 self.model = ChatOpenAI(model=model, temperature=temperature, max_tries=3, request_timeout=120)
@@ -55,10 +136,16 @@ class LLMHandler:
 
         self.prompt = None
         self._chain = None
+        
+        # bound prompts by template set (see bind_prompt)
+        self._bound_prompts: OrderedDict[str, BoundPrompt] = OrderedDict()
+        self._bound_prompts_lock = threading.Lock()
     
     @staticmethod
     def from_config(config: LLMConfig):
-        return LLMHandler(model=config.model, model_type=config.model_type, temperature=config.temperature)
+        return LLMHandler(model=config.model, model_type=config.model_type, temperature=config.temperature,
+                          requests_per_minute=config.requests_per_minute, tokens_per_minute=config.tokens_per_minute,
+                          retry_policy=config.retry)
     
     
     def init_chain(self, ctxmsg: SystemMessage, prompt: str):
@@ -79,61 +166,222 @@ class LLMHandler:
 
     def init_chain_messages(self, *msgs):
         input_prompt = ChatPromptTemplate.from_messages(msgs)
+        self.prompt = input_prompt
         self._chain = input_prompt | self.model
     
     def set_prompt_template(self, prompt: str):
         self.prompt = prompt
 
-    def invoke(self, input_variables: dict = None) -> AIMessage:
+    def bind_prompt(self, *msgs) -> BoundPrompt:
         """
-        Invokes langchain LLM object and changes all the "input_variables" in the prompt template.
-        Must have called init_chain, set_prompt_template and (opt.) set_context_sysmsg before
+        Bind a prompt (a ChatPromptTemplate, or the messages to build one) to this handler model.
+        Unlike init_chain, the handler isn't changed, so it's safe to call from many threads or coroutines.
+        The bound prompt is cached per template set (up to BOUND_PROMPTS_MAXSIZE of them),
+        so binding the same messages again is cheap.
         """
-        if self._chain is None:
-            raise RuntimeError("To call LLMHandler.invoke, the chain has to be initialized")
+        if len(msgs) == 1 and isinstance(msgs[0], ChatPromptTemplate):
+            prompt = msgs[0]
+        else:
+            prompt = ChatPromptTemplate.from_messages(msgs)
         
-        max_tries = 3
-        try_count = 0
-        cooldown = 90
-        while try_count < max_tries: # handle with '429 (res. exhausted)' because of request timeout
-            try:
-                try_count += 1
-                resp = self._chain.invoke(input_variables)
-                break
-            except Exception as e:
-                if "429" in str(e):
-                    named_log(self, f"Resource exhausted exception raised. Sleeping for {cooldown} s.")
-                    named_log(self, f"Trying {try_count}/{max_tries}. If you wish to stop, press Ctrl+C")
-                    sleep(cooldown)
-                    cooldown += 90
-                else:
-                    raise e
+        key = _prompt_key(prompt)
+        with self._bound_prompts_lock:
+            bound = self._bound_prompts.get(key)
+            if bound is None:
+                bound = BoundPrompt(handler=self, prompt=prompt, chain=prompt | self.model)
+                self._bound_prompts[key] = bound
+                if len(self._bound_prompts) > BOUND_PROMPTS_MAXSIZE:
+                    self._bound_prompts.popitem(last=False)
+            else:
+                self._bound_prompts.move_to_end(key)
+        return bound
+
+    def _estimate_prompt_tokens(self, prompt: ChatPromptTemplate, input_variables: Optional[dict]) -> int:
+        try:
+            return estimate_tokens(prompt.format(**(input_variables or {})))
+        except Exception:
+            return sum(estimate_tokens(str(value)) for value in (input_variables or {}).values())
+
+    def _rate_limited(self, call, call_input, estimated_tokens: int) -> AIMessage:
+        """
+        Make the request through the rate limiter: reserve the estimated prompt tokens and
+        record the tokens actually used (usage_metadata) once it returns
+        """
+        if not self.rate_limiter:
+            return call(call_input)
         
-        if self.model_type == LLMType.Ollama:
-            resp.content = re.sub(r"<think>[\s\S]*<\/think>", "", resp.content) # remove 'think' from deepseek
+        request = self.rate_limiter.acquire(estimated_tokens)
+        resp = call(call_input)
+        usage = getattr(resp, "usage_metadata", None) or {}
+        self.rate_limiter.record(request, usage.get("total_tokens", estimated_tokens))
+        return resp
+
+    async def _arate_limited(self, acall, call_input, estimated_tokens: int) -> AIMessage:
+        if not self.rate_limiter:
+            return await acall(call_input)
         
+        # the limiter blocks, so wait for it outside of the event loop
+        request = await asyncio.to_thread(self.rate_limiter.acquire, estimated_tokens)
+        resp = await acall(call_input)
+        usage = getattr(resp, "usage_metadata", None) or {}
+        self.rate_limiter.record(request, usage.get("total_tokens", estimated_tokens))
         return resp
 
-    def send_prompt(self, prompt: str) -> AIMessage:
-        max_tries = 3
-        try_count = 0
-        cooldown = 90
-        while try_count < max_tries: # handle with '429 (res. exhausted)' because of request timeout
+    def _retry_delay(self, e: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying after the failed attempt number "attempt", or None if
+        e isn't transient or the retry policy is exhausted. Every retry is logged as a JSON event.
+        """
+        policy = self.config.retry
+        decision = classify_error(e)
+        event = {
+            "event": "llm_retry",
+            "model": self.name,
+            "attempt": attempt,
+            "max_attempts": policy.max_attempts,
+            "reason": decision.reason if decision else None,
+            "status": decision.status if decision else None,
+            "retry_after_sec": decision.retry_after_sec if decision else None,
+            "error": f"{type(e).__name__}: {str(e)[:200]}",
+        }
+        if decision is None:
+            return None
+        if attempt >= policy.max_attempts or (decision.retry_after_sec or 0) > policy.max_retry_after_sec:
+            named_log(self, json.dumps({**event, "event": "llm_retry_exhausted"}))
+            return None
+        
+        event["delay_sec"] = round(backoff_delay(policy, attempt, decision.retry_after_sec), 2)
+        named_log(self, json.dumps(event))
+        return event["delay_sec"]
+
+    def _with_retries(self, request) -> AIMessage:
+        """
+        Call request(), retrying transient failures as set by the retry policy (LLMConfig.retry)
+        """
+        attempt = 1
+        while True:
             try:
-                try_count += 1
-                resp = self.model.invoke(prompt)
-                break
+                return request()
             except Exception as e:
-                if "429" in str(e):
-                    named_log(self, f"Resource exhausted exception raised. Sleeping for {cooldown} s.")
-                    named_log(self, f"Trying {try_count}/{max_tries}. If you wish to stop, press Ctrl+C")
-                    sleep(cooldown)
-                    cooldown += 90
-                else:
-                    raise e
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                sleep(delay)
+                attempt += 1
 
+    async def _awith_retries(self, request) -> AIMessage:
+        attempt = 1
+        while True:
+            try:
+                return await request()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _cache_key(self, messages: Optional[List[BaseMessage]]) -> Optional[str]:
+        cache = get_llm_cache()
+        if cache is None or messages is None:
+            return None
+        return cache.key(self.model_type.name, self.name, self.config.temperature, messages)
+
+    def _invoke_cache_key(self, prompt: ChatPromptTemplate, input_variables: Optional[dict]) -> Optional[str]:
+        try:
+            return self._cache_key(prompt.format_messages(**(input_variables or {})))
+        except Exception:
+            return None # prompt can't be rendered (e.g. set with set_prompt_template), don't cache
+
+    def _cached_response(self, key: Optional[str]) -> Optional[AIMessage]:
+        if key is None:
+            return None
+        cache = get_llm_cache()
+        resp = cache.get(key)
+        if resp is None and cache.settings.mode == "readonly" and cache.settings.strict:
+            raise LLMCacheMiss(f"no cached response for this request to {self.name} (readonly LLM cache)")
+        if resp is not None:
+            named_log(self, "==> response replayed from the LLM cache")
+            # lets callers skip their request cooldown (see is_cached_response)
+            resp.response_metadata[CACHE_HIT_METADATA_KEY] = True
+        return resp
+
+    def _cache_response(self, key: Optional[str], resp: AIMessage):
+        cache = get_llm_cache()
+        if key is not None and cache.writable:
+            cache.set(key, self.name, resp)
+
+    def _invoke_prompt(self, prompt: ChatPromptTemplate, chain, input_variables: Optional[dict]) -> AIMessage:
+        cache_key = self._invoke_cache_key(prompt, input_variables)
+        if (resp := self._cached_response(cache_key)) is not None:
+            return self._strip_think(resp)
+        
+        estimated_tokens = self._estimate_prompt_tokens(prompt, input_variables)
+        resp = self._with_retries(lambda: self._rate_limited(chain.invoke, input_variables, estimated_tokens))
+        
+        self._cache_response(cache_key, resp)
+        return self._strip_think(resp)
 
+    async def _ainvoke_prompt(self, prompt: ChatPromptTemplate, chain, input_variables: Optional[dict]) -> AIMessage:
+        cache_key = self._invoke_cache_key(prompt, input_variables)
+        if (resp := self._cached_response(cache_key)) is not None:
+            return self._strip_think(resp)
+        
+        estimated_tokens = self._estimate_prompt_tokens(prompt, input_variables)
+        resp = await self._awith_retries(lambda: self._arate_limited(chain.ainvoke, input_variables, estimated_tokens))
+        
+        self._cache_response(cache_key, resp)
+        return self._strip_think(resp)
+
+    def invoke(self, input_variables: dict = None) -> AIMessage:
+        """
+        Invokes langchain LLM object and changes all the "input_variables" in the prompt template.
+        Must have called init_chain, set_prompt_template and (opt.) set_context_sysmsg before.
+        For concurrent use with different prompts, use bind_prompt instead
+        """
+        if self._chain is None:
+            raise RuntimeError("To call LLMHandler.invoke, the chain has to be initialized")
+        return self._invoke_prompt(self.prompt, self._chain, input_variables)
+
+    async def ainvoke(self, input_variables: dict = None) -> AIMessage:
+        """
+        Async version of invoke, using the chat model async support
+        """
+        if self._chain is None:
+            raise RuntimeError("To call LLMHandler.ainvoke, the chain has to be initialized")
+        return await self._ainvoke_prompt(self.prompt, self._chain, input_variables)
+
+    async def abatch_invoke(self, inputs: List[dict], max_concurrency: int = 4, return_exceptions: bool = False) -> List[AIMessage | Exception]:
+        """
+        Invoke the chain for every input variables in "inputs", with up to max_concurrency requests
+        in flight. Responses are returned in the same order as inputs.
+        With return_exceptions, a failed request returns its exception instead of raising it.
+        """
+        return await _gather_limited(self.ainvoke, inputs, max_concurrency, return_exceptions)
+
+    def batch_invoke(self, inputs: List[dict], max_concurrency: int = 4, return_exceptions: bool = False) -> List[AIMessage | Exception]:
+        """
+        Blocking version of abatch_invoke: up to max_concurrency requests run on worker threads,
+        so it doesn't start an event loop and can also be called while one is running
+        """
+        if self._chain is None:
+            raise RuntimeError("To call LLMHandler.batch_invoke, the chain has to be initialized")
+        return _map_limited(self.invoke, inputs, max_concurrency, return_exceptions)
+
+    def send_prompt(self, prompt: str) -> AIMessage:
+        try:
+            cache_key = self._cache_key([HumanMessage(content=prompt)] if isinstance(prompt, str) else convert_to_messages(prompt))
+        except Exception:
+            cache_key = None
+        if (resp := self._cached_response(cache_key)) is not None:
+            return self._strip_think(resp)
+        
+        resp = self._with_retries(lambda: self._rate_limited(self.model.invoke, prompt, estimate_tokens(str(prompt))))
+
+        self._cache_response(cache_key, resp)
+        return self._strip_think(resp)
+
+    def _strip_think(self, resp: AIMessage) -> AIMessage:
         if self.model_type == LLMType.Ollama:
             resp.content = re.sub(r"<think>[\s\S]*<\/think>", "", resp.content) # remove 'think' from deepseek
-
         return resp
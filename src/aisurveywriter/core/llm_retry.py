@@ -0,0 +1,110 @@
+from typing import NamedTuple, Optional
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from pydantic import BaseModel
+import asyncio
+import random
+import re
+
+# transient failures worth retrying, by HTTP status
+RETRYABLE_STATUS = {408: "timeout", 429: "rate_limit", 500: "server_error", 502: "server_error",
+                    503: "server_error", 504: "timeout", 529: "server_error"}
+
+# errors raised without a status (or with a status only in their message), by exception class name or message
+_REASON_PATTERNS = [
+    ("rate_limit", re.compile(r"\b429\b|rate.?limit|ResourceExhausted|resource.exhausted|quota", re.IGNORECASE)),
+    ("timeout", re.compile(r"Timeout|timed out|DeadlineExceeded|\b504\b", re.IGNORECASE)),
+    ("server_error", re.compile(r"\b50[023]\b|InternalServerError|ServiceUnavailable|overloaded", re.IGNORECASE)),
+    ("connection", re.compile(r"APIConnectionError|ConnectError|RemoteProtocolError|connection (?:reset|aborted|refused)", re.IGNORECASE)),
+]
+
+# retry hints in error messages: google "retry_delay { seconds: 37 }" / "'retryDelay': '37s'", openai "try again in 1.5s"
+_RETRY_DELAY_PATTERNS = [
+    re.compile(r"retry_?delay\W+(?:seconds:\s*)?(\d+(?:\.\d+)?)\s*s?", re.IGNORECASE),
+    re.compile(r"try again in (\d+(?:\.\d+)?)\s*(ms|s)\b", re.IGNORECASE),
+]
+
+class RetryPolicy(BaseModel):
+    """
+    How LLMHandler retries transient failures (rate limits, timeouts, 5xx, dropped connections):
+    exponential backoff from initial_delay_sec, capped at max_delay_sec, with full jitter.
+    A Retry-After hint from the provider replaces the backoff delay when it's longer.
+    """
+    # attempts in total, including the first request
+    max_attempts: int = 6
+    initial_delay_sec: float = 5
+    multiplier: float = 2
+    max_delay_sec: float = 300
+    # wait a random fraction of the backoff delay (0: exact delays; 1: full jitter)
+    jitter: float = 1.0
+    # Retry-After hints longer than this are treated as "don't retry" (e.g. a daily quota)
+    max_retry_after_sec: float = 900
+
+class RetryDecision(NamedTuple):
+    reason: str
+    status: Optional[int]
+    retry_after_sec: Optional[float]
+
+def error_status(e: Exception) -> Optional[int]:
+    for status in (getattr(e, "status_code", None), getattr(e, "code", None),
+                   getattr(getattr(e, "response", None), "status_code", None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+def retry_after_sec(e: Exception) -> Optional[float]:
+    """
+    Delay asked by the provider: Retry-After(-ms) response headers, or a retry delay in the error message
+    """
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            if (value := headers.get("retry-after-ms")) is not None:
+                return float(value) / 1000
+            if (value := headers.get("retry-after")) is not None:
+                try:
+                    return float(value)
+                except ValueError:
+                    return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+
+    message = str(e)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        if match := pattern.search(message):
+            delay = float(match.group(1))
+            if match.lastindex and match.lastindex > 1 and match.group(2).lower() == "ms":
+                delay /= 1000
+            return delay
+    return None
+
+def classify_error(e: Exception) -> Optional[RetryDecision]:
+    """
+    Why e is worth retrying, or None if it isn't transient
+    """
+    status = error_status(e)
+    if status is not None and status in RETRYABLE_STATUS:
+        return RetryDecision(RETRYABLE_STATUS[status], status, retry_after_sec(e))
+    if status is not None and 400 <= status < 500:
+        return None
+
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+        return RetryDecision("timeout", status, None)
+    if isinstance(e, ConnectionError):
+        return RetryDecision("connection", status, None)
+
+    description = f"{type(e).__name__}: {e}"
+    for reason, pattern in _REASON_PATTERNS:
+        if pattern.search(description):
+            return RetryDecision(reason, status, retry_after_sec(e))
+    return None
+
+def backoff_delay(policy: RetryPolicy, attempt: int, retry_after: Optional[float] = None, rng: random.Random = random) -> float:
+    """
+    Seconds to wait after the failed attempt number "attempt" (starting at 1)
+    """
+    delay = min(policy.max_delay_sec, policy.initial_delay_sec * policy.multiplier ** (attempt - 1))
+    delay -= delay * policy.jitter * rng.random()
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
@@ -1,13 +1,63 @@
-from typing import Optional
+from typing import Optional, List, Literal
 from pydantic import BaseModel
 import layoutparser as lp
+import numpy as np
+import pytesseract
 import os
-import copy
+import threading
 import requests
 
-def load_lp_model(config_path: str = 'lp://<dataset_name>/<model_name>/config',
-                  extra_config=None):
+from .pdf_text import TextWord
+from ..utils.helpers import default_cache_dir, file_sha256
+
+def lp_model_cache_dir() -> str:
+    return os.path.join(default_cache_dir(), "lp_models")
+
+def _checksum_path(path: str) -> str:
+    return path + ".sha256"
+
+def _verify_checksum(path: str) -> bool:
+    """
+    Check a model file against the SHA-256 computed locally when it was downloaded. This only
+    detects files truncated or corrupted on disk after the download (the digest comes from the
+    downloaded bytes, not from a trusted source), not a tampered download.
+    Files downloaded before checksums were stored are trusted and get one now.
+    """
+    if not os.path.isfile(path):
+        return False
+    
+    checksum = file_sha256(path)
+    if not os.path.isfile(_checksum_path(path)):
+        with open(_checksum_path(path), "w") as f:
+            f.write(checksum)
+        return True
+
+    with open(_checksum_path(path), "r") as f:
+        return f.read().strip() == checksum
+
+def _download_model_file(url: str, save_to_path: str):
+    # download to a temporary file and move it at once, so an interrupted download
+    # (or another process downloading the same file) never leaves a partial file behind
+    tmp_path = f"{save_to_path}.{os.getpid()}.part"
+    r = requests.get(url, stream=True, headers={'user-agent': 'Wget/1.16 (linux-gnu)'})
+    r.raise_for_status()
+    with open(tmp_path, "wb") as f:
+        for chunk in r.iter_content(chunk_size=1 << 20):
+            if chunk:
+                f.write(chunk)
 
+    with open(_checksum_path(tmp_path), "w") as f:
+        f.write(file_sha256(tmp_path))
+    os.replace(_checksum_path(tmp_path), _checksum_path(save_to_path))
+    os.replace(tmp_path, save_to_path)
+
+def load_lp_model(config_path: str = 'lp://<dataset_name>/<model_name>/config',
+                  extra_config=None, model_dir: Optional[str] = None):
+    """
+    Load a LayoutParser Detectron2 model from the catalog, downloading its weights
+    and config to model_dir/<dataset_name>/<model_name> (default: lp_model_cache_dir())
+    if they are missing or were corrupted on disk (see _verify_checksum).
+    """
     config_path_split = config_path.split('/')
     dataset_name = config_path_split[-3]
     model_name = config_path_split[-2]
@@ -18,29 +68,24 @@ def load_lp_model(config_path: str = 'lp://<dataset_name>/<model_name>/config',
     config_url = lp.models.detectron2.catalog.CONFIG_CATALOG[dataset_name][model_name]
 
     # override folder destination:
-    if 'model' not in os.listdir():
-        os.mkdir('model')
+    model_dir = os.path.join(model_dir if model_dir else lp_model_cache_dir(), dataset_name, model_name)
+    os.makedirs(model_dir, exist_ok=True)
 
     config_file_path, model_file_path = None, None
 
     for url in [model_url, config_url]:
         filename = url.split('/')[-1].split('?')[0]
-        save_to_path = f"model/" + filename
+        save_to_path = os.path.join(model_dir, filename)
         if 'config' in filename:
-            config_file_path = copy.deepcopy(save_to_path)
+            config_file_path = save_to_path
         if 'model_final' in filename:
-            model_file_path = copy.deepcopy(save_to_path)
+            model_file_path = save_to_path
 
-        # skip if file exist in path
-        if filename in os.listdir("model"):
+        # skip if file exist in path and is intact
+        if _verify_checksum(save_to_path):
             continue
         # Download file from URL
-        r = requests.get(url, stream=True, headers={'user-agent': 'Wget/1.16 (linux-gnu)'})
-
-        with open(save_to_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=4096):
-                if chunk:
-                    f.write(chunk)
+        _download_model_file(url, save_to_path)
 
     # load the label map
     label_map = lp.models.detectron2.catalog.LABEL_MAP_CATALOG[dataset_name]
@@ -52,10 +97,27 @@ def load_lp_model(config_path: str = 'lp://<dataset_name>/<model_name>/config',
         extra_config=extra_config,
     )
 
+# models loaded in this process, keyed by (config path, score threshold)
+_lp_model_registry: dict[tuple[str, float], lp.models.Detectron2LayoutModel] = {}
+_lp_model_registry_lock = threading.Lock()
+
+def get_lp_model(config_path: str, score_threshold: float = 0.8, model_dir: Optional[str] = None) -> lp.models.Detectron2LayoutModel:
+    """
+    Get a LayoutParser Detectron2 model, loading its weights only the first time
+    it is requested in this process
+    """
+    key = (config_path, score_threshold)
+    with _lp_model_registry_lock:
+        if key not in _lp_model_registry:
+            _lp_model_registry[key] = load_lp_model(config_path=config_path, model_dir=model_dir,
+                                                    extra_config=["MODEL.ROI_HEADS.SCORE_THRESH_TEST", score_threshold])
+        return _lp_model_registry[key]
+
 
 def init_lp_agents(config: str,
                    score_threshold: float = 0.8,
-                   tesseract_exectuable: str ="tesseract") -> tuple[lp.models.Detectron2LayoutModel, lp.TesseractAgent]:
+                   tesseract_exectuable: str ="tesseract",
+                   model_dir: Optional[str] = None) -> tuple[lp.models.Detectron2LayoutModel, lp.TesseractAgent]:
     """
     Initialize LayoutParser Detectron2 and OCR agents
     
@@ -63,20 +125,111 @@ def init_lp_agents(config: str,
         config (str): path to layoutparser detectron2 model config.
         score_threshold (float): score threshold configuration for detectron2 model
         tesseract_executable (str): OCR Tesseract execution command/path
+        model_dir (str): directory where model weights are cached (default: lp_model_cache_dir())
 
     Returns:
         det2_model: LayoutParser Detectron2 model
         ocr_agent: LayoutParser OCR Tesseract Agent
     """
-    det2_model = load_lp_model(config_path=config, extra_config=["MODEL.ROI_HEADS.SCORE_THRESH_TEST", score_threshold])
+    det2_model = get_lp_model(config, score_threshold, model_dir)
     ocr_agent = lp.TesseractAgent.with_tesseract_executable(tesseract_exectuable)
     
     return (det2_model, ocr_agent)
 
+def detect_layout_batch(model: lp.models.Detectron2LayoutModel, images: List[np.ndarray]) -> List[lp.Layout]:
+    """
+    Run Detectron2 layout detection on several page images with a single forward pass.
+    This reproduces what model.detect() does for one image (detectron2's DefaultPredictor),
+    but feeds all images to the underlying model at once.
+    
+    Parameters:
+        model (lp.models.Detectron2LayoutModel): loaded layout model
+        images (List[np.ndarray]): page images (RGB)
+
+    Returns:
+        layouts (List[lp.Layout]): detected layout for each image, in the same order
+    """
+    if len(images) == 1:
+        return [model.detect(images[0])]
+    
+    import torch
+    predictor = model.model
+    with torch.no_grad():
+        inputs = []
+        for image in images:
+            image = model.image_loader(image)
+            if predictor.input_format == "RGB":
+                image = image[:, :, ::-1]
+            height, width = image.shape[:2]
+            image = predictor.aug.get_transform(image).apply_image(image)
+            image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1)).to(predictor.cfg.MODEL.DEVICE)
+            inputs.append({"image": image, "height": height, "width": width})
+        
+        outputs = predictor.model(inputs)
+
+    return [model.gather_output(output) for output in outputs]
+
+class PageTesseractAgent:
+    """
+    OCR agent that runs tesseract once for a whole page image and returns
+    every recognized word with its box, instead of one tesseract run per block.
+    Words can then be assigned to layout blocks by coordinates (see pdf_text.block_text)
+    """
+    def __init__(self, tesseract_executable: str = "tesseract", languages: str = "eng"):
+        pytesseract.pytesseract.tesseract_cmd = tesseract_executable
+        self.languages = languages
+
+    def detect_words(self, image: np.ndarray) -> List[TextWord]:
+        data = pytesseract.image_to_data(image, lang=self.languages, output_type=pytesseract.Output.DICT)
+        
+        words: List[TextWord] = []
+        for i, text in enumerate(data["text"]):
+            if not text or not text.strip():
+                continue
+            x0, y0 = data["left"][i], data["top"][i]
+            x1, y1 = x0 + data["width"][i], y0 + data["height"][i]
+            line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            words.append(TextWord(x0, y0, x1, y1, text, line))
+        return words
+
 class LayoutParserSettings(BaseModel):
     config_path: Optional[str] = ""
     score_threshold: float = 0.7
     tesseract_executable: str = "tesseract"
+
+    # page rasterization: "pdf2image" (poppler) or "pymupdf" (in-process)
+    raster_backend: str = "pdf2image"
+    raster_dpi: int = 200
+
+    # read text blocks from the PDF text layer, using OCR only where there is none
+    use_text_layer: bool = False
+
+    # OCR backend: "block" (tesseract for every text block) or "page" (one tesseract pass per page)
+    ocr_backend: Literal["block", "page"] = "block"
+
+    # figure images: "crop" (from the rasterized page) or "embedded" (original image objects
+    # from the PDF, cropping only figures without a matching image, e.g. vector drawings)
+    figure_source: Literal["crop", "embedded"] = "crop"
+
+    # number of pages sent to the layout model in each forward pass
+    layout_batch_size: int = 1
+
+    # number of worker processes used to parse PDFs (1 = serial, in-process)
+    parse_workers: int = 1
+    # torch intra-op threads while parsing, in each worker or for the serial parse (None = torch default)
+    torch_threads: Optional[int] = None
+
+    # directory of the per-PDF parse cache (None = disabled)
+    parse_cache_dir: Optional[str] = None
+    # directory where layout model weights are stored (None = lp_model_cache_dir())
+    model_cache_dir: Optional[str] = None
+
+    def parse_settings_key(self) -> dict:
+        """
+        Settings that change the parsed content of a PDF, i.e. everything except
+        how and where the parsing runs
+        """
+        return self.model_dump(exclude={"parse_workers", "torch_threads", "parse_cache_dir", "model_cache_dir"})
     
 
 class LayoutParserAgents:
@@ -84,14 +237,30 @@ class LayoutParserAgents:
     
     model: lp.models.Detectron2LayoutModel
     ocr: lp.TesseractAgent
+    page_ocr: PageTesseractAgent
     
-    def __init__(self, settings: LayoutParserSettings):
-        self.settings = settings
-        self.model, self.ocr = init_lp_agents(settings.config_path, settings.score_threshold, settings.tesseract_executable)
-    
-    def __init__(self, config: str, score_threshold: float = 0.7, tesseract_executable: str = "tesseract"):
+    def __init__(self, config: str, score_threshold: float = 0.7, tesseract_executable: str = "tesseract", model_dir: Optional[str] = None):
         self.settings = LayoutParserSettings(config_path=config, score_threshold=score_threshold, 
-                                             tesseract_executable=tesseract_executable)
+                                             tesseract_executable=tesseract_executable, model_cache_dir=model_dir)
         
-        self.model, self.ocr = init_lp_agents(config, score_threshold, tesseract_executable)
-        
\ No newline at end of file
+        self.model, self.ocr = init_lp_agents(config, score_threshold, tesseract_executable, model_dir)
+        self.page_ocr = PageTesseractAgent(tesseract_executable)
+
+    def detect_layouts(self, images: List[np.ndarray]) -> List[lp.Layout]:
+        return detect_layout_batch(self.model, images)
+
+# warm agents shared by every PDFProcessor in this process
+_lp_agents_registry: dict[tuple[str, float, str], LayoutParserAgents] = {}
+_lp_agents_registry_lock = threading.Lock()
+
+def get_lp_agents(settings: LayoutParserSettings) -> LayoutParserAgents:
+    """
+    Get the LayoutParserAgents for these settings, creating them only the first time
+    they are requested in this process
+    """
+    key = (settings.config_path, settings.score_threshold, settings.tesseract_executable)
+    with _lp_agents_registry_lock:
+        if key not in _lp_agents_registry:
+            _lp_agents_registry[key] = LayoutParserAgents(settings.config_path, settings.score_threshold,
+                                                          settings.tesseract_executable, settings.model_cache_dir)
+        return _lp_agents_registry[key]
@@ -0,0 +1,113 @@
+from typing import List, Optional
+from contextlib import contextmanager
+from time import perf_counter
+from pydantic import BaseModel, Field
+import json
+import sys
+
+# stages timed by PDFProcessor, in pipeline order
+PARSE_STAGES = ["rasterize", "layout_detect", "nms", "ocr", "caption", "image_save", "bibtex_lookup"]
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process in MB, or None where it isn't available (Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _add_time(stages: dict[str, float], stage: str, seconds: float):
+    stages[stage] = stages.get(stage, 0.0) + seconds
+
+class PageParseStats(BaseModel):
+    page: int
+    # seconds spent in each stage
+    stages: dict[str, float] = Field(default_factory=dict)
+
+    def add(self, stage: str, seconds: float):
+        _add_time(self.stages, stage, seconds)
+
+    @contextmanager
+    def stage(self, stage: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, perf_counter() - start)
+
+class DocumentParseStats(BaseModel):
+    path: str
+    # loaded from the parse cache instead of parsed
+    cached: bool = False
+    pages: List[PageParseStats] = Field(default_factory=list)
+    # totals for every stage: page stages summed plus document-level stages (bibtex lookup)
+    stages: dict[str, float] = Field(default_factory=dict)
+    # parse time plus the document-level stages
+    total_sec: float = 0.0
+    # peak RSS of the process that parsed the document, when it finished
+    peak_rss_mb: Optional[float] = None
+
+    def page(self, page_num: int) -> PageParseStats:
+        while len(self.pages) <= page_num:
+            self.pages.append(PageParseStats(page=len(self.pages)))
+        return self.pages[page_num]
+
+    @contextmanager
+    def stage(self, stage: str):
+        """
+        Time a document-level stage. These run outside the page parsing (e.g. the bibtex lookup after
+        parsing or loading from the cache), so their time is added to total_sec as well
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            _add_time(self.stages, stage, elapsed)
+            self.total_sec += elapsed
+
+    def finish(self, parse_sec: float):
+        """
+        Sum the page stages into the document stages and add the parse time to total_sec
+        """
+        for page in self.pages:
+            for stage, seconds in page.stages.items():
+                _add_time(self.stages, stage, seconds)
+        self.total_sec += parse_sec
+        self.peak_rss_mb = peak_rss_mb()
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{stage}: {self.stages[stage]:.2f} s" for stage in PARSE_STAGES if stage in self.stages)
+        return f"{len(self.pages)} pages in {self.total_sec:.2f} s ({stages})"
+
+class ParseStats(BaseModel):
+    documents: List[DocumentParseStats] = Field(default_factory=list)
+    workers: int = 1
+    wall_time_sec: float = 0.0
+    # peak RSS over the main process and every worker process
+    peak_rss_mb: Optional[float] = None
+
+    def stage_totals(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        for doc in self.documents:
+            for stage, seconds in doc.stages.items():
+                _add_time(totals, stage, seconds)
+        return totals
+
+    def page_count(self) -> int:
+        return sum(len(doc.pages) for doc in self.documents if not doc.cached)
+
+    def pages_per_sec(self) -> float:
+        return self.page_count() / self.wall_time_sec if self.wall_time_sec else 0.0
+
+    def save_json(self, path: str):
+        data = self.model_dump()
+        data["stage_totals"] = self.stage_totals()
+        data["pages_per_sec"] = self.pages_per_sec()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,80 @@
+from typing import List, NamedTuple, Optional
+import pymupdf
+
+class EmbeddedImage(NamedTuple):
+    xref: int
+    # placement on the page, in page image pixel coordinates
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+def embedded_images(page: pymupdf.Page, image_width: int, image_height: int, min_size: float = 32) -> List[EmbeddedImage]:
+    """
+    Get every image object drawn on a PDF page, with its placement mapped to the
+    pixel space of the page rasterized with size (image_width, image_height).
+    Placements smaller than min_size pixels (icons, logos, decorations) are ignored.
+    """
+    scale = pymupdf.Matrix(image_width / page.rect.width, image_height / page.rect.height)
+    transform = page.rotation_matrix * scale
+
+    images: List[EmbeddedImage] = []
+    # the same image object can be listed more than once, but get_image_rects already returns all its placements
+    xrefs = dict.fromkeys(image_info[0] for image_info in page.get_images(full=True))
+    for xref in xrefs:
+        for rect in page.get_image_rects(xref):
+            rect = rect * transform
+            if rect.width < min_size or rect.height < min_size:
+                continue
+            images.append(EmbeddedImage(xref, rect.x0, rect.y0, rect.x1, rect.y1))
+    return images
+
+def match_embedded_image(images: List[EmbeddedImage], coordinates: tuple[float, float, float, float], min_iou: float = 0.5) -> Optional[EmbeddedImage]:
+    """
+    Find the embedded image whose placement best overlaps a figure block with (x1, y1, x2, y2) coordinates.
+    Returns None if no image overlaps it with IoU >= min_iou (e.g. vector-drawn figures,
+    or figures made of several images)
+    """
+    x1, y1, x2, y2 = coordinates
+    block_area = (x2 - x1) * (y2 - y1)
+
+    best_image, best_iou = None, min_iou
+    for image in images:
+        intersection_w = min(x2, image.x1) - max(x1, image.x0)
+        intersection_h = min(y2, image.y1) - max(y1, image.y0)
+        if intersection_w <= 0 or intersection_h <= 0:
+            continue
+
+        intersection_area = intersection_w * intersection_h
+        image_area = (image.x1 - image.x0) * (image.y1 - image.y0)
+        iou = intersection_area / (block_area + image_area - intersection_area)
+        if iou >= best_iou:
+            best_image, best_iou = image, iou
+
+    return best_image
+
+def save_embedded_image(doc: pymupdf.Document, xref: int, path_without_ext: str) -> str:
+    """
+    Save an embedded image with its original resolution. PNG and JPEG streams are written
+    as they are; anything else (JPX, JBIG2, CMYK, images with soft masks) is converted to PNG.
+
+    Returns:
+        path (str): path of the saved image, with its extension
+    """
+    image = doc.extract_image(xref)
+    ext = image["ext"].lower()
+    if ext in ["png", "jpeg", "jpg"] and not image.get("smask"):
+        path = f"{path_without_ext}.{'jpg' if ext == 'jpeg' else ext}"
+        with open(path, "wb") as f:
+            f.write(image["image"])
+        return path
+
+    pixmap = pymupdf.Pixmap(doc, xref)
+    if pixmap.colorspace and pixmap.colorspace.n > 3:
+        pixmap = pymupdf.Pixmap(pymupdf.csRGB, pixmap)
+    if image.get("smask"):
+        pixmap = pymupdf.Pixmap(pixmap, pymupdf.Pixmap(doc, image["smask"]))
+
+    path = f"{path_without_ext}.png"
+    pixmap.save(path)
+    return path
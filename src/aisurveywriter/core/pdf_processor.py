@@ -1,17 +1,26 @@
-from typing import List, Optional
+from typing import List, Optional, Iterator, Iterable
 import layoutparser as lp
-import pdf2image
 import numpy as np
 import cv2
 from PIL import Image
+import pymupdf
 import re
 import os
-from scipy.spatial import KDTree
+import multiprocessing
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from .document import Document, DocPage, DocFigure
-from .lp_handler import LayoutParserAgents, LayoutParserSettings
+from .lp_handler import LayoutParserAgents, LayoutParserSettings, get_lp_agents
+from .pdf_render import iter_pdf_pages, pdf_page_count
+from .pdf_text import TextWord, text_layer_words, block_text, is_usable_text
+from .pdf_figures import embedded_images, match_embedded_image, save_embedded_image
+from .parse_stats import ParseStats, DocumentParseStats, PageParseStats, peak_rss_mb
+from ..store.parse_cache import ParseCache
 from ..utils.logger import named_log
 from ..utils.helpers import get_bibtex_entry
+from ..utils.bib_cache import BibCacheSettings, bib_cache_settings, configure_bib_cache
+from ..utils.crossref import CrossrefSettings, crossref_settings, configure_crossref
 
 def sort_blocks_article_layout(blocks, page_width, page_height) -> lp.Layout:
     """
@@ -77,57 +86,122 @@ def blocks_iou(block1, block2):
     iou = intersection_area / float(block1_area + block2_area - intersection_area)
     return iou
 
+def layout_boxes(blocks) -> np.ndarray:
+    """
+    Coordinates of all blocks as an (N, 4) array of (x1, y1, x2, y2)
+    """
+    return np.array([b.coordinates for b in blocks], dtype=np.float64).reshape(-1, 4)
+
+def blocks_iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Compute the IoU between every pair of boxes from boxes1 (N, 4) and boxes2 (M, 4)
+    at once. Same as blocks_iou for every pair, returned as an (N, M) matrix.
+    """
+    x_left = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    y_top = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    x_right = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+    y_bottom = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+
+    overlaps = (x_right >= x_left) & (y_bottom >= y_top)
+    intersection_area = np.where(overlaps, (x_right - x_left) * (y_bottom - y_top), 0.0)
+
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union_area = area1[:, None] + area2[None, :] - intersection_area
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = np.where(union_area > 0, intersection_area / union_area, 0.0)
+    return iou
+
+def suppress_overlapping_blocks(blocks, other_blocks, iou_threshold: float = 0.8) -> lp.Layout:
+    """
+    Remove every block from "blocks" that has IoU > iou_threshold with any block
+    in "other_blocks" (e.g. text detected inside figures)
+    """
+    if len(blocks) == 0 or len(other_blocks) == 0:
+        return lp.Layout(list(blocks))
+
+    iou = blocks_iou_matrix(layout_boxes(blocks), layout_boxes(other_blocks))
+    keep = ~(iou > iou_threshold).any(axis=1)
+    return lp.Layout([b for b, k in zip(blocks, keep) if k])
+
 def layout_nms(blocks, iou_threshold: float = 0.8, neighbors_radius: float = 1.5) -> lp.Layout:
     """
     Apply Non-Maximum Supression to remove duplicate blocks by comparing the IOU
     to "iou_threshold" between the "anchor" block and all neighbors over a radius 
-    of "neighbors_radius", using KDTree for fast-neighbor search.
+    of "neighbors_radius" (relative to the average block size).
+    
+    The IoU, neighbor distance and type masks are computed for all pairs at once,
+    and the suppression visits blocks and their neighbors in index order.
     """
     if not blocks:
         return blocks
     
-    # create kdtree based on centers
-    centers = np.array([[(b.coordinates[0] + b.coordinates[2]) / 2, 
-                        (b.coordinates[1] + b.coordinates[3]) / 2] for b in blocks])
-    blocks_kdtree = KDTree(centers)
-    
+    boxes = layout_boxes(blocks)
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    areas = widths * heights
+    centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
     # search with radius based on average size
-    avg_width = np.mean([b.coordinates[2] - b.coordinates[0] for b in blocks])
-    avg_height = np.mean([b.coordinates[3] - b.coordinates[1] for b in blocks])
-    search_radius = max(avg_width, avg_height) * neighbors_radius
+    search_radius = max(np.mean(widths), np.mean(heights)) * neighbors_radius
+    distances = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis=-1)
+    
+    type_ids = {}
+    types = np.array([type_ids.setdefault(b.type, len(type_ids)) for b in blocks])
+    candidates = ((distances <= search_radius)
+                  & (types[:, None] == types[None, :])
+                  & (blocks_iou_matrix(boxes, boxes) >= iou_threshold))
+    np.fill_diagonal(candidates, False)
 
-    blocks_to_remove = set()
-    for i, block in enumerate(blocks):
-        if i in blocks_to_remove:
+    # only blocks with at least one duplicate candidate need to be visited
+    removed = np.zeros(len(blocks), dtype=bool)
+    for i in np.flatnonzero(candidates.any(axis=1)):
+        if removed[i]:
             continue
         
-        neighbor_indices = blocks_kdtree.query_ball_point(centers[i], search_radius)
-        for j in neighbor_indices:
-            if i == j or j in blocks_to_remove or block.type != blocks[j].type:
-                continue
-        
-            if blocks_iou(blocks[i], blocks[j]) < iou_threshold:
-                continue
-            
+        for j in np.flatnonzero(candidates[i] & ~removed):
             # keep the one block which has higher area
-            area_i = (block.coordinates[2] - block.coordinates[0]) * (block.coordinates[3] - block.coordinates[1])
-            area_j = (blocks[j].coordinates[2] - blocks[j].coordinates[0]) * (blocks[j].coordinates[3] - blocks[j].coordinates[1])
-            if area_i < area_j:
-                blocks_to_remove.add(i)
+            if areas[i] < areas[j]:
+                removed[i] = True
                 break
             else:
-                blocks_to_remove.add(j)
-                
-    filtered_blocks = [b for i, b in enumerate(blocks) if i not in blocks_to_remove]
+                removed[j] = True
+    
+    filtered_blocks = [b for i, b in enumerate(blocks) if not removed[i]]
     return lp.Layout(filtered_blocks)
         
 
 
+# processor owned by each PDFProcessor worker process (see _init_parse_worker)
+_worker_processor = None
+
+def _init_parse_worker(lp_settings: LayoutParserSettings, images_output_dir: str, parse_threads: int,
+                       bib_cache: BibCacheSettings, crossref: CrossrefSettings):
+    """
+    Initializer for PDFProcessor worker processes. Builds one processor per worker,
+    so the layout parser agents are loaded only once in each process.
+    """
+    global _worker_processor
+    configure_bib_cache(bib_cache)
+    configure_crossref(crossref)
+    if lp_settings.torch_threads:
+        import torch
+        torch.set_num_threads(lp_settings.torch_threads)
+    
+    _worker_processor = PDFProcessor([], lp_settings, images_output_dir, parse_threads, parse_on_init=False)
+
+def _parse_pdf_worker(pdf_path: str) -> tuple[Document, DocumentParseStats]:
+    doc_stats = DocumentParseStats(path=pdf_path)
+    return _worker_processor.parse_pdf(pdf_path, doc_stats, lookup_bibtex=False), doc_stats
+
+
 class PDFProcessor:
     def __init__(self, pdf_paths: List[str],
                  lp_settings: LayoutParserSettings,
                  images_output_dir: str = "output",
-                 parse_threads: int = 3):
+                 parse_threads: int = 3,
+                 parse_on_init: bool = True):
         # check and use existing pdf paths
         self.pdf_paths: List[str] = []
         for path in pdf_paths:
@@ -136,19 +210,29 @@ class PDFProcessor:
             else:
                 self.pdf_paths.append(path)
         
-        # create layout parser agents
-        self.lp_agents = LayoutParserAgents(lp_settings.config_path, lp_settings.score_threshold,
-                                             lp_settings.tesseract_executable)
+        # layout parser agents are only loaded when a page is parsed in this process,
+        # and are shared with every other processor using the same settings
+        self.lp_settings = lp_settings
+        self._lp_agents: LayoutParserAgents = None
         
         self.images_output_dir = images_output_dir
         os.makedirs(self.images_output_dir, exist_ok=True)
         
         # parse pdfs to Documents
         self.documents: List[Document] = []
+        # per-stage timings and memory of the last parse_pdfs call
+        self.parse_stats: Optional[ParseStats] = None
 
         self._parser_threads = parse_threads
         self._caption_pattern = re.compile(r"^(fig|figure|figura|scheme)(?:.+?)(\d+)", re.IGNORECASE)
-        self.parse_pdfs()
+        if parse_on_init:
+            self.parse_pdfs()
+    
+    @property
+    def lp_agents(self) -> LayoutParserAgents:
+        if self._lp_agents is None:
+            self._lp_agents = get_lp_agents(self.lp_settings)
+        return self._lp_agents
         
     def parse_pdfs(self, reload=False) -> List[Document]:
         """
@@ -156,6 +240,16 @@ class PDFProcessor:
         for every file. All images gathered are save in the directory
         self.images_output_dir
         
+        If lp_settings.parse_workers > 1, the PDFs are distributed over a pool of
+        worker processes. Documents are always returned in the same order as self.pdf_paths.
+        
+        If lp_settings.parse_cache_dir is set, PDFs already parsed with the same settings
+        are loaded from the cache and only the cache misses are parsed. The cache only holds
+        the parsed content: bibtex entries are looked up for every document afterwards
+        (through the bibliography cache), so a failed lookup isn't kept with the document.
+        
+        Timings of every stage, per page and per document, are stored in self.parse_stats.
+        
         This is called within the constructor. If "reload" is provided,
         it will parse all PDFs again, discarding those parsed in the constructor.
         """
@@ -164,149 +258,349 @@ class PDFProcessor:
         if self.documents and not reload:
             return self.documents
         
-        pdf_amount = len(self.pdf_paths)
-        for pdf_i, pdf_path in enumerate(self.pdf_paths):
-            print()
-            named_log(self, f"started processing PDF {pdf_i+1}/{pdf_amount}:", os.path.basename(pdf_path))
-            
-            page_images = pdf2image.convert_from_path(pdf_path, thread_count=self._parser_threads)
-            page_images = [img.convert("RGB") for img in page_images]
-            page_amount = len(page_images)
-
-            doc_pages: List[DocPage] = []
-            doc_figures: List[DocFigure] = []            
-            doc_title: str = None
-            doc_authors: str = None
-            title_layout: lp.Layout = None
-            for page_num, page_image in enumerate(page_images):
-
-                # look for title and author if on first page
-                if page_num == 0:
-                    doc_page, page_figures, title_layout = self._parse_page_image(page_image, pdf_path, page_num, return_layout=True)
-                    title_blocks = [b for b in title_layout if b.type == "Title"]
-                    if title_blocks:
-                        doc_title = title_blocks[0].text.replace("\n", " ").strip()
-                        # assume our authors names are on text block closest and below to the title
-                        min_distance = float("inf")
-                        authors_block = None
-                        title_center = np.array([(title_blocks[0].coordinates[0] + title_blocks[0].coordinates[2]) / 2, (title_blocks[0].coordinates[1] + title_blocks[0].coordinates[3]) / 2])
-                        for block in title_layout:
-                            if block.type != "Text":
-                                continue
-                            block_center = np.array([(block.coordinates[0] + block.coordinates[2]) / 2, (block.coordinates[1] + block.coordinates[3]) / 2])
-                            if block_center[1] < title_center[1]:
-                                continue
-                            
-                            distance = np.linalg.norm(title_center - block_center)
-                            if distance < min_distance:
-                                authors_block = block
-                                break
-                        
-                        if authors_block:
-                            doc_authors = authors_block.text.replace("\n", " ").strip()
-                            
-                else:    
-                    doc_page, page_figures = self._parse_page_image(page_image, pdf_path, page_num)
-
-                doc_pages.append(doc_page)
-                doc_figures.extend(page_figures)
-                named_log(self, f"processed page {page_num+1}/{page_amount}, figures with caption extracted: {len([fig for fig in page_figures if fig.caption])}")
+        start = perf_counter()
+        documents: List[Optional[Document]] = [None] * len(self.pdf_paths)
+        doc_stats: List[DocumentParseStats] = [DocumentParseStats(path=pdf_path) for pdf_path in self.pdf_paths]
+        parse_cache = None
+        if self.lp_settings.parse_cache_dir:
+            parse_cache = ParseCache(self.lp_settings.parse_cache_dir, self.lp_settings)
+            for i, pdf_path in enumerate(self.pdf_paths):
+                documents[i] = parse_cache.load(pdf_path, self.images_output_dir)
+                doc_stats[i].cached = documents[i] is not None
+            named_log(self, f"parse cache: {parse_cache.hits} hits, {parse_cache.misses} misses")
+        
+        miss_indices = [i for i, doc in enumerate(documents) if doc is None]
+        miss_paths = [self.pdf_paths[i] for i in miss_indices]
+        
+        workers = min(self.lp_settings.parse_workers, len(miss_paths))
+        if workers <= 1:
+            # torch_threads only applies to the parse: restore the thread count used by the rest of the run
+            previous_threads = None
+            if self.lp_settings.torch_threads and miss_paths:
+                import torch
+                previous_threads = torch.get_num_threads()
+                torch.set_num_threads(self.lp_settings.torch_threads)
             
-            # try to get bibtex entry
+            parsed = []
             try:
-                bibtex_entry = get_bibtex_entry(doc_title, None)
-                if not bibtex_entry:
-                    named_log(self, "unable to get bibtex entry for", pdf_path)
-            except Exception as e:
-                named_log(self, "exception raised when getting pdf bibtex entry:", e)
-                bibtex_entry = None        
-            
-            if bibtex_entry:
-                pdf_basename = os.path.basename(pdf_path).removesuffix(".pdf")
-                # clean basename to have only valid characters
-                pdf_basename = re.sub(r"\W|^(?=\d)", "_", pdf_basename)
-                # use authors from bibtex entry if found
-                doc_authors = bibtex_entry.get("author", doc_authors)
-                bibtex_entry["ID"] = f"key_pdf{pdf_basename}"
-            
-            doc = Document(
-                path=pdf_path, 
-                title=doc_title,
-                author=doc_authors,
-                bibtex_entry=bibtex_entry,
-                pages=doc_pages,
-                figures=doc_figures,
-            )
-            self.documents.append(doc)
-
+                for pdf_i, (i, pdf_path) in enumerate(zip(miss_indices, miss_paths)):
+                    print()
+                    named_log(self, f"started processing PDF {pdf_i+1}/{len(miss_paths)}:", os.path.basename(pdf_path))
+                    parsed.append((self.parse_pdf(pdf_path, doc_stats[i], lookup_bibtex=False), doc_stats[i]))
+            finally:
+                if previous_threads is not None:
+                    torch.set_num_threads(previous_threads)
+        else:
+            parsed = self._parse_pdfs_pool(miss_paths, workers)
+        
+        for i, (doc, stats) in zip(miss_indices, parsed):
+            documents[i] = doc
+            doc_stats[i] = stats
+            if parse_cache:
+                parse_cache.save(doc.path, doc)
+        
+        self._lookup_bibtex_entries(documents, doc_stats)
+        
+        rss_values = [rss for rss in [peak_rss_mb()] + [stats.peak_rss_mb for stats in doc_stats] if rss is not None]
+        self.parse_stats = ParseStats(
+            documents=doc_stats,
+            workers=max(1, workers),
+            wall_time_sec=perf_counter() - start,
+            peak_rss_mb=max(rss_values) if rss_values else None,
+        )
+        named_log(self, f"parsed {self.parse_stats.page_count()} pages in {self.parse_stats.wall_time_sec:.2f} s "
+                        f"({self.parse_stats.pages_per_sec():.2f} pages/s), peak RSS: {self.parse_stats.peak_rss_mb} MB")
+        
+        self.documents = documents
         return self.documents
 
-    def _parse_page_image(self, page_image: Image.Image, source_pdf: str, page_num: int, return_layout=False) -> tuple[DocPage, List[DocFigure], Optional[lp.Layout]]:
+    def _parse_pdfs_pool(self, pdf_paths: List[str], workers: int) -> List[tuple[Document, DocumentParseStats]]:
+        named_log(self, f"parsing {len(pdf_paths)} PDFs with {workers} worker processes")
+        
+        # spawn instead of fork: torch and detectron2 are not fork-safe once initialized
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_parse_worker,
+                                 initargs=(self.lp_settings, self.images_output_dir, self._parser_threads, bib_cache_settings(), crossref_settings())) as executor:
+            # map keeps the results in the same order as the input paths
+            results = []
+            for pdf_i, (doc, doc_stats) in enumerate(executor.map(_parse_pdf_worker, pdf_paths)):
+                named_log(self, f"finished processing PDF {pdf_i+1}/{len(pdf_paths)}:", os.path.basename(doc.path), "-", doc_stats.summary())
+                results.append((doc, doc_stats))
+        
+        return results
+
+    def parse_pdf(self, pdf_path: str, doc_stats: Optional[DocumentParseStats] = None, lookup_bibtex: bool = True) -> Document:
+        """
+        Parse a single PDF into a Document: rasterize each page, detect the layout,
+        read the text blocks (from the PDF text layer if enabled, otherwise OCR), 
+        extract the figures and, with lookup_bibtex, look up its bibtex entry
+        
+        If doc_stats is provided, the time spent in every stage is recorded on it
+        """
+        start = perf_counter()
+        if doc_stats is None:
+            doc_stats = DocumentParseStats(path=pdf_path)
+        
+        # pages are rendered lazily, as the loop below consumes them
+        backend = self.lp_settings.raster_backend
+        page_amount = pdf_page_count(pdf_path, backend)
+        page_images = iter_pdf_pages(pdf_path, backend, self.lp_settings.raster_dpi, self._parser_threads)
+        # the PDF itself is only opened if text or figures are read from it
+        open_pdf = self.lp_settings.use_text_layer or self.lp_settings.figure_source == "embedded"
+        pdf_doc = pymupdf.open(pdf_path) if open_pdf else None
+
+        doc_pages: List[DocPage] = []
+        doc_figures: List[DocFigure] = []            
+        doc_title: str = None
+        doc_authors: str = None
+        title_layout: lp.Layout = None
+        page_images = self._timed_pages(page_images, doc_stats)
+        for page_num, page_image, page_layout in self._detect_page_layouts(page_images, doc_stats):
+            pdf_page = pdf_doc[page_num] if pdf_doc else None
+            page_stats = doc_stats.page(page_num)
+
+            # look for title and author if on first page
+            if page_num == 0:
+                doc_page, page_figures, title_layout = self._parse_page_image(page_image, pdf_path, page_num, return_layout=True, 
+                                                                              layout=page_layout, pdf_page=pdf_page, page_stats=page_stats)
+                title_blocks = [b for b in title_layout if b.type == "Title"]
+                if title_blocks:
+                    doc_title = title_blocks[0].text.replace("\n", " ").strip()
+                    # assume our authors names are on text block closest and below to the title
+                    min_distance = float("inf")
+                    authors_block = None
+                    title_center = np.array([(title_blocks[0].coordinates[0] + title_blocks[0].coordinates[2]) / 2, (title_blocks[0].coordinates[1] + title_blocks[0].coordinates[3]) / 2])
+                    for block in title_layout:
+                        if block.type != "Text":
+                            continue
+                        block_center = np.array([(block.coordinates[0] + block.coordinates[2]) / 2, (block.coordinates[1] + block.coordinates[3]) / 2])
+                        if block_center[1] < title_center[1]:
+                            continue
+                        
+                        distance = np.linalg.norm(title_center - block_center)
+                        if distance < min_distance:
+                            authors_block = block
+                            break
+                    
+                    if authors_block:
+                        doc_authors = authors_block.text.replace("\n", " ").strip()
+                        
+            else:    
+                doc_page, page_figures = self._parse_page_image(page_image, pdf_path, page_num, layout=page_layout, pdf_page=pdf_page, page_stats=page_stats)
+
+            doc_pages.append(doc_page)
+            doc_figures.extend(page_figures)
+            named_log(self, f"processed page {page_num+1}/{page_amount}, figures with caption extracted: {len([fig for fig in page_figures if fig.caption])}")
+        
+        if pdf_doc:
+            pdf_doc.close()
+        
+        doc_stats.finish(perf_counter() - start)
+        named_log(self, f"parsed {os.path.basename(pdf_path)}:", doc_stats.summary())
+        
+        document = Document(
+            path=pdf_path, 
+            title=doc_title,
+            author=doc_authors,
+            pages=doc_pages,
+            figures=doc_figures,
+        )
+        if lookup_bibtex:
+            self.lookup_bibtex_entry(document, doc_stats)
+        return document
+
+    def lookup_bibtex_entry(self, document: Document, doc_stats: Optional[DocumentParseStats] = None):
+        """
+        Look up the bibtex entry of a parsed document by its title, using the entry authors when found.
+        The entry key is derived from the current document path.
+        """
+        if doc_stats is None:
+            doc_stats = DocumentParseStats(path=document.path)
+        try:
+            with doc_stats.stage("bibtex_lookup"):
+                bibtex_entry = get_bibtex_entry(document.title, None)
+            if not bibtex_entry:
+                named_log(self, "unable to get bibtex entry for", document.path)
+        except Exception as e:
+            named_log(self, "exception raised when getting pdf bibtex entry:", e)
+            bibtex_entry = None
+        
+        if bibtex_entry:
+            pdf_basename = os.path.basename(document.path).removesuffix(".pdf")
+            # clean basename to have only valid characters
+            pdf_basename = re.sub(r"\W|^(?=\d)", "_", pdf_basename)
+            # use authors from bibtex entry if found
+            document.author = bibtex_entry.get("author", document.author)
+            bibtex_entry["ID"] = f"key_pdf{pdf_basename}"
+        document.bibtex_entry = bibtex_entry
+
+    def _lookup_bibtex_entries(self, documents: List[Document], doc_stats: List[DocumentParseStats]):
+        """
+        Look up the bibtex entries of all documents concurrently (with the CrossRef resolver workers)
+        """
+        workers = min(crossref_settings().max_workers, len(documents))
+        if workers <= 1:
+            for document, stats in zip(documents, doc_stats):
+                self.lookup_bibtex_entry(document, stats)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self.lookup_bibtex_entry, documents, doc_stats))
+
+    def _timed_pages(self, page_images: Iterable[Image.Image], doc_stats: DocumentParseStats) -> Iterator[Image.Image]:
+        """
+        Record the time spent rendering each page as it is consumed
+        """
+        page_images = iter(page_images)
+        page_num = 0
+        while True:
+            start = perf_counter()
+            page_image = next(page_images, None)
+            if page_image is None:
+                return
+            doc_stats.page(page_num).add("rasterize", perf_counter() - start)
+            yield page_image
+            page_num += 1
+
+    def _detect_page_layouts(self, page_images: Iterable[Image.Image], doc_stats: Optional[DocumentParseStats] = None) -> Iterator[tuple[int, Image.Image, lp.Layout]]:
+        """
+        Detect the layout of pages in batches of lp_settings.layout_batch_size,
+        yielding (page number, page image, page layout) for every page in order
+        """
+        batch_size = max(1, self.lp_settings.layout_batch_size)
+        batch: List[tuple[int, Image.Image]] = []
+        for page_num, page_image in enumerate(page_images):
+            batch.append((page_num, page_image))
+            if len(batch) < batch_size:
+                continue
+            yield from self._detect_batch(batch, doc_stats)
+            batch = []
+        
+        if batch:
+            yield from self._detect_batch(batch, doc_stats)
+
+    def _detect_batch(self, batch: List[tuple[int, Image.Image]], doc_stats: Optional[DocumentParseStats] = None) -> List[tuple[int, Image.Image, lp.Layout]]:
+        start = perf_counter()
+        layouts = self.lp_agents.detect_layouts([np.array(page_image) for _, page_image in batch])
+        if doc_stats is not None:
+            # a batch is a single forward pass, so its time is split evenly over its pages
+            elapsed = (perf_counter() - start) / len(batch)
+            for page_num, _ in batch:
+                doc_stats.page(page_num).add("layout_detect", elapsed)
+        return [(page_num, page_image, layout) for (page_num, page_image), layout in zip(batch, layouts)]
+
+    def _text_layer_words(self, pdf_page: pymupdf.Page, page_image: Image.Image, min_chars: int = 20) -> Optional[List[TextWord]]:
+        """
+        Get the text layer words of a page, in page image coordinates.
+        Returns None if the page has no usable text layer (e.g. scanned pages)
+        """
+        words = text_layer_words(pdf_page, page_image.width, page_image.height)
+        if not is_usable_text(" ".join(word.text for word in words), min_chars=min_chars):
+            return None
+        return words
+
+    def _parse_page_image(self, page_image: Image.Image, source_pdf: str, page_num: int, return_layout=False, 
+                          layout: Optional[lp.Layout] = None, pdf_page: Optional[pymupdf.Page] = None,
+                          page_stats: Optional[PageParseStats] = None) -> tuple[DocPage, List[DocFigure], Optional[lp.Layout]]:
+        if page_stats is None:
+            page_stats = PageParseStats(page=page_num)
         img_np = np.array(page_image)
         page_width, page_height = page_image.width, page_image.height
         source_basename = os.path.basename(source_pdf)
         source_basename = source_basename[:source_basename.rfind(".pdf")]
         
-        # parse layout blocks and sort them
-        layout = self.lp_agents.model.detect(img_np)
-        layout = sort_blocks_article_layout(layout, page_width, page_height)
-
-                
-        # separate between text and figure blocks
-        text_blocks = lp.Layout([b for b in layout if b.type in ["Text", "Title", "List"]])
-        figure_blocks = lp.Layout([b for b in layout if b.type == "Figure"])
-        
-        # remove text detected within figures by comparing iou
-        text_blocks = lp.Layout([b for b in text_blocks if not any(blocks_iou(b, b_fig)>0.8 for b_fig in figure_blocks)])
-        
-        layout = text_blocks + figure_blocks
+        # parse layout blocks (if not already detected in a batch) and sort them
+        if layout is None:
+            with page_stats.stage("layout_detect"):
+                layout = self.lp_agents.model.detect(img_np)
         
-        # remove duplicates with NMS
-        layout = layout_nms(layout)
+        with page_stats.stage("nms"):
+            layout = sort_blocks_article_layout(layout, page_width, page_height)
 
-        # extract text from text blocks using OCR
-        page_text: List[str] = []
-        for block in text_blocks:
-            # crop text block from page image
-            segment_image = block.pad(left=5,right=5,top=5,bottom=5).crop_image(img_np)
+            # separate between text and figure blocks
+            text_blocks = lp.Layout([b for b in layout if b.type in ["Text", "Title", "List"]])
+            figure_blocks = lp.Layout([b for b in layout if b.type == "Figure"])
+            
+            # remove text detected within figures by comparing iou
+            text_blocks = suppress_overlapping_blocks(text_blocks, figure_blocks, iou_threshold=0.8)
+            
+            layout = text_blocks + figure_blocks
+            
+            # remove duplicates with NMS
+            layout = layout_nms(layout)
+
+        # extract text from text blocks, using the text layer when available and OCR otherwise
+        # (timed as the ocr stage either way)
+        with page_stats.stage("ocr"):
+            page_words = None
+            if pdf_page is not None and self.lp_settings.use_text_layer:
+                page_words = self._text_layer_words(pdf_page, page_image)
         
-            # extract text with ocr
-            text = self.lp_agents.ocr.detect(segment_image)
-            block.text = text
-            page_text.append(text)
+            page_text: List[str] = []
+            page_ocr_words: Optional[List[TextWord]] = None
+            text_layer_blocks, ocr_blocks = 0, 0
+            for block in text_blocks:
+                text = None
+                if page_words:
+                    text = block_text(page_words, block.coordinates, pad=5)
+                    if is_usable_text(text):
+                        text_layer_blocks += 1
+                    else:
+                        text = None
+            
+                if text is None and self.lp_settings.ocr_backend == "page":
+                    # ocr the whole page once (only if some block needs it) and take the words inside the block
+                    if page_ocr_words is None:
+                        page_ocr_words = self.lp_agents.page_ocr.detect_words(img_np)
+                    text = block_text(page_ocr_words, block.coordinates, pad=5)
+                    ocr_blocks += 1
+                elif text is None:
+                    # crop text block from page image
+                    segment_image = block.pad(left=5,right=5,top=5,bottom=5).crop_image(img_np)
+            
+                    # extract text with ocr
+                    text = self.lp_agents.ocr.detect(segment_image)
+                    ocr_blocks += 1
+
+                block.text = text
+                page_text.append(text)
 
         # process figures and associate captions
+        page_embedded_images = None
+        if pdf_page is not None and self.lp_settings.figure_source == "embedded":
+            with page_stats.stage("image_save"):
+                page_embedded_images = embedded_images(pdf_page, page_width, page_height)
+        
         page_figures: List[DocFigure] = []
         for i, figure_block in enumerate(figure_blocks):
-            figure_img = figure_block.crop_image(img_np)
             fig_x1, fig_y1, fig_x2, fig_y2 = [int(coord) for coord in figure_block.coordinates]
 
-            # set caption to be the text closest to the figure
-            caption = ""
-            fig_id = -1
-            min_distance = float("inf")
-            for text_block in text_blocks:
-                text_y1 = text_block.coordinates[1]
-                text_x_center = (text_block.coordinates[0] + text_block.coordinates[2]) / 2
-                fig_x_center = (fig_x1 + fig_x2) / 2
+            with page_stats.stage("caption"):
+                # set caption to be the text closest to the figure
+                caption = ""
+                fig_id = -1
+                min_distance = float("inf")
+                for text_block in text_blocks:
+                    text_y1 = text_block.coordinates[1]
+                    text_x_center = (text_block.coordinates[0] + text_block.coordinates[2]) / 2
+                    fig_x_center = (fig_x1 + fig_x2) / 2
                 
-                # check if text block is below the figure and horizontally aligned
-                if (text_y1 > fig_y2 and 
-                    abs(text_x_center - fig_x_center) < (fig_x2 - fig_x1) / 2):
+                    # check if text block is below the figure and horizontally aligned
+                    if (text_y1 > fig_y2 and 
+                        abs(text_x_center - fig_x_center) < (fig_x2 - fig_x1) / 2):
                     
-                    distance = text_y1 - fig_y2
-                    if distance < min_distance:
-                        min_distance = distance
-                        caption = text_block.text
+                        distance = text_y1 - fig_y2
+                        if distance < min_distance:
+                            min_distance = distance
+                            caption = text_block.text
                         
-                        # caption threshold - if it's too far, probably not a caption
-                        # also check caption pattern (look for figure,fig, or some preffix that indicates that this is a caption)
-                        caption_match = self._caption_pattern.match(caption)
-                        if min_distance > 100 or not caption_match:
-                            caption = None
-                        else:
-                            fig_id = int(caption_match.group(2))
-            
+                            # caption threshold - if it's too far, probably not a caption
+                            # also check caption pattern (look for figure,fig, or some preffix that indicates that this is a caption)
+                            caption_match = self._caption_pattern.match(caption)
+                            if min_distance > 100 or not caption_match:
+                                caption = None
+                            else:
+                                fig_id = int(caption_match.group(2))
+
             # skip figure if no caption found
             if not caption:
                 continue
@@ -317,16 +611,30 @@ class PDFProcessor:
                 # remove extra newlines
                 caption = re.sub(r"\n+", " ", caption)
             
-            # save figure
-            figure_filename = f"{source_basename}_page{page_num}_image{i}.png"
-            figure_path = os.path.join(self.images_output_dir, figure_filename)
-            Image.fromarray(figure_img).save(figure_path)
-            
+            # save figure, preferring the original embedded image over a crop of the rasterized page
+            with page_stats.stage("image_save"):
+                figure_path = os.path.join(self.images_output_dir, f"{source_basename}_page{page_num}_image{i}")
+                embedded_match = match_embedded_image(page_embedded_images, figure_block.coordinates) if page_embedded_images else None
+                if embedded_match:
+                    figure_path = save_embedded_image(pdf_page.parent, embedded_match.xref, figure_path)
+                else:
+                    figure_path += ".png"
+                    Image.fromarray(figure_block.crop_image(img_np)).save(figure_path)
+
             doc_figure = DocFigure(id=fig_id, image_path=figure_path, caption=caption, source_path=source_pdf)
             page_figures.append(doc_figure)
 
         # parse to DocPage object
-        page = DocPage(id=page_num, content="\n".join(page_text), source_path=source_pdf)
+        if text_layer_blocks and ocr_blocks:
+            text_source = "mixed"
+        elif text_layer_blocks:
+            text_source = "text_layer"
+        elif ocr_blocks:
+            text_source = "ocr"
+        else:
+            text_source = "none"
+        page_metadata = {"text_source": text_source, "text_layer_blocks": text_layer_blocks, "ocr_blocks": ocr_blocks}
+        page = DocPage(id=page_num, content="\n".join(page_text), metadata=page_metadata, source_path=source_pdf)
 
         if return_layout:
             return page, page_figures, text_blocks + figure_blocks
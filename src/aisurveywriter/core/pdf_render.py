@@ -0,0 +1,61 @@
+from typing import Iterator
+import pdf2image
+import pymupdf
+from PIL import Image
+
+RASTER_BACKENDS = ["pdf2image", "pymupdf"]
+
+def _check_backend(backend: str):
+    if backend not in RASTER_BACKENDS:
+        raise ValueError(f"{backend!r} is not a valid raster backend. Use one of: {', '.join(RASTER_BACKENDS)}")
+
+def pdf_page_count(pdf_path: str, backend: str = "pdf2image") -> int:
+    """
+    Get the number of pages in a PDF without rendering any of them
+    """
+    _check_backend(backend)
+    if backend == "pymupdf":
+        with pymupdf.open(pdf_path) as doc:
+            return doc.page_count
+
+    return int(pdf2image.pdfinfo_from_path(pdf_path)["Pages"])
+
+def iter_pdf_pages(pdf_path: str, backend: str = "pdf2image", dpi: int = 200, thread_count: int = 1) -> Iterator[Image.Image]:
+    """
+    Rasterize a PDF one page at a time, yielding each page as an RGB image only
+    when it is requested, so memory usage doesn't grow with the number of pages.
+
+    Parameters:
+        pdf_path (str): path to the PDF file
+        backend (str): "pdf2image" (poppler subprocess) or "pymupdf" (in-process renderer)
+        dpi (int): rendering resolution
+        thread_count (int): with "pdf2image", number of pages rendered per poppler call
+            (and threads used for it). At most this many pages are held in memory.
+    """
+    _check_backend(backend)
+    if backend == "pymupdf":
+        yield from _iter_pages_pymupdf(pdf_path, dpi)
+    else:
+        yield from _iter_pages_pdf2image(pdf_path, dpi, thread_count)
+
+def _iter_pages_pymupdf(pdf_path: str, dpi: int) -> Iterator[Image.Image]:
+    zoom = dpi / 72 # PDF user space is 72 dpi
+    matrix = pymupdf.Matrix(zoom, zoom)
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            pixmap = page.get_pixmap(matrix=matrix, alpha=False)
+            img = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+            del pixmap
+            yield img
+
+def _iter_pages_pdf2image(pdf_path: str, dpi: int, thread_count: int) -> Iterator[Image.Image]:
+    thread_count = max(1, thread_count)
+    page_amount = pdf_page_count(pdf_path, "pdf2image")
+    for first_page in range(1, page_amount + 1, thread_count):
+        last_page = min(first_page + thread_count - 1, page_amount)
+        page_images = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                                                  thread_count=thread_count)
+        for img in page_images:
+            # only copy the image if it isn't already RGB
+            yield img if img.mode == "RGB" else img.convert("RGB")
+        del page_images
@@ -0,0 +1,72 @@
+from typing import List, NamedTuple, Hashable
+import pymupdf
+
+class TextWord(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    text: str
+    # words sharing the same line key are joined in the same line
+    line: Hashable
+
+def text_layer_words(page: pymupdf.Page, image_width: int, image_height: int) -> List[TextWord]:
+    """
+    Get the words embedded in a PDF page text layer, with coordinates mapped
+    to the pixel space of the page rasterized with size (image_width, image_height)
+    """
+    # page.rect is already rotated, words are not
+    scale_x = image_width / page.rect.width
+    scale_y = image_height / page.rect.height
+    scale = pymupdf.Matrix(scale_x, scale_y)
+    transform = page.rotation_matrix * scale
+
+    words: List[TextWord] = []
+    for x0, y0, x1, y1, text, block_no, line_no, _ in page.get_text("words", sort=True):
+        rect = pymupdf.Rect(x0, y0, x1, y1) * transform
+        words.append(TextWord(rect.x0, rect.y0, rect.x1, rect.y1, text, (block_no, line_no)))
+    return words
+
+def is_usable_text(text: str, min_chars: int = 1, max_garbage_ratio: float = 0.1) -> bool:
+    """
+    Check if text extracted from a text layer looks like real text and not the
+    output of a broken font encoding (replacement or control characters)
+    """
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < min_chars:
+        return False
+
+    garbage = sum(1 for c in chars if c == "\ufffd" or not c.isprintable())
+    return (garbage / len(chars)) <= max_garbage_ratio
+
+def words_in_block(words: List[TextWord], coordinates: tuple[float, float, float, float], pad: float = 5) -> List[TextWord]:
+    """
+    Select the words whose center is inside a block with the given (x1, y1, x2, y2) coordinates
+    """
+    x1, y1, x2, y2 = coordinates
+    x1, y1, x2, y2 = x1 - pad, y1 - pad, x2 + pad, y2 + pad
+
+    selected = []
+    for word in words:
+        center_x = (word.x0 + word.x1) / 2
+        center_y = (word.y0 + word.y1) / 2
+        if x1 <= center_x <= x2 and y1 <= center_y <= y2:
+            selected.append(word)
+    return selected
+
+def join_words(words: List[TextWord]) -> str:
+    """
+    Join words into text, keeping their order and breaking lines whenever the line key changes
+    """
+    lines: List[List[str]] = []
+    current_line = None
+    for word in words:
+        if not lines or word.line != current_line:
+            lines.append([])
+            current_line = word.line
+        lines[-1].append(word.text)
+
+    return "\n".join(" ".join(line) for line in lines)
+
+def block_text(words: List[TextWord], coordinates: tuple[float, float, float, float], pad: float = 5) -> str:
+    return join_words(words_in_block(words, coordinates, pad))
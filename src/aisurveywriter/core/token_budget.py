@@ -0,0 +1,71 @@
+from typing import Callable, List, NamedTuple, Optional
+import math
+
+class ModelLimits(NamedTuple):
+    context_tokens: int
+    output_tokens: int
+
+# context window and maximum output tokens, by model name prefix (longest prefix wins)
+MODEL_LIMITS: dict[str, ModelLimits] = {
+    "gpt-4o": ModelLimits(128_000, 16_384),
+    "gpt-4.1": ModelLimits(1_047_576, 32_768),
+    "gpt-4-turbo": ModelLimits(128_000, 4_096),
+    "gpt-4": ModelLimits(8_192, 4_096),
+    "gpt-3.5-turbo": ModelLimits(16_385, 4_096),
+    "o1": ModelLimits(200_000, 100_000),
+    "o3": ModelLimits(200_000, 100_000),
+    "o4-mini": ModelLimits(200_000, 100_000),
+    "gemini-1.5-pro": ModelLimits(2_097_152, 8_192),
+    "gemini-1.5-flash": ModelLimits(1_048_576, 8_192),
+    "gemini-2.0-flash": ModelLimits(1_048_576, 8_192),
+    "gemini-2.5": ModelLimits(1_048_576, 65_536),
+    "deepseek-r1": ModelLimits(131_072, 8_192),
+    "llama3": ModelLimits(8_192, 2_048),
+    "llama3.1": ModelLimits(131_072, 4_096),
+    "qwen2.5": ModelLimits(32_768, 8_192),
+}
+
+# unknown models (e.g. local ollama models with a small num_ctx)
+DEFAULT_MODEL_LIMITS = ModelLimits(8_192, 2_048)
+
+# references are dense in initials, numbers and punctuation, which tokenize worse than prose
+CHARS_PER_TOKEN = 3
+
+def model_limits(model: str) -> ModelLimits:
+    name = model.strip().lower()
+    name = name.rsplit("/", 1)[-1] # "models/gemini-2.0-flash"
+    prefixes = [prefix for prefix in MODEL_LIMITS if name.startswith(prefix)]
+    if not prefixes:
+        return DEFAULT_MODEL_LIMITS
+    return MODEL_LIMITS[max(prefixes, key=len)]
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token count estimate, independent of the model tokenizer
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def pack_texts(texts: List[str], max_input_tokens: int, max_output_tokens: Optional[int] = None,
+               output_tokens_fn: Optional[Callable[[str], int]] = None, separator: str = "\n") -> List[str]:
+    """
+    Pack texts, in order, into as few chunks as possible, each within the input token budget and,
+    if given, the output token budget (output_tokens_fn estimates the output produced by each text).
+    Texts are never split: a text over the budget is put in a chunk of its own.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    input_tokens = output_tokens = 0
+    for text in texts:
+        text_input = estimate_tokens(text + separator)
+        text_output = output_tokens_fn(text) if output_tokens_fn else 0
+        over_input = input_tokens + text_input > max_input_tokens
+        over_output = max_output_tokens is not None and output_tokens + text_output > max_output_tokens
+        if current and (over_input or over_output):
+            chunks.append(separator.join(current))
+            current, input_tokens, output_tokens = [], 0, 0
+        current.append(text)
+        input_tokens += text_input
+        output_tokens += text_output
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
@@ -0,0 +1,166 @@
+from typing import List, Optional, NamedTuple
+import re
+
+# one author name: "Last, I. J." / "Last, I.-J." (ACS, APA, Nature), "I. J. Last" (IEEE) or "Last IJ" (Vancouver)
+_NAME = r"[A-Z][\w'’\-]+(?:[ \-][A-Z][\w'’\-]+)*"
+_INITIALS = r"(?:[A-Z]\.\s?-?\s?)+"
+# name suffixes: "Oliveira, O. N., Jr." / "O. N. Oliveira Jr." / "Smith JA 3rd"
+_SUFFIX = r"(?:,?\s*(?:Jr|Sr)\b\.?|,?\s+(?:II|III|IV|2nd|3rd)\b)"
+_AUTHOR = rf"(?:{_NAME},\s*{_INITIALS}|{_INITIALS}\s?{_NAME}|{_NAME}\s[A-Z]{{1,3}}\b){_SUFFIX}?"
+_SEPARATOR = r"(?:\s*;\s*|\s*,\s*(?:and\s+|&\s*)?|,?\s+and\s+|,?\s*&\s*)"
+AUTHORS_PATTERN = re.compile(rf"^\s*(?P<authors>{_AUTHOR}(?:{_SEPARATOR}{_AUTHOR})*(?:,?\s*et\s+al\.?)?)")
+
+# lines starting a numbered or bracketed reference: "[12] ...", "(12) ...", "12. ..."
+# (up to 3 digits, so lines starting with a year or a page number like "2019. ..." don't match)
+ENTRY_START_PATTERN = re.compile(r"^\s*(?:\[(?P<bracket>\d{1,3})\]|\((?P<paren>\d{1,3})\)|(?P<dot>\d{1,3})\.\s)")
+
+# line starting an author-year entry: "Last, I." at the beginning of the line
+AUTHOR_YEAR_START_PATTERN = re.compile(rf"^\s*{_NAME},\s*{_INITIALS}")
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}[a-z]?\b")
+# "(2020)." / "(2020a)," right after the authors
+LEADING_YEAR_PATTERN = re.compile(r"^[\s.,:]*\((?:19|20)\d{2}[a-z]?\)[\s.,:]*")
+QUOTED_TITLE_PATTERN = re.compile(r"[\"“”]\s*(?P<title>[^\"“”]{10,}?)[,.]?\s*[\"“”]")
+# end of a sentence: period (not after an initial), question or exclamation mark, followed by a new word
+SENTENCE_END_PATTERN = re.compile(r"(?<!\b[A-Z])[.?!](?=\s+[A-Z0-9(\[]|\s*$)")
+MARKER_PATTERN = re.compile(r"^\s*(?:\[\d{1,3}\]|\(\d{1,3}\)|\d{1,3}\.)\s*")
+# an author as it would appear in a title that wrongly starts with (or contains) the author list
+AUTHOR_IN_TITLE_PATTERN = re.compile(rf"{_NAME},\s*{_INITIALS}|\b{_INITIALS}\s?{_NAME}")
+
+class ParsedReference(NamedTuple):
+    title: str
+    authors: str
+
+def join_entry_lines(lines: List[str]) -> str:
+    """
+    Join the lines of an entry into a single line, without breaking words hyphenated across lines
+    """
+    text = ""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        text = f"{text}{line}" if text.endswith("-") or not text else f"{text} {line}"
+    return text
+
+def numbered_entry_starts(lines: List[str], max_skip: int = 2) -> List[int]:
+    """
+    Indices of the lines starting a numbered/bracketed entry. Numbers must follow each other
+    (allowing up to max_skip entries lost in the text extraction), so a line that happens to
+    start with a number ("12. ...", a volume or page range) is read as part of its entry.
+    """
+    starts: List[int] = []
+    expected = None
+    for i, line in enumerate(lines):
+        match = ENTRY_START_PATTERN.match(line)
+        if not match:
+            continue
+        number = int(match.group("bracket") or match.group("paren") or match.group("dot"))
+        if expected is None or expected <= number <= expected + max_skip:
+            starts.append(i)
+            expected = number + 1
+    return starts
+
+def split_reference_entries(bib_section: str, min_entries: int = 3) -> Optional[List[str]]:
+    """
+    Split a bibliography section into entries, for numbered/bracketed lists ("[1]", "(1)", "1.")
+    or author-year lists (entries starting with "Last, I." and containing a year).
+    Lines before the first entry (e.g. the section title) are dropped.
+
+    Returns None if the section doesn't look like any of these styles.
+    """
+    lines = [line for line in bib_section.splitlines() if line.strip()]
+
+    # numbered/bracketed: consecutive markers must start at least min_entries lines
+    starts = numbered_entry_starts(lines)
+    if len(starts) >= min_entries:
+        entries: List[List[str]] = []
+        starts = set(starts)
+        for i, line in enumerate(lines):
+            if i in starts:
+                entries.append([MARKER_PATTERN.sub("", line, count=1)])
+            elif entries:
+                entries[-1].append(line)
+        return [join_entry_lines(entry) for entry in entries]
+
+    # author-year: a new entry starts with an author name once the current one has a year and is finished
+    entries = []
+    for line in lines:
+        current = join_entry_lines(entries[-1]) if entries else ""
+        if AUTHOR_YEAR_START_PATTERN.match(line) and (not entries or (YEAR_PATTERN.search(current) and current.endswith("."))):
+            entries.append([line])
+        elif entries:
+            entries[-1].append(line)
+    if len(entries) >= min_entries and all(YEAR_PATTERN.search(join_entry_lines(entry)) for entry in entries):
+        return [join_entry_lines(entry) for entry in entries]
+
+    return None
+
+def _is_confident_title(title: str) -> bool:
+    words = title.split()
+    if len(words) < 3 or len(title) > 400:
+        return False
+    # journal abbreviations ("J. Am. Chem. Soc.") and venue names are mostly short capitalized words
+    short_capitalized = sum(1 for word in words if word[0].isupper() and len(word.rstrip(".,")) <= 5)
+    if short_capitalized / len(words) > 0.5 or YEAR_PATTERN.search(title):
+        return False
+    # authors left in the title (e.g. after a name suffix the author pattern didn't take)
+    return not AUTHOR_IN_TITLE_PATTERN.search(title)
+
+def parse_reference(entry: str) -> Optional[ParsedReference]:
+    """
+    Extract the title and authors from a single bibliography entry (without its number).
+    Returns None unless both are found with confidence.
+
+    >>> parse_reference("1. Vaswani, A. et al. Attention is all you need. In Advances in Neural Information Processing Systems 30 (2017).")
+    ParsedReference(title='Attention is all you need', authors='Vaswani, A. et al.')
+    >>> parse_reference("(2) Oliveira, O. N., Jr.; Caseli, L. The past and the future of Langmuir films. Chem. Rev. 2022, 122, 6459.")
+    ParsedReference(title='The past and the future of Langmuir films', authors='Oliveira, O. N., Jr.; Caseli, L.')
+    """
+    entry = MARKER_PATTERN.sub("", entry, count=1).strip()
+
+    # quoted titles (IEEE): authors are everything before the quote
+    if quoted := QUOTED_TITLE_PATTERN.search(entry):
+        authors = entry[:quoted.start()].strip(" ,.:")
+        title = quoted.group("title").strip(" ,.")
+        if AUTHORS_PATTERN.match(authors) and _is_confident_title(title):
+            return ParsedReference(title, authors)
+        return None
+
+    authors_match = AUTHORS_PATTERN.match(entry)
+    if not authors_match:
+        return None
+    authors = authors_match.group("authors").strip(" ,;")
+
+    rest = LEADING_YEAR_PATTERN.sub("", entry[authors_match.end():])
+    rest = rest.lstrip(" .,:")
+    title_end = SENTENCE_END_PATTERN.search(rest)
+    title = (rest[:title_end.start() + (1 if rest[title_end.start()] in "?!" else 0)] if title_end else rest).strip()
+    if not _is_confident_title(title):
+        return None
+    return ParsedReference(title, authors)
+
+def parse_bibliography(bib_section: str, min_parsed_ratio: float = 0.5) -> tuple[List[ParsedReference], str]:
+    """
+    Parse a bibliography section with the heuristics above.
+
+    Returns:
+        references (List[ParsedReference]): entries parsed with confidence
+        unparsed (str): text of the entries that couldn't be parsed (the whole section if its style
+            wasn't recognized or less than min_parsed_ratio of its entries were parsed), for the LLM
+    """
+    entries = split_reference_entries(bib_section)
+    if not entries:
+        return [], bib_section
+
+    references: List[ParsedReference] = []
+    unparsed: List[str] = []
+    for entry in entries:
+        if parsed := parse_reference(entry):
+            references.append(parsed)
+        else:
+            unparsed.append(entry)
+
+    # mostly unparsed: the style was probably misdetected, let the LLM read the section
+    if len(references) < min_parsed_ratio * len(entries):
+        return [], bib_section
+    return references, "\n".join(unparsed)
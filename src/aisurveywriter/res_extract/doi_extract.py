@@ -0,0 +1,91 @@
+from typing import List, Optional
+import re
+
+from .bib_splitter import ENTRY_START_PATTERN, AUTHOR_YEAR_START_PATTERN, YEAR_PATTERN, join_entry_lines, numbered_entry_starts
+
+# a DOI, optionally introduced by "doi:", "doi.org/" or a doi.org URL
+DOI_PATTERN = re.compile(r"(?:https?://(?:dx\.)?doi\.org/|doi(?:\.org)?\s*[:/]\s*)?(10\.\d{4,9}/[^\s\"'<>{}]+)", re.IGNORECASE)
+
+# section titles printed before the first entry
+HEADING_PATTERN = re.compile(r"^\s*(?:notes and )?(?:references|bibliography|literature cited|works cited)(?: and notes)?\s*:?\s*$", re.IGNORECASE)
+
+# a line ending in the middle of an author list
+AUTHOR_LIST_CONTINUES_PATTERN = re.compile(r"(?:[,;&]|\band)\s*$")
+
+def normalize_doi(doi: str) -> str:
+    """
+    Strip the punctuation that usually follows a DOI in a reference (".", ",", ";", unbalanced
+    closing brackets) and lowercase it, since DOIs are case insensitive
+    """
+    doi = doi.rstrip(".,;:")
+    while doi and doi[-1] in ")]" and doi.count(doi[-1]) > doi.count("(" if doi[-1] == ")" else "["):
+        doi = doi[:-1].rstrip(".,;:")
+    return doi.lower()
+
+def find_doi(text: str) -> Optional[str]:
+    match = DOI_PATTERN.search(text)
+    return normalize_doi(match.group(1)) if match else None
+
+def split_entries(bib_section: str, min_numbered: int = 3) -> List[str]:
+    """
+    Split a bibliography section into entries. Numbered/bracketed lists are split at every reference
+    marker (see numbered_entry_starts). Other lists are split at blank lines, after every line with a DOI (which usually ends its
+    entry) and where a "Last, I." line follows a finished entry (one with a year, ending with a period).
+    A section title is always an entry of its own.
+    """
+    lines = bib_section.splitlines()
+    starts = set(numbered_entry_starts(lines))
+    numbered = len(starts) >= min_numbered
+
+    entries: List[List[str]] = []
+    current: List[str] = []
+    def close():
+        nonlocal current
+        if current:
+            entries.append(current)
+            current = []
+
+    for i, line in enumerate(lines):
+        if HEADING_PATTERN.match(line):
+            close()
+            entries.append([line])
+            continue
+        if numbered:
+            if i in starts:
+                close()
+            current.append(line)
+            continue
+        
+        if not line.strip():
+            close()
+            continue
+        if current and AUTHOR_YEAR_START_PATTERN.match(line):
+            text = join_entry_lines(current)
+            if YEAR_PATTERN.search(text) and text.endswith("."):
+                close()
+        current.append(line)
+        if DOI_PATTERN.search(line):
+            close()
+    close()
+
+    return ["\n".join(entry) for entry in entries]
+
+def split_doi_entry(entry: str) -> tuple[str, str]:
+    """
+    Split an entry (from split_entries) into the text of the reference that prints its DOI and the
+    rest of the entry. Unless the entry is a numbered reference, it may still hold unrecognized entries
+    before that reference, so the reference starts at the last "Last, I." line that doesn't continue an
+    author list (the previous line doesn't end with ",", ";", "&" or "and") and ends at the DOI line.
+    """
+    lines = entry.splitlines()
+    doi_idx = next((i for i, line in enumerate(lines) if DOI_PATTERN.search(line)), None)
+    if doi_idx is None:
+        return "", entry
+    if ENTRY_START_PATTERN.match(lines[0]):
+        return entry, ""
+
+    start = 0
+    for i in range(1, doi_idx + 1):
+        if AUTHOR_YEAR_START_PATTERN.match(lines[i]) and not AUTHOR_LIST_CONTINUES_PATTERN.search(lines[i - 1]):
+            start = i
+    return "\n".join(lines[start:doi_idx + 1]), "\n".join(lines[:start] + lines[doi_idx + 1:])
@@ -0,0 +1,155 @@
+from typing import List, Optional
+import re
+import unicodedata
+import zlib
+import numpy as np
+
+# 16 bands of 4 rows: pairs of titles with trigram jaccard similarity around 0.5 or more become candidates
+# (a pair at 0.8 is missed with probability < 0.001)
+NUM_PERM = 64
+BANDS = 16
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = np.random.default_rng(42)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+def normalize_title(title: Optional[str]) -> str:
+    """
+    Lowercase, strip accents, hyphens (including words hyphenated across lines), punctuation and extra spaces
+    """
+    if not title:
+        return ""
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c)).lower()
+    title = re.sub(r"-\s*", "", title)
+    return " ".join(re.sub(r"[^\w\s]|_", " ", title).split())
+
+def author_names(authors: Optional[str]) -> set[str]:
+    """
+    Likely surnames in an author list (words of two or more letters, i.e. not initials), whatever their format
+    """
+    if not authors:
+        return set()
+    authors = unicodedata.normalize("NFKD", authors)
+    authors = "".join(c for c in authors if not unicodedata.combining(c))
+    return {name.lower() for name in re.findall(r"[^\W\d_]{2,}", authors)} - {"and", "et", "al"}
+
+def number_tokens(norm_title: str) -> frozenset[str]:
+    """
+    Numbers and roman numerals in a normalized title ("part ii", "2019", "covid19"), which tell apart
+    the works of a series or companion papers with otherwise near-identical titles
+    """
+    return frozenset(re.findall(r"\d+", norm_title)) | frozenset(re.findall(r"\b[ivx]{1,4}\b", norm_title))
+
+def trigrams(text: str) -> set[str]:
+    text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def minhash(shingles: set[str]) -> np.ndarray:
+    hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+    # (a*x + b) mod p, with x < 2^32, a, b < 2^61 and p = 2^61 - 1, without overflowing 64 bits:
+    # a*x = a_hi*x*2^32 + a_lo*x, with a_hi*x < 2^61 and a_lo*x < 2^64. (y*2^32) mod p is reduced
+    # with 2^61 = 1 (mod p): for y = y1*2^29 + y0 (y0 < 2^29), y*2^32 = y1 + y0*2^32 (mod p), < 2^62
+    p = np.uint64(_MERSENNE_PRIME)
+    a_hi, a_lo = _PERM_A >> np.uint64(32), _PERM_A & np.uint64(_MAX_HASH)
+    hi = (a_hi[:, None] * hashes[None, :]) % p
+    hi = ((hi >> np.uint64(29)) + ((hi & np.uint64((1 << 29) - 1)) << np.uint64(32))) % p
+    lo = (a_lo[:, None] * hashes[None, :]) % p
+    values = (hi + lo + _PERM_B[:, None]) % p
+    return (values & np.uint64(_MAX_HASH)).min(axis=1)
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+class NearDuplicateIndex:
+    """
+    Groups references to the same work: equal normalized titles, or titles with trigram jaccard
+    similarity of at least "threshold" (candidates found with MinHash LSH) whose author lists share
+    a surname (when both have one) and that have the same numbers and roman numerals ("Part I" and
+    "Part II" are different works). References with titles shorter than min_title_len are never grouped.
+    """
+    def __init__(self, threshold: float = 0.8, min_title_len: int = 16):
+        self.threshold = threshold
+        self.min_title_len = min_title_len
+
+        self._parent: List[int] = []
+        self._exact: dict[str, int] = {}
+        self._buckets: dict[tuple, List[int]] = {}
+        self._shingles: List[set[str]] = []
+        self._authors: List[set[str]] = []
+        self._numbers: List[frozenset[str]] = []
+
+    def _find(self, i: int) -> int:
+        while self._parent[i] != i:
+            self._parent[i] = self._parent[self._parent[i]]
+            i = self._parent[i]
+        return i
+
+    def _union(self, i: int, j: int):
+        ri, rj = self._find(i), self._find(j)
+        if ri != rj:
+            # the earliest reference represents the group
+            self._parent[max(ri, rj)] = min(ri, rj)
+
+    def add(self, title: Optional[str], authors: Optional[str] = None) -> int:
+        """
+        Add a reference and return its index
+        """
+        i = len(self._parent)
+        self._parent.append(i)
+        norm = normalize_title(title)
+        names = author_names(authors)
+        self._authors.append(names)
+        numbers = number_tokens(norm)
+        self._numbers.append(numbers)
+        
+        # short or missing titles ("Introduction", "Erratum", none) don't identify a work: never grouped
+        if len(norm) < self.min_title_len:
+            self._shingles.append(set())
+            return i
+
+        if norm in self._exact:
+            j = self._exact[norm]
+            if not names or not self._authors[j] or names & self._authors[j]:
+                self._union(i, j)
+        else:
+            self._exact[norm] = i
+
+        shingles = trigrams(norm)
+        self._shingles.append(shingles)
+        signature = minhash(shingles)
+        rows = NUM_PERM // BANDS
+        candidates = set()
+        for band in range(BANDS):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            bucket = self._buckets.setdefault(key, [])
+            candidates.update(bucket)
+            bucket.append(i)
+
+        for j in candidates:
+            if self._find(i) == self._find(j):
+                continue
+            if names and self._authors[j] and not names & self._authors[j]:
+                continue
+            if numbers != self._numbers[j]:
+                continue
+            if jaccard(shingles, self._shingles[j]) >= self.threshold:
+                self._union(i, j)
+        return i
+
+    def representatives(self) -> List[int]:
+        """
+        Index of the reference representing the group of each reference
+        """
+        return [self._find(i) for i in range(len(self._parent))]
+
+def group_near_duplicates(refs: List[tuple[Optional[str], Optional[str]]], threshold: float = 0.8) -> List[int]:
+    """
+    For each (title, authors) reference, the index of the first reference to the same work
+    """
+    index = NearDuplicateIndex(threshold)
+    for title, authors in refs:
+        index.add(title, authors)
+    return index.representatives()
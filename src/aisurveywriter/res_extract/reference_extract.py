@@ -1,19 +1,30 @@
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 import bibtexparser
 from langchain_core.prompts.chat import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from ..core.llm_handler import LLMHandler
+from ..core.llm_cache import LLMCacheMiss, is_cached_response
+from ..core.token_budget import model_limits, estimate_tokens, pack_texts, CHARS_PER_TOKEN
 from ..store.reference_store import ReferenceStore
 from ..utils.logger import named_log, metadata_log, cooldown_log
 from ..utils.helpers import time_func
-from ..utils.helpers import get_bibtex_entry, random_str
+from ..utils.helpers import random_str
+from ..utils.crossref import get_crossref_resolver
+from ..utils.bib_cache import get_bib_cache
+from ..utils.rate_limit import RateLimiter
+from .doi_extract import split_entries, split_doi_entry, find_doi
+from .bib_splitter import parse_bibliography, split_reference_entries
+from .ref_dedup import group_near_duplicates
 
 class BibliographyInfo(BaseModel):
     title: str | None = Field(description="Title of the referenced work")
     authors: str | None = Field(description="Authors of the referenced work")
+    # DOI printed in the bibliography, set by the DOI pre-pass (not part of the LLM output schema)
+    doi: SkipJsonSchema[Optional[str]] = None
 
 class BibExtractorOutput(BaseModel):
     bibliography: List[BibliographyInfo]
@@ -38,70 +49,257 @@ REFERENCE_EXTRACTOR_HUMAN_PROMPT = """Extract from the given references:
 {references}
 \"\"\""""
 
+# the output repeats the title and authors of each entry (most of it) as JSON
+OUTPUT_TOKENS_PER_INPUT_TOKEN = 0.8
+OUTPUT_TOKENS_PER_ENTRY = 16
+# room left in the model output limit for formatting variations in the response
+OUTPUT_BUDGET_MARGIN = 0.75
+
+def entry_output_tokens(entry: str) -> int:
+    return int(estimate_tokens(entry) * OUTPUT_TOKENS_PER_INPUT_TOKEN) + OUTPUT_TOKENS_PER_ENTRY
+
 class ReferencesBibExtractor:
-    def __init__(self, llm: LLMHandler, references: ReferenceStore, system_prompt: str = REFERENCE_EXTRACTOR_SYSTEM_PROMPT, human_prompt: str = REFERENCE_EXTRACTOR_HUMAN_PROMPT, n_batches: int = 10, request_cooldown_sec: int = 30):
+    def __init__(self, llm: LLMHandler, references: ReferenceStore, system_prompt: str = REFERENCE_EXTRACTOR_SYSTEM_PROMPT, human_prompt: str = REFERENCE_EXTRACTOR_HUMAN_PROMPT, request_cooldown_sec: int = 30,
+                 doi_prepass: bool = True, heuristic_split: bool = True, input_token_budget: Optional[int] = None, output_token_budget: Optional[int] = None,
+                 max_workers: int = 1, requests_per_minute: Optional[float] = None, rate_limiter: Optional[RateLimiter] = None, parse_retries: int = 2):
         self.llm = llm
         self._cooldown = request_cooldown_sec
         self.parser = PydanticOutputParser(pydantic_object=BibExtractorOutput)
-        self.n_batches = max(1, n_batches)
+        
+        # each request is filled with reference entries up to these budgets (defaults from the model limits)
+        limits = model_limits(llm.name)
+        self.input_token_budget = input_token_budget or limits.context_tokens - limits.output_tokens
+        self.output_token_budget = output_token_budget or int(limits.output_tokens * OUTPUT_BUDGET_MARGIN)
         
         self._system = SystemMessagePromptTemplate.from_template(system_prompt)
         self._human = HumanMessagePromptTemplate.from_template(human_prompt)
         self._prompt = ChatPromptTemplate([self._system, self._human], partial_variables={"format_instructions": self.parser.get_format_instructions()})
 
-        self.llm.init_chain(self._prompt)
+        # batches run concurrently, so they use a bound prompt instead of the LLM chain
+        self._bound_prompt = self.llm.bind_prompt(self._prompt)
 
         self.references = references
         
+        # resolve entries that print a DOI directly, sending only the other entries to the LLM
+        self.doi_prepass = doi_prepass
+        self._doi_entries: dict[str, dict] = {}
         
-    def extract(self):
-        bib_sections = self.references.bibliography_sections()
+        # parse numbered/bracketed/author-year lists deterministically, sending only the entries it can't parse to the LLM
+        self.heuristic_split = heuristic_split
         
-        chunk_sz = sum(len(bib) for bib in bib_sections) // self.n_batches
-        chunk_overlap = int(chunk_sz * 0.05)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_sz,
-            chunk_overlap=chunk_overlap,
-        )
-
-        bib_docs = text_splitter.create_documents(bib_sections)
-        n_chunks = len(bib_docs)
+        # with more than one worker, batches are sent concurrently through the rate limiter (shared with
+        # other users of the same LLM when given) instead of sleeping the cooldown between them.
+        # An LLM with requests/tokens per minute budgets limits its own requests.
+        self.max_workers = max(1, max_workers)
+        self._llm_limited = getattr(llm, "rate_limiter", None) is not None
+        if rate_limiter is None and self.max_workers > 1 and not self._llm_limited:
+            if requests_per_minute:
+                rate_limiter = RateLimiter(requests_per_minute / 60)
+            elif request_cooldown_sec:
+                rate_limiter = RateLimiter(1 / request_cooldown_sec)
+        self.rate_limiter = rate_limiter
+        self.parse_retries = max(0, parse_retries)
+        
+    def extract(self) -> List[BibliographyInfo]:
+        sections_info, _ = self.extract_sections(self.references.bibliography_sections())
+        return [ref for section_info in sections_info for ref in section_info]
 
-        bib_info: List[BibliographyInfo] = []
+    def extract_sections(self, bib_sections: List[str]) -> tuple[List[List[BibliographyInfo]], List[bool]]:
+        """
+        Extract the references of each bibliography section. Batches sent to the LLM never mix
+        entries of different sections, so every reference is attributed to its section.
+        
+        Returns:
+            sections_info (List[List[BibliographyInfo]]): references of each section
+            complete (List[bool]): for each section, whether every LLM batch of it was extracted
+        """
+        sections_info: List[List[BibliographyInfo]] = [[] for _ in bib_sections]
         
-        for i, bib_doc in enumerate(bib_docs):
-            named_log(self, f"==> start extracting title and author from batch {i+1}/{n_chunks}")
+        if self.doi_prepass:
+            doi_info, bib_sections = self._extract_doi_references(bib_sections)
+            for section_info, refs in zip(sections_info, doi_info):
+                section_info.extend(refs)
+        
+        if self.heuristic_split and any(bib.strip() for bib in bib_sections):
+            parsed_info, bib_sections = self._extract_heuristic_references(bib_sections)
+            for section_info, refs in zip(sections_info, parsed_info):
+                section_info.extend(refs)
+        
+        bib_chunks = [(j, chunk) for j, bib in enumerate(bib_sections) for chunk in self._pack_chunks([bib])]
+        n_chunks = len(bib_chunks)
+        if n_chunks:
+            named_log(self, f"==> packed the bibliography into {n_chunks} batches (budget: {self.input_token_budget} input, {self.output_token_budget} output tokens)")
+        
+        if self.max_workers > 1 and n_chunks > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                batches = list(executor.map(lambda args: self._extract_batch(args[0], args[1][1], n_chunks, self.rate_limiter), enumerate(bib_chunks)))
+        else:
+            batches = [self._extract_batch(i, bib_chunk, n_chunks) for i, (_, bib_chunk) in enumerate(bib_chunks)]
+        
+        # batches finish in any order, but references keep the order of the bibliography
+        complete = [True] * len(bib_sections)
+        for (j, _), batch in zip(bib_chunks, batches):
+            if batch is None:
+                complete[j] = False
+                continue
+            sections_info[j].extend(batch)
+        named_log(self, f"==> got {sum(len(section_info) for section_info in sections_info)} references in total"
+                        + (f" ({complete.count(False)} sections incomplete)" if not all(complete) else ""))
+        
+        return sections_info, complete
+
+    def _extract_batch(self, i: int, bib_chunk: str, n_chunks: int, rate_limiter: Optional[RateLimiter] = None) -> Optional[List[BibliographyInfo]]:
+        """
+        Extract the references of one batch, asking again when the response can't be parsed
+        (None if every attempt failed). Without a rate limiter (here or in the LLM), sleeps the
+        cooldown after every request that wasn't replayed from the LLM cache.
+        """
+        for attempt in range(1, self.parse_retries + 2):
+            response = None
+            if rate_limiter:
+                rate_limiter.acquire()
+            named_log(self, f"==> start extracting title and author from batch {i+1}/{n_chunks}" + (f" (attempt {attempt})" if attempt > 1 else ""))
             
-            elapsed, response = time_func(self.llm.invoke, {
-                "references": bib_doc.page_content,
-            })
             try:
+                elapsed, response = time_func(self._bound_prompt.invoke, {
+                    "references": bib_chunk,
+                })
+                metadata_log(self, elapsed, response)
                 bib_output: BibExtractorOutput = self.parser.invoke(response)
-                bib_info.extend(bib_output.bibliography)
                 named_log(self, f"==> finish extracting title and author from batch {i+1}/{n_chunks}")
-                named_log(self, f"==> got {len(bib_output.bibliography)} references | total: {len(bib_info)}")
+                named_log(self, f"==> got {len(bib_output.bibliography)} references from batch {i+1}")
+                return bib_output.bibliography
+            except LLMCacheMiss:
+                raise
             except Exception as e:
-                named_log(self, f"unable to get references from batch {i+1}. Exception raised: {e}")
-            
-            metadata_log(self, elapsed, response)
-            if self._cooldown:
-                cooldown_log(self, self._cooldown)
+                named_log(self, f"unable to get references from batch {i+1} (attempt {attempt}/{self.parse_retries + 1}). Exception raised: {e}")
+            finally:
+                if rate_limiter is None and self._cooldown and not self._llm_limited and not is_cached_response(response):
+                    cooldown_log(self, self._cooldown)
+        
+        return None
+
+    def _pack_chunks(self, bib_sections: List[str]) -> List[str]:
+        """
+        Split the bibliography sections into reference entries and pack them into as few requests as
+        the token budgets allow, never breaking an entry across two requests
+        """
+        prompt_tokens = estimate_tokens(self._prompt.format(references=""))
+        input_budget = max(1, self.input_token_budget - prompt_tokens)
+        
+        entries: List[str] = []
+        for bib in bib_sections:
+            if not bib.strip():
+                continue
+            for entry in split_reference_entries(bib) or split_entries(bib):
+                entries.extend(self._fit_entry(entry, input_budget))
+        
+        return pack_texts(entries, input_budget, self.output_token_budget, output_tokens_fn=entry_output_tokens)
 
-        return bib_info
+    def _fit_entry(self, entry: str, input_budget: int) -> List[str]:
+        """
+        Break an entry over the budgets (usually a section with no recognizable entry boundaries) on
+        line boundaries, and lines still over them on character offsets
+        """
+        if estimate_tokens(entry) <= input_budget and entry_output_tokens(entry) <= self.output_token_budget:
+            return [entry]
+        
+        # output estimate is proportional to the entry size, so keep both budgets
+        max_tokens = min(input_budget, int(self.output_token_budget / OUTPUT_TOKENS_PER_INPUT_TOKEN))
+        parts = []
+        for line in entry.splitlines():
+            if estimate_tokens(line) <= max_tokens:
+                parts.append(line)
+            else:
+                chunk_sz = max(1, max_tokens * CHARS_PER_TOKEN)
+                parts.extend(line[i:i + chunk_sz] for i in range(0, len(line), chunk_sz))
+        return parts
+
+    def _extract_doi_references(self, bib_sections: List[str]) -> tuple[List[List[BibliographyInfo]], List[str]]:
+        """
+        Find the bibliography entries that print a DOI and resolve them directly.
+        
+        Returns:
+            bib_info (List[List[BibliographyInfo]]): references resolved by DOI, for each section
+            bib_sections (List[str]): bibliography sections without those entries, to be sent to the LLM.
+                Entries whose DOI couldn't be resolved are kept.
+        """
+        sections_entries = [[(find_doi(entry), entry) for entry in split_entries(bib)] for bib in bib_sections]
+        dois = list(dict.fromkeys(doi for entries in sections_entries for doi, _ in entries if doi))
+        if not dois:
+            return [[] for _ in bib_sections], bib_sections
+        
+        resolver = get_crossref_resolver()
+        named_log(self, f"==> resolving {len(dois)} DOIs found in the bibliography sections")
+        for doi, entry in zip(dois, resolver.resolve_dois(dois)):
+            if isinstance(entry, dict):
+                self._doi_entries[doi] = entry
+        
+        bib_info: List[List[BibliographyInfo]] = []
+        remaining_sections: List[str] = []
+        skipped_chars = 0
+        for entries in sections_entries:
+            section_info = []
+            remaining = []
+            for doi, text in entries:
+                if doi in self._doi_entries:
+                    entry = self._doi_entries[doi]
+                    section_info.append(BibliographyInfo(title=entry.get("title"), authors=entry.get("author"), doi=doi))
+                    # only the lines of the resolved reference are skipped, in case the entry holds other references
+                    doi_text, text = split_doi_entry(text)
+                    skipped_chars += len(doi_text)
+                if text.strip():
+                    remaining.append(text)
+            bib_info.append(section_info)
+            remaining_sections.append("\n".join(remaining))
+        
+        total_chars = sum(len(bib) for bib in bib_sections)
+        named_log(self, f"==> DOI pre-pass: resolved {sum(len(section_info) for section_info in bib_info)} references from {len(dois)} DOIs, "
+                        f"{skipped_chars / max(1, total_chars):.0%} of the bibliography text skipped from LLM extraction")
+        return bib_info, remaining_sections
+
+    def _extract_heuristic_references(self, bib_sections: List[str]) -> tuple[List[List[BibliographyInfo]], List[str]]:
+        """
+        Parse the bibliography sections with the heuristic splitter (see bib_splitter.parse_bibliography).
+        
+        Returns:
+            bib_info (List[List[BibliographyInfo]]): references parsed with confidence, for each section
+            bib_sections (List[str]): the entries (or whole sections) that couldn't be parsed, to be sent to the LLM
+        """
+        bib_info: List[List[BibliographyInfo]] = []
+        remaining_sections: List[str] = []
+        for bib in bib_sections:
+            if not bib.strip():
+                bib_info.append([])
+                remaining_sections.append("")
+                continue
+            references, unparsed = parse_bibliography(bib)
+            bib_info.append([BibliographyInfo(title=ref.title, authors=ref.authors) for ref in references])
+            remaining_sections.append(unparsed)
+        
+        total_chars = sum(len(bib) for bib in bib_sections)
+        remaining_chars = sum(len(bib) for bib in remaining_sections)
+        named_log(self, f"==> heuristic split: parsed {sum(len(section_info) for section_info in bib_info)} references, "
+                        f"{1 - remaining_chars / max(1, total_chars):.0%} of the bibliography text skipped from LLM extraction")
+        return bib_info, remaining_sections
 
     def to_bibtex_db(self, bib_info: List[BibliographyInfo], filter_duplicates = True, save_path: Optional[str] = None):
+        results = self.resolve(bib_info)
+        
         bibtex_db = bibtexparser.bibdatabase.BibDatabase()
-        for ref in bib_info:
-            try:
-                entry = get_bibtex_entry(ref.title, ref.authors)
-                if not entry:
-                    named_log(self, f"==> no bibtex entry for: {ref}")
-                    continue
-                
-                entry["ID"] = f"key{len(bibtex_db.entries)}"
-                bibtex_db.entries.append(entry)
-            except Exception as e:
-                named_log(self, f"==> bibtex entry raised exception for {ref!r}: {e}")
+        for ref, entry in zip(bib_info, results):
+            if isinstance(entry, Exception):
+                named_log(self, f"==> bibtex entry raised exception for {ref!r}: {entry}")
+                continue
+            if not entry:
+                named_log(self, f"==> no bibtex entry for: {ref}")
+                continue
+            
+            entry["ID"] = f"key{len(bibtex_db.entries)}"
+            bibtex_db.entries.append(entry)
+        
+        if bib_cache := get_bib_cache():
+            named_log(self, f"==> bibliography cache: {bib_cache.summary()}")
         
         if filter_duplicates:
             bibtex_db, amount = self._filter_duplicates_bibtexdb(bibtex_db)
@@ -112,6 +310,37 @@ class ReferencesBibExtractor:
                 
         return bibtex_db
 
+    def resolve(self, bib_info: List[BibliographyInfo]) -> List[Optional[dict] | Exception]:
+        """
+        Resolve the bibtex entry (without ID) of each reference, in the same order as bib_info:
+        None if it wasn't found, or the exception raised while resolving it
+        """
+        # references are resolved concurrently, but entries are returned in the same order as bib_info
+        resolver = get_crossref_resolver()
+        named_log(self, f"==> resolving {len(bib_info)} references with {resolver.settings.max_workers} workers")
+        results: List[Optional[dict] | Exception] = [None] * len(bib_info)
+        
+        # references with a printed DOI don't need a search (and were usually resolved in extract already)
+        doi_indices = [i for i, ref in enumerate(bib_info) if ref.doi]
+        missing_dois = list(dict.fromkeys(bib_info[i].doi for i in doi_indices if bib_info[i].doi not in self._doi_entries))
+        resolved_dois = dict(zip(missing_dois, resolver.resolve_dois(missing_dois)))
+        for i in doi_indices:
+            doi = bib_info[i].doi
+            entry = self._doi_entries.get(doi, resolved_dois.get(doi))
+            results[i] = dict(entry) if isinstance(entry, dict) else entry
+        
+        # references to the same work (cited by several papers, with small differences in the title) are resolved once
+        search_indices = [i for i, ref in enumerate(bib_info) if not ref.doi]
+        representatives = group_near_duplicates([(bib_info[i].title, bib_info[i].authors) for i in search_indices])
+        unique = list(dict.fromkeys(representatives))
+        named_log(self, f"==> collapsed {len(search_indices)} references without DOI into {len(unique)} unique works")
+        unique_results = dict(zip(unique, resolver.resolve_many((bib_info[search_indices[j]].title, bib_info[search_indices[j]].authors) for j in unique)))
+        for i, rep in zip(search_indices, representatives):
+            entry = unique_results[rep]
+            results[i] = dict(entry) if isinstance(entry, dict) else entry
+        
+        return results
+
     def _filter_duplicates_bibtexdb(self, bibtex_db: bibtexparser.bibdatabase.BibDatabase):
         seen_dois = set()
         seen_keys = set()
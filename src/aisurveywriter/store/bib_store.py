@@ -0,0 +1,125 @@
+from typing import List, Optional
+from pydantic import BaseModel
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from ..res_extract.reference_extract import BibliographyInfo
+from ..utils.logger import named_log
+
+class DocumentBib(BaseModel):
+    """
+    References extracted from the bibliography section of one reference document, and the
+    bibtex entry (without ID) each one was resolved to (None if it wasn't, to be resolved again)
+    """
+    source: str
+    references: List[BibliographyInfo]
+    entries: List[Optional[dict]]
+
+    def unresolved(self) -> List[int]:
+        return [i for i, entry in enumerate(self.entries) if entry is None]
+
+    def resolved_entries(self) -> List[dict]:
+        return [entry for entry in self.entries if entry]
+
+class DocumentBibStore:
+    """
+    Content-addressed store of extracted and resolved bibliographies, one entry per reference
+    document. Each entry is keyed by the hash of the document bibliography section plus the
+    settings used to extract and resolve it (LLM, CrossRef mode):
+
+        <store_dir>/<key[:2]>/<key>.json
+
+    Entries don't depend on the document path, so a bibliography is only extracted once
+    across reference stores and survey runs. Documents whose extraction failed in part are
+    never saved, so they're extracted again by the next run.
+    """
+    # bumped when the entry format changes, so old entries are extracted again
+    FORMAT_VERSION = 2
+
+    def __init__(self, store_dir: str, settings: dict):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        settings_json = json.dumps({**settings, "format": self.FORMAT_VERSION}, sort_keys=True)
+        self._settings_hash = hashlib.sha256(settings_json.encode("utf-8")).hexdigest()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, bib_section: str) -> str:
+        section_hash = hashlib.sha256(bib_section.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{section_hash}:{self._settings_hash}".encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def load(self, key: str) -> Optional[DocumentBib]:
+        path = self._entry_path(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                document_bib = DocumentBib.model_validate_json(f.read())
+        except Exception as e:
+            named_log(self, f"unable to load bibliography store entry {key}, extracting it again:", e)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return document_bib
+
+    def save(self, key: str, document_bib: DocumentBib):
+        # write to a temporary file and move it at once, so concurrent runs never see a partial entry
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{key}-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(document_bib.model_dump_json())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            named_log(self, f"unable to save bibliography store entry for {os.path.basename(document_bib.source)}:", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def entry_identity(entry: dict) -> tuple[Optional[str], Optional[str]]:
+    """
+    (doi, normalized title) of a bibtex entry, used to find the same work in different documents
+    """
+    doi = entry.get("doi")
+    if doi:
+        doi = doi.replace(" ", "").strip().lower()
+    title = entry.get("title", entry.get("booktitle"))
+    if title:
+        title = " ".join(re.sub(r"[^\w\s]", " ", title.lower()).split())
+    return doi or None, title or None
+
+class BibManifest(BaseModel):
+    """
+    Saved next to the merged bibtex database: the bibtex keys cited by each document (by store key),
+    so a later run only adds the entries of new documents and removes those no longer cited
+    """
+    documents: dict[str, List[str]] = {}
+    # bibtex keys of the entries loaded with the references themselves (not extracted)
+    loaded_keys: List[str] = []
+
+    @staticmethod
+    def path(bibtex_db_path: str) -> str:
+        return re.sub(r"\.bib$", "", bibtex_db_path) + "-manifest.json"
+
+    @staticmethod
+    def load(bibtex_db_path: str) -> Optional["BibManifest"]:
+        path = BibManifest.path(bibtex_db_path)
+        if not os.path.isfile(path) or not os.path.isfile(bibtex_db_path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return BibManifest.model_validate_json(f.read())
+
+    def save(self, bibtex_db_path: str):
+        with open(BibManifest.path(bibtex_db_path), "w", encoding="utf-8") as f:
+            f.write(self.model_dump_json(indent=2))
@@ -0,0 +1,102 @@
+from typing import Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from ..core.document import Document
+from ..core.lp_handler import LayoutParserSettings
+from ..utils.logger import named_log
+from ..utils.helpers import file_sha256
+
+class ParseCache:
+    """
+    Content-addressed cache of parsed reference PDFs. Each entry is keyed by the
+    PDF content hash plus the layout/OCR settings used to parse it, and stores
+    the parsed Document and its figure images:
+
+        <cache_dir>/<key[:2]>/<key>/document.json
+        <cache_dir>/<key[:2]>/<key>/figures/*.png
+
+    Entries don't depend on the PDF path, so the same file is only parsed once
+    across reference stores, directories and survey runs. The bibtex entry isn't
+    stored, since its key depends on the path and its lookup may fail temporarily.
+    """
+    def __init__(self, cache_dir: str, lp_settings: LayoutParserSettings):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        settings_json = json.dumps(lp_settings.parse_settings_key(), sort_keys=True)
+        self._settings_hash = hashlib.sha256(settings_json.encode("utf-8")).hexdigest()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, pdf_path: str) -> str:
+        return hashlib.sha256(f"{file_sha256(pdf_path)}:{self._settings_hash}".encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def load(self, pdf_path: str, images_output_dir: str) -> Optional[Document]:
+        """
+        Load the cached Document for pdf_path, copying its figures to images_output_dir.
+        Returns None if the PDF (with these settings) was never parsed.
+        """
+        entry_dir = self._entry_dir(self.key(pdf_path))
+        document_path = os.path.join(entry_dir, "document.json")
+        if not os.path.isfile(document_path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(document_path, "r", encoding="utf-8") as f:
+                document = Document.model_validate_json(f.read())
+
+            # restore figures to the output directory and point the document to the current file
+            os.makedirs(images_output_dir, exist_ok=True)
+            for figure in document.figures or []:
+                output_path = os.path.join(images_output_dir, figure.image_path)
+                shutil.copyfile(os.path.join(entry_dir, "figures", figure.image_path), output_path)
+                figure.image_path = output_path
+                figure.source_path = pdf_path
+            for page in document.pages:
+                page.source_path = pdf_path
+            document.path = pdf_path
+        except Exception as e:
+            named_log(self, f"unable to load cache entry for {os.path.basename(pdf_path)}, parsing it again:", e)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return document
+
+    def save(self, pdf_path: str, document: Document):
+        key = self.key(pdf_path)
+        entry_dir = self._entry_dir(key)
+        if os.path.isfile(os.path.join(entry_dir, "document.json")):
+            return
+
+        # write everything to a temporary directory and move it at once, so concurrent
+        # runs never see a partial entry
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=os.path.dirname(entry_dir))
+        try:
+            cached = document.model_copy(deep=True)
+            # the bibtex entry is looked up again after loading (see PDFProcessor.parse_pdfs)
+            cached.bibtex_entry = None
+            os.makedirs(os.path.join(tmp_dir, "figures"))
+            for figure in cached.figures or []:
+                figure_basename = os.path.basename(figure.image_path)
+                shutil.copyfile(figure.image_path, os.path.join(tmp_dir, "figures", figure_basename))
+                figure.image_path = figure_basename
+
+            with open(os.path.join(tmp_dir, "document.json"), "w", encoding="utf-8") as f:
+                f.write(cached.model_dump_json())
+
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            # another process already stored this entry, or the figures are gone
+            named_log(self, f"unable to save cache entry for {os.path.basename(pdf_path)}:", e)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
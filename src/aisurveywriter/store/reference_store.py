@@ -62,7 +62,7 @@ class ReferenceStore(BaseModel):
                 bib_sections.append(content[ref_match.start():].strip())
                 nobib_contents.append(content[:ref_match.start()])
             else:
-                named_log(self, f"couldn't match references regex for pdf {os.path.basename(self.paths[i])}, using entire content")
+                named_log(self, f"couldn't match references regex for pdf {os.path.basename(document.path)}, using entire content")
                 bib_sections.append(content)
                 nobib_contents.append(content)
 
@@ -120,7 +120,7 @@ class ReferenceStore(BaseModel):
                 return i
         return None
 
-    def add_references(self, paths: List[str]):
+    def add_references(self, paths: List[str], parse_stats_path: Optional[str] = None):
         # get pdf and non pdf separately
         pdf_paths = []
         non_pdf_paths = []
@@ -142,9 +142,12 @@ class ReferenceStore(BaseModel):
             return
         
         # process pdfs first
-        pdf_processor = PDFProcessor(pdf_paths, self.lp_settings, self.images_dir)
-        pdf_documents = pdf_processor.parse_pdfs()
-        self.documents.extend(pdf_documents)
+        if pdf_paths:
+            pdf_processor = PDFProcessor(pdf_paths, self.lp_settings, self.images_dir)
+            pdf_documents = pdf_processor.parse_pdfs()
+            self.documents.extend(pdf_documents)
+            if parse_stats_path:
+                pdf_processor.parse_stats.save_json(parse_stats_path)
     
         # process non pdfs
         nonpdf_documents = ReferenceStore.load_nonpdf(non_pdf_paths, None)
@@ -157,13 +160,20 @@ class ReferenceStore(BaseModel):
         with open(path, "wb") as f:
             pickle.dump(self, f)
 
+    @staticmethod
+    def parse_stats_path(store_path: str) -> str:
+        """
+        Path of the PDF parse stats JSON saved next to a reference store
+        """
+        return os.path.splitext(store_path)[0] + "_parse_stats.json"
+
     @staticmethod
     def from_local(path: str):
         with open(path, "rb") as f:
             store: ReferenceStore = pickle.load(f)
         return store
 
-    def update_references(self, paths: List[str]):
+    def update_references(self, paths: List[str], parse_stats_path: Optional[str] = None):
         if len(self.paths) >= len(paths):
             # remove references that are not in the new paths
             diff = set(self.paths) - set(paths)
@@ -187,7 +197,7 @@ class ReferenceStore(BaseModel):
         else:
             # add new references
             diff = set(paths) - set(self.paths)
-            self.add_references(paths)
+            self.add_references(paths, parse_stats_path)
 
     @staticmethod
     def load_nonpdf(paths: List[str], title_extractor_llm: Optional[LLMHandler] = None):
@@ -257,12 +267,13 @@ class ReferenceStore(BaseModel):
         pdf_processor = PDFProcessor(pdf_paths, lp_settings, images_output_dir)
         pdf_documents = pdf_processor.parse_pdfs()
         if len(non_pdf_paths) == 0:
-            reference_store = ReferenceStore(pdf_documents, images_dir=images_output_dir)
+            reference_store = ReferenceStore(pdf_documents, images_dir=images_output_dir, lp_settings=lp_settings)
         else:
             # process non-pdfs
             non_pdf_documents: List[Document] = ReferenceStore.load_nonpdf(non_pdf_paths, title_extractor_llm)
-            reference_store = ReferenceStore(pdf_documents + non_pdf_documents, images_dir=images_output_dir)
+            reference_store = ReferenceStore(pdf_documents + non_pdf_documents, images_dir=images_output_dir, lp_settings=lp_settings)
 
         if save_local:
             reference_store.save_local(save_local)
+            pdf_processor.parse_stats.save_json(ReferenceStore.parse_stats_path(save_local))
         return reference_store
@@ -16,7 +16,10 @@ from .store.prompt_store import PromptStore, PromptInfo, default_prompt_store
 from .core.pipeline import PaperPipeline
 import aisurveywriter.tasks as tks
 from .utils.logger import named_log
-from .utils.helpers import time_func, load_pydantic_yaml, save_pydantic_yaml
+from .utils.helpers import time_func, load_pydantic_yaml, save_pydantic_yaml, default_cache_dir
+from .utils.bib_cache import BibCacheSettings, configure_bib_cache
+from .utils.crossref import CrossrefSettings, configure_crossref
+from .core.llm_cache import LLMCacheSettings, configure_llm_cache
 
 class SurveyAgentType(str, ReprEnum):
     StructureGenerator: str = "structure_generator"
@@ -46,6 +49,33 @@ class SurveyContextConfig(BaseModel):
     
     reference_store_path: Optional[str] = None
     tesseract_executable: str = "tesseract"
+    pdf_parse_workers: int = 1
+    pdf_torch_threads: Optional[int] = None
+    pdf_raster_backend: str = "pdf2image"
+    pdf_layout_batch_size: int = 1
+    pdf_use_text_layer: bool = False
+    pdf_ocr_backend: str = "block"
+    pdf_figure_source: str = "crop"
+    pdf_parse_cache: bool = True
+    # persistent cache of DOI/bibtex/abstract lookups, with its time to live (days) for found and not found results
+    bib_cache: bool = True
+    bib_cache_ttl_days: float = 90
+    bib_cache_negative_ttl_days: float = 7
+    # concurrent CrossRef resolution of extracted references
+    crossref_workers: int = 8
+    crossref_requests_per_second: float = 10.0
+    crossref_mailto: Optional[str] = None
+    # "works" (one CrossRef request per reference) or "negotiation" (CrossRef search + doi.org + abstract lookup)
+    crossref_mode: str = "negotiation"
+    # token budgets of each reference extraction request (None = derived from the model limits)
+    bib_extract_input_tokens: Optional[int] = None
+    bib_extract_output_tokens: Optional[int] = None
+    # concurrent reference extraction requests (1 = serial with the request cooldown) and their rate limit
+    bib_extract_workers: int = 1
+    bib_extract_requests_per_minute: Optional[float] = None
+    
+    # directory for on-disk caches shared between runs (None = default_cache_dir())
+    cache_dir: Optional[str] = None
     
     no_ref_faiss: bool = False
     no_review: bool = False
@@ -71,7 +101,12 @@ class SurveyContextConfig(BaseModel):
     faisscontent_path: Optional[str] = None
     faiss_confidence: float = 0.90
 
-    llm_request_cooldown_sec: int = 30
+    # fixed sleep after each LLM request, only for LLMs without requests/tokens per minute budgets (see LLMConfig)
+    llm_request_cooldown_sec: Optional[int] = 30
+    # persistent cache of LLM responses: "off", "readwrite" or "readonly" (replay cached responses, store nothing)
+    llm_cache: str = "off"
+    # with llm_cache "readonly": fail on a response that isn't cached instead of requesting it to the LLM
+    llm_cache_strict: bool = False
     embed_request_cooldown_sec: int = 0
 
     def save_yaml(self, path: str):
@@ -119,15 +154,29 @@ class SurveyContext:
             self.images_dir = os.path.join(self.output_dir, "images") # rag creates this directory if none was provided
         self.paper.fig_path = self.images_dir
 
+        self.cache_dir = config.cache_dir if config.cache_dir else default_cache_dir()
+        configure_bib_cache(BibCacheSettings(cache_dir=os.path.join(self.cache_dir, "bib") if config.bib_cache else None,
+                                             ttl_days=config.bib_cache_ttl_days, negative_ttl_days=config.bib_cache_negative_ttl_days))
+        configure_llm_cache(LLMCacheSettings(mode=config.llm_cache, cache_dir=os.path.join(self.cache_dir, "llm"), strict=config.llm_cache_strict))
+        configure_crossref(CrossrefSettings(max_workers=config.crossref_workers, requests_per_second=config.crossref_requests_per_second,
+                                            mailto=config.crossref_mailto or CrossrefSettings().mailto, mode=config.crossref_mode))
+        
         # Initialize Layout Parser settings
         lp_config = "lp://PubLayNet/mask_rcnn_X_101_32x8d_FPN_3x/config"
-        lp_settings = LayoutParserSettings(config_path=lp_config, tesseract_executable=config.tesseract_executable)
+        lp_settings = LayoutParserSettings(config_path=lp_config, tesseract_executable=config.tesseract_executable,
+                                           parse_workers=config.pdf_parse_workers, torch_threads=config.pdf_torch_threads,
+                                           raster_backend=config.pdf_raster_backend, layout_batch_size=config.pdf_layout_batch_size,
+                                           use_text_layer=config.pdf_use_text_layer, ocr_backend=config.pdf_ocr_backend,
+                                           figure_source=config.pdf_figure_source,
+                                           parse_cache_dir=os.path.join(self.cache_dir, "pdf_parse") if config.pdf_parse_cache else None,
+                                           model_cache_dir=os.path.join(self.cache_dir, "lp_models"))
         
         # Load or create reference store
         if self.config.reference_store_path:
             self.references = ReferenceStore.from_local(self.config.reference_store_path)
-            self.references.update_references(self.config.ref_paths)
             self.references.lp_settings = lp_settings
+            self.references.update_references(self.config.ref_paths,
+                                              parse_stats_path=ReferenceStore.parse_stats_path(self.config.reference_store_path))
             named_log(self, "loaded reference store from", self.config.reference_store_path, f"total of {len(self.references.documents)} references")
         else:
             self.config.reference_store_path = os.path.join(self.output_dir, "refstore.pkl")
@@ -141,7 +190,7 @@ class SurveyContext:
         # Create LLM handlers
         llms_config = config.llms
         self.llms = {agent_type: None for agent_type in SurveyAgentType}
-        self._llm_cooldown = config.llm_request_cooldown_sec
+        self._llm_cooldown = config.llm_request_cooldown_sec or 0
         
         # load configuration for each LLM
         for agent_type, llm_config in llms_config.items():
@@ -163,7 +212,12 @@ class SurveyContext:
         self.rags = AgentRAG(self.embed, self.llms[SurveyAgentType.StructureGenerator], 
                              config.faissbib_path, config.faissfig_path, config.faisscontent_path, 
                              request_cooldown_sec=6, output_dir=self.output_dir, 
-                             confidence=self.confidence)
+                             confidence=self.confidence,
+                             bib_input_token_budget=config.bib_extract_input_tokens,
+                             bib_output_token_budget=config.bib_extract_output_tokens,
+                             bib_extract_workers=config.bib_extract_workers,
+                             bib_extract_requests_per_minute=config.bib_extract_requests_per_minute,
+                             bib_store_dir=os.path.join(self.cache_dir, "bib_extract"))
                 
         
         self.pipe_steps: List[tks.PipelineTask] = None
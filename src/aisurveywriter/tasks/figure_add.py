@@ -14,7 +14,7 @@ from ..core.agent_context import AgentContext
 from ..core.agent_rags import RAGType, ImageData
 from ..core.paper import PaperData
 from ..core.document import DocFigure
-from ..utils.logger import named_log, cooldown_log, metadata_log
+from ..utils.logger import named_log, metadata_log
 from ..utils.helpers import time_func, assert_type
 
 class FigureAddInfo(BaseModel):
@@ -43,7 +43,6 @@ class PaperFigureAdd(PipelineTask):
                                                                "**TITLE**: {title}\n"+
                                                                "**CONTENT**:\n{content}\n\n"+
                                                                "[end: section_content]")
-        self.agent_ctx.llm_handler.init_chain_messages(self._system, self._human)
 
         self.confidence = confidence
         self.max_figures = max_figures
@@ -59,8 +58,6 @@ class PaperFigureAdd(PipelineTask):
         self.agent_ctx._working_paper.fig_path = self.used_imgs_dest
         
     def add_figures(self):
-        self.agent_ctx.llm_handler.init_chain_messages(self._system, self._human)
-
         # keep track of all available figures and used ones
         available_figures = self.agent_ctx.references.all_figures()
         used_figures: List[tuple[str, DocFigure]] = [] # label in text, docfigure object
@@ -116,7 +113,8 @@ class PaperFigureAdd(PipelineTask):
                 ref_figures_str += f"FIGURE_ID: {fig_id}\nFIGURE_CAPTION: {fig_caption}\n\n"
             ref_figures_str += f"__end source: {src!r}__\n\n"
         
-        elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+        prompt = self.agent_ctx.llm_handler.bind_prompt(self._system, self._human)
+        elapsed, response = time_func(prompt.invoke, {
             "ref_figures": ref_figures_str,
             "subject": self.agent_ctx._working_paper.subject,
             "title": section_title,
@@ -134,8 +132,7 @@ class PaperFigureAdd(PipelineTask):
             figures = FigureAddResponse(figures=[])
         
         metadata_log(self, elapsed, response)
-        if self.agent_ctx.llm_cooldown:
-            cooldown_log(self, self.agent_ctx.llm_cooldown)
+        self.agent_ctx.llm_cooldown_wait(self, response)
         
         return figures
 
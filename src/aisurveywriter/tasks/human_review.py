@@ -7,7 +7,7 @@ from aisurveywriter.core.agent_context import AgentContext
 from aisurveywriter.core.agent_rags import RAGType, GeneralTextData
 from aisurveywriter.core.paper import PaperData, SectionData
 from aisurveywriter.tasks import PipelineTask
-from aisurveywriter.utils.logger import named_log, metadata_log, cooldown_log
+from aisurveywriter.utils.logger import named_log, metadata_log
 from aisurveywriter.utils.helpers import time_func
 
 class HumanReview(PipelineTask):
@@ -21,7 +21,6 @@ class HumanReview(PipelineTask):
                                                                      "- Apply the review directives to the following section:\nSection title: {title}\nSection content:\n{content}")
         
     def run(self) -> PaperData:
-        self.agent_ctx.llm_handler.init_chain_messages(self._apply_system, self._apply_human)
         self._cmd_listener()
         
         return self.agent_ctx._working_paper
@@ -41,7 +40,8 @@ class HumanReview(PipelineTask):
                 
             print("Sending your directives to LLM...")
 
-            elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+            apply_prompt = self.agent_ctx.llm_handler.bind_prompt(self._apply_system, self._apply_human)
+            elapsed, response = time_func(apply_prompt.invoke, {
                 "refcontent": self._get_reference_content(section),
                 "subject": self.agent_ctx._working_paper.subject,
                 "review_directives": "\n".join(directives),
@@ -51,8 +51,7 @@ class HumanReview(PipelineTask):
             named_log(self, "got response from LLM")
             metadata_log(self, elapsed, response)
             
-            if self.agent_ctx.llm_cooldown:
-                cooldown_log(self, self.agent_ctx.llm_cooldown)
+            self.agent_ctx.llm_cooldown_wait(self, response)
             
             print("Changes applied to the paper")
             self.agent_ctx._working_paper.sections[sec_num].content = re.sub(r"[`]+[\w]*", "", response.content)
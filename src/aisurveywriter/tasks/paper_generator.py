@@ -7,7 +7,7 @@ from langchain_core.prompts.chat import SystemMessagePromptTemplate, HumanMessag
 
 from aisurveywriter.core.paper import PaperData, SectionData
 from aisurveywriter.core.agent_context import AgentContext
-from aisurveywriter.utils.logger import named_log, cooldown_log, metadata_log
+from aisurveywriter.utils.logger import named_log, metadata_log
 from aisurveywriter.utils.helpers import time_func, assert_type
 
 from .pipeline_task import PipelineTask
@@ -24,11 +24,11 @@ class PaperStructureGenerator(PipelineTask):
     def generate(self, save_json_path: Optional[str] = None) -> dict[str,List[dict[str,str]]]:
         named_log(self, f"==> start generating structure for paper on subject {self.agent_ctx._working_paper.subject!r}")
         
-        self.agent_ctx.llm_handler.init_chain_messages(
+        prompt = self.agent_ctx.llm_handler.bind_prompt(
             SystemMessagePromptTemplate.from_template(self.agent_ctx.prompts.generate_struct.text),
             HumanMessagePromptTemplate.from_template("[begin: references_content]\n\n{refcontent}\n\n[end: references_content]")
         )
-        elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+        elapsed, response = time_func(prompt.invoke, {
             "subject": self.agent_ctx._working_paper.subject,
             "refcontent": self.agent_ctx.references.full_content(discard_bibliography=True),
         })
@@ -42,8 +42,7 @@ class PaperStructureGenerator(PipelineTask):
             raise e
             
         metadata_log(self, elapsed, response)
-        if self.agent_ctx.llm_cooldown:
-            cooldown_log(self, self.agent_ctx.llm_cooldown)
+        self.agent_ctx.llm_cooldown_wait(self, response)
 
         if save_json_path:
             with open(save_json_path, "w", encoding="utf-8") as f:
@@ -9,7 +9,7 @@ from .pipeline_task import PipelineTask
 from ..core.agent_context import AgentContext
 from ..core.agent_rags import RAGType, BibTexData, FAISS
 from ..core.paper import PaperData
-from ..utils.logger import named_log, cooldown_log, metadata_log
+from ..utils.logger import named_log, metadata_log
 from ..utils.helpers import assert_type, time_func
 
 
@@ -36,7 +36,7 @@ class PaperReferencer(PipelineTask):
         
     def reference(self) -> PaperData:
         assert self.agent_ctx.rags.is_enabled(RAGType.BibTex)
-        self.agent_ctx.llm_handler.init_chain_messages(self._system_prompt, self._human_prompt)
+        prompt = self.agent_ctx.llm_handler.bind_prompt(self._system_prompt, self._human_prompt)
         
         used_keys = {}
         probabilities = {1: 0.55, 2: 0.2, 3: 0.14, 4: 0.11}
@@ -87,7 +87,7 @@ class PaperReferencer(PipelineTask):
 
                 named_log(self, f"request LLM to add references in paragraph {paragraph_idx+1}/{len(paragraphs)}, section {section_idx+1}/{section_amount}")
                 refs_str = "\n\n".join([f"Title: {ref.title}\nAbstract: {ref.abstract}\nKeywords: {ref.keywords}\n**BIBTEX_KEY**: {ref.bibtex_key}" for ref in paragraph_refs])
-                elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+                elapsed, response = time_func(prompt.invoke, {
                     "subject": self.agent_ctx._working_paper.subject,
                     "references": refs_str,
                     "paragraph_info": f"*SECTION TITLE*: {section.title}\n*PARAGRAPH*:\n{paragraph}"
@@ -111,8 +111,7 @@ class PaperReferencer(PipelineTask):
                 metadata_log(self, elapsed, response)
                 named_log(self, f"{len(paragraph_keys)} references added to paragraph {paragraph_idx+1}/{len(paragraphs)}")
 
-                if self.agent_ctx.llm_cooldown:
-                    cooldown_log(self, self.agent_ctx.llm_cooldown)
+                self.agent_ctx.llm_cooldown_wait(self, response)
                     
                 # update paragraph in section
                 paragraphs[paragraph_idx] = response.content
@@ -7,7 +7,7 @@ from langchain_core.prompts.chat import SystemMessagePromptTemplate, HumanMessag
 from .pipeline_task import PipelineTask
 from aisurveywriter.core.agent_context import AgentContext
 from aisurveywriter.core.paper import PaperData, SectionData
-from aisurveywriter.utils.logger import named_log, cooldown_log, metadata_log
+from aisurveywriter.utils.logger import named_log, metadata_log
 from aisurveywriter.utils.helpers import assert_type, time_func
 
 class PaperRefiner(PipelineTask):
@@ -19,10 +19,9 @@ class PaperRefiner(PipelineTask):
         
         self._system = SystemMessagePromptTemplate.from_template(self.agent_ctx.prompts.abstract_and_title.text)
         self._human = HumanMessagePromptTemplate.from_template("Produce Title and Abstract for this LaTeX paper:\n\n{content}")
-        self.agent_ctx.llm_handler.init_chain_messages(self._system, self._human)
         
     def refine(self) -> PaperData:
-        self.agent_ctx.llm_handler.init_chain_messages(self._system, self._human)
+        prompt = self.agent_ctx.llm_handler.bind_prompt(self._system, self._human)
 
         named_log(self, f"==> asking LLM to produce title and abstract")
 
@@ -34,15 +33,14 @@ class PaperRefiner(PipelineTask):
         # remove cite commands
         paper_content = re.sub(r"\\cite{([^}]+)}", "", paper_content)
         
-        elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+        elapsed, response = time_func(prompt.invoke, {
             "subject": self.agent_ctx._working_paper.subject,
             "content": paper_content,
         })
         
         named_log(self, f"==> got title and abstract from LLM")
         metadata_log(self, elapsed, response)
-        if self.agent_ctx.llm_cooldown:
-            cooldown_log(self, self.agent_ctx.llm_cooldown)
+        self.agent_ctx.llm_cooldown_wait(self, response)
         
         try:
             resp_json = re.search(r"```json\s*([\s\S]+?)\s*```|({[\s\S]+})", response.content.strip()).group()
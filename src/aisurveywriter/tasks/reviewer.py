@@ -9,7 +9,7 @@ from aisurveywriter.core.paper import PaperData, SectionData
 from aisurveywriter.core.agent_context import AgentContext
 from aisurveywriter.core.agent_rags import RAGType, GeneralTextData
 from aisurveywriter.tasks.pipeline_task import PipelineTask
-from aisurveywriter.utils.logger import named_log, cooldown_log, metadata_log
+from aisurveywriter.utils.logger import named_log, metadata_log
 from aisurveywriter.utils.helpers import time_func, assert_type
 
 
@@ -43,6 +43,9 @@ class PaperReviewer(PipelineTask):
         self._extra_review_directives: List[str] = EXTRA_REVIEW_DIRECTIVES if EXTRA_REVIEW_DIRECTIVES else None
     
     def review(self) -> PaperData:
+        review_prompt = self.agent_ctx.llm_handler.bind_prompt(self._review_system, self._review_human)
+        apply_prompt = self.agent_ctx.llm_handler.bind_prompt(self._apply_system, self._apply_human)
+        
         section_amount = len(self.agent_ctx._working_paper.sections)
         all_sections = [f"{i+1}. {s.title}" for i, s in enumerate(self.agent_ctx._working_paper.sections)]
         reviewed_sections = []
@@ -55,8 +58,7 @@ class PaperReviewer(PipelineTask):
             named_log(self, f"==> start reviewing section ({i+1}/{section_amount}): \"{section.title}\"")
             named_log(self, f"==> getting review points from LLM")
     
-            self.agent_ctx.llm_handler.init_chain_messages(self._review_system, self._review_human)
-            elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+            elapsed, response = time_func(review_prompt.invoke, {
                 "refcontent": section_reference,
                 "subject": self.agent_ctx._working_paper.subject,
                 "paper_sections": "; ".join(all_sections),
@@ -67,8 +69,7 @@ class PaperReviewer(PipelineTask):
             
             named_log(self, f"==> review points gathered (word count: {len(response.content.split())})")
             metadata_log(self, elapsed, response)
-            if self.agent_ctx.llm_cooldown:
-                cooldown_log(self, self.agent_ctx.llm_cooldown)
+            self.agent_ctx.llm_cooldown_wait(self, response)
                 
             named_log(self, f"==> sending directives for LLM to apply")
             
@@ -76,8 +77,7 @@ class PaperReviewer(PipelineTask):
             if self._extra_review_directives:
                 review_directives += "\n\n" + "\n".join(self._extra_review_directives)
             
-            self.agent_ctx.llm_handler.init_chain_messages(self._apply_system, self._apply_human)
-            elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+            elapsed, response = time_func(apply_prompt.invoke, {
                 "refcontent": section_reference,
                 "subject": self.agent_ctx._working_paper.subject,
                 "paper_sections": "; ".join(all_sections),
@@ -92,8 +92,7 @@ class PaperReviewer(PipelineTask):
             named_log(self, f"==> finish reviewing section ({i+1}/{section_amount}) | total word count: {total_words}")
             
             metadata_log(self, elapsed, response)
-            if self.agent_ctx.llm_cooldown:
-                cooldown_log(self, self.agent_ctx.llm_cooldown)
+            self.agent_ctx.llm_cooldown_wait(self, response)
 
             reviewed_sections.append(f"{i+1}. {section.title}")
         
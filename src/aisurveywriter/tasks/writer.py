@@ -7,7 +7,7 @@ from aisurveywriter.core.paper import PaperData, SectionData
 from aisurveywriter.core.agent_context import AgentContext
 from aisurveywriter.core.agent_rags import RAGType, GeneralTextData
 from aisurveywriter.tasks.pipeline_task import PipelineTask
-from aisurveywriter.utils.logger import named_log, cooldown_log, metadata_log
+from aisurveywriter.utils.logger import named_log, metadata_log
 from aisurveywriter.utils.helpers import time_func, assert_type
         
 class PaperWriter(PipelineTask):
@@ -29,11 +29,9 @@ class PaperWriter(PipelineTask):
                                                                "- Section title: {title}\n"+
                                                                "- Section description:\n{description}\n\n"+
                                                                "[end: section]")
-
-        self.agent_ctx.llm_handler.init_chain_messages(self._system, self._human)
     
     def write(self) -> PaperData:
-        self.agent_ctx.llm_handler.init_chain_messages(self._system, self._human)
+        prompt = self.agent_ctx.llm_handler.bind_prompt(self._system, self._human)
         
         section_amount = len(self.agent_ctx._working_paper.sections)
         all_sections = [f"{i+1}. {s.title}" for i, s in enumerate(self.agent_ctx._working_paper.sections)]
@@ -45,7 +43,7 @@ class PaperWriter(PipelineTask):
 
             named_log(self, f"==> start writing content for section ({i+1}/{section_amount}): \"{section.title}\"")
             
-            elapsed, response = time_func(self.agent_ctx.llm_handler.invoke, {
+            elapsed, response = time_func(prompt.invoke, {
                 "refcontent": self._get_reference_content(section),
                 "subject": self.agent_ctx._working_paper.subject,
                 "paper_sections": "; ".join(all_sections),
@@ -59,8 +57,7 @@ class PaperWriter(PipelineTask):
 
             named_log(self, f"==> finished writing section ({i+1}/{section_amount}) | total word count: {total_words}")
             metadata_log(self, elapsed, response)
-            if self.agent_ctx.llm_cooldown:
-                cooldown_log(self, self.agent_ctx.llm_cooldown)
+            self.agent_ctx.llm_cooldown_wait(self, response)
 
             written_sections.append(f"{i+1}. {section.title}")
 
@@ -0,0 +1,179 @@
+from typing import Optional, Any
+from pydantic import BaseModel
+from time import time
+import threading
+import sqlite3
+import json
+import os
+import re
+
+from .logger import global_log
+
+# cache namespaces
+DOI_NS = "doi"            # normalized title/author query -> DOI
+BIBTEX_NS = "bibtex"      # DOI -> bibtex text (doi.org content negotiation)
+ABSTRACT_NS = "abstract"  # DOI -> abstract
+WORK_NS = "work"          # DOI -> CrossRef works record (selected fields)
+
+# returned by BibCache.get when there is no valid entry (None is a cached negative result)
+MISS = object()
+
+class BibCacheSettings(BaseModel):
+    # directory of the cache database (None = cache disabled)
+    cache_dir: Optional[str] = None
+    # time to live of found values and of negative results (not found), in days
+    ttl_days: float = 90
+    negative_ttl_days: float = 7
+
+class BibCache:
+    """
+    Persistent cache of bibliography lookups (title/author -> DOI, DOI -> bibtex, DOI -> abstract and DOI -> works record),
+    stored in a SQLite database shared by every run and process:
+
+        <cache_dir>/bib_cache.sqlite3
+
+    Lookups that returned nothing are cached as negative results (with a shorter TTL),
+    so references that can't be resolved aren't requested again on every run.
+    """
+    def __init__(self, settings: BibCacheSettings):
+        self.settings = settings
+        os.makedirs(settings.cache_dir, exist_ok=True)
+        self.path = os.path.join(settings.cache_dir, "bib_cache.sqlite3")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                               "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, created REAL NOT NULL, "
+                               "PRIMARY KEY (namespace, key))")
+
+        # hits, negative hits and misses of this process, per namespace
+        self._stats: dict[str, dict[str, int]] = {}
+
+    @staticmethod
+    def query_key(*parts: Optional[str]) -> str:
+        """
+        Normalize lookup terms (e.g. title and author) into a cache key
+        """
+        return "\x1f".join(re.sub(r"\s+", " ", part or "").strip().lower() for part in parts)
+
+    def _count(self, namespace: str, stat: str):
+        ns_stats = self._stats.setdefault(namespace, {"hits": 0, "negative_hits": 0, "misses": 0})
+        ns_stats[stat] += 1
+
+    def get(self, namespace: str, key: str) -> Any:
+        """
+        Get a cached value, None for a cached negative result, or MISS if there is no valid entry
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM entries WHERE namespace = ? AND key = ?",
+                                     (namespace, key)).fetchone()
+            if row is not None:
+                value, created = row
+                ttl_days = self.settings.ttl_days if value is not None else self.settings.negative_ttl_days
+                if time() - created <= ttl_days * 86400:
+                    self._count(namespace, "hits" if value is not None else "negative_hits")
+                    return json.loads(value) if value is not None else None
+
+            self._count(namespace, "misses")
+            return MISS
+
+    def set(self, namespace: str, key: str, value: Any):
+        """
+        Store a value, or a negative result if value is None
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO entries (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                               (namespace, key, json.dumps(value) if value is not None else None, time()))
+
+    def purge_expired(self) -> int:
+        """
+        Delete expired entries, returning how many were removed
+        """
+        now = time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM entries WHERE (value IS NOT NULL AND created < ?) OR (value IS NULL AND created < ?)",
+                                        (now - self.settings.ttl_days * 86400, now - self.settings.negative_ttl_days * 86400))
+            return cursor.rowcount
+
+    def entry_counts(self) -> dict[str, dict[str, int]]:
+        """
+        Number of stored entries per namespace, split between found values and negative results
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT namespace, value IS NULL, COUNT(*) FROM entries GROUP BY namespace, value IS NULL").fetchall()
+        counts: dict[str, dict[str, int]] = {}
+        for namespace, negative, count in rows:
+            counts.setdefault(namespace, {"found": 0, "negative": 0})["negative" if negative else "found"] = count
+        return counts
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Hits, negative hits, misses and hit rate of each namespace in this process
+        """
+        stats = {}
+        for namespace, ns_stats in self._stats.items():
+            lookups = sum(ns_stats.values())
+            hit_rate = (ns_stats["hits"] + ns_stats["negative_hits"]) / lookups if lookups else 0.0
+            stats[namespace] = {**ns_stats, "hit_rate": hit_rate}
+        return stats
+
+    def summary(self) -> str:
+        return ", ".join(f"{namespace}: {s['hit_rate']:.0%} hit rate ({s['hits']} hits, {s['negative_hits']} negative, {s['misses']} misses)"
+                         for namespace, s in self.stats().items()) or "no lookups"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# process-wide cache used by the bibliography lookups in utils.helpers
+_bib_cache_settings = BibCacheSettings(cache_dir=None)
+_bib_cache: Optional[BibCache] = None
+_bib_cache_configured = False
+_bib_cache_lock = threading.Lock()
+
+def configure_bib_cache(settings: BibCacheSettings):
+    """
+    Set the bibliography cache used by this process (settings.cache_dir = None disables it)
+    """
+    global _bib_cache_settings, _bib_cache, _bib_cache_configured
+    with _bib_cache_lock:
+        if _bib_cache is not None:
+            _bib_cache.close()
+        _bib_cache_settings = settings
+        _bib_cache = None
+        _bib_cache_configured = True
+
+def _ensure_configured():
+    global _bib_cache_settings, _bib_cache_configured
+    if not _bib_cache_configured:
+        from .helpers import default_cache_dir
+        _bib_cache_settings = BibCacheSettings(cache_dir=os.path.join(default_cache_dir(), "bib"))
+        _bib_cache_configured = True
+
+def bib_cache_settings() -> BibCacheSettings:
+    """
+    Settings of this process bibliography cache, e.g. to configure worker processes the same way
+    """
+    with _bib_cache_lock:
+        _ensure_configured()
+        return _bib_cache_settings
+
+def get_bib_cache() -> Optional[BibCache]:
+    """
+    Get the process-wide bibliography cache, opening it on first use.
+    If it was never configured, the default cache directory is used.
+    Returns None if the cache is disabled or can't be opened.
+    """
+    global _bib_cache, _bib_cache_settings
+    with _bib_cache_lock:
+        _ensure_configured()
+        if _bib_cache is None and _bib_cache_settings.cache_dir:
+            try:
+                _bib_cache = BibCache(_bib_cache_settings)
+            except (OSError, sqlite3.Error) as e:
+                global_log("(BibCache) unable to open bibliography cache, disabling it:", e)
+                _bib_cache_settings = BibCacheSettings(cache_dir=None)
+        return _bib_cache
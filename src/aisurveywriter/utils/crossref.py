@@ -0,0 +1,409 @@
+from typing import List, Optional, Iterable, Literal
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel
+from time import sleep
+import threading
+import random
+import html
+import os
+import re
+
+import requests
+from requests.adapters import HTTPAdapter
+import bibtexparser
+from bibtexparser.bparser import BibTexParser
+
+from .bib_cache import get_bib_cache, BibCache, MISS, DOI_NS, BIBTEX_NS, ABSTRACT_NS, WORK_NS
+from .rate_limit import RateLimiter
+from .logger import named_log
+
+# base URLs, overridable to point the resolver to a mirror or a local fake server
+CROSSREF_API_URL = os.environ.get("AISURVEYWRITER_CROSSREF_URL", "https://api.crossref.org")
+DOI_URL = os.environ.get("AISURVEYWRITER_DOI_URL", "https://doi.org")
+
+# responses worth retrying: rate limited and server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# fields of the works record needed to build a bibtex entry
+WORK_FIELDS = ["DOI", "type", "title", "author", "editor", "container-title", "issued", "published",
+               "published-print", "volume", "issue", "page", "publisher", "ISBN", "URL", "abstract"]
+
+# CrossRef work type -> bibtex entry type
+WORK_ENTRY_TYPES = {
+    "journal-article": "article",
+    "proceedings-article": "inproceedings",
+    "book-chapter": "incollection",
+    "book-part": "incollection",
+    "book-section": "incollection",
+    "book": "book",
+    "edited-book": "book",
+    "monograph": "book",
+    "reference-book": "book",
+    "dissertation": "phdthesis",
+    "report": "techreport",
+    "posted-content": "misc",
+}
+
+def clean_jats_abstract(abstract: str) -> str:
+    """
+    Convert a JATS XML abstract (as returned by CrossRef) to plain text
+    """
+    abstract = re.sub(r'<jats:p>|<\/jats:p>', '\n', abstract)
+    abstract = re.sub(r'<[^>]*>', ' ', abstract)
+    return html.unescape(abstract)
+
+def _work_year(work: dict) -> Optional[str]:
+    for key in ["issued", "published-print", "published"]:
+        date_parts = work.get(key, {}).get("date-parts") or [[]]
+        if date_parts[0] and date_parts[0][0]:
+            return str(date_parts[0][0])
+    return None
+
+def _work_people(people: List[dict]) -> str:
+    names = []
+    for person in people:
+        if person.get("family"):
+            names.append(f"{person['family']}, {person['given']}" if person.get("given") else person["family"])
+        elif person.get("name"):
+            names.append(person["name"])
+    return " and ".join(names)
+
+def work_to_bibtex_entry(work: dict) -> Optional[dict]:
+    """
+    Build a bibtex entry (bibtexparser dict) from a CrossRef works record, with the same
+    conventions as the entries built from DOI content negotiation (ID, link, authors joined
+    by "and", plain text abstract). Returns None if the record lacks a DOI, title or authors.
+    """
+    doi = work.get("DOI")
+    title = (work.get("title") or [None])[0]
+    authors = _work_people(work.get("author", []))
+    if not doi or not title or not authors:
+        return None
+
+    entry_type = WORK_ENTRY_TYPES.get(work.get("type"), "misc")
+    entry = {"ENTRYTYPE": entry_type, "ID": doi.split('/')[-1], "title": title, "author": authors, "doi": doi,
+             "url": work.get("URL") or f"https://doi.org/{doi}"}
+
+    container = (work.get("container-title") or [None])[0]
+    if container:
+        entry["journal" if entry_type == "article" else "booktitle"] = container
+    fields = {"year": _work_year(work), "volume": work.get("volume"), "number": work.get("issue"),
+              "pages": work.get("page"), "publisher": work.get("publisher"),
+              "editor": _work_people(work.get("editor", [])), "isbn": (work.get("ISBN") or [None])[0]}
+    entry.update({key: value for key, value in fields.items() if value})
+
+    entry['link'] = f'https://doi.org/{doi}'
+    if work.get("abstract"):
+        entry['abstract'] = clean_jats_abstract(work["abstract"])
+    return entry
+
+class CrossrefSettings(BaseModel):
+    # number of references resolved at the same time
+    max_workers: int = 8
+    # requests per second over all workers (CrossRef asks polite clients to stay well below 50/s)
+    requests_per_second: float = 10.0
+    # retries of a request answered with 429/5xx or failing to connect, with exponential backoff
+    max_retries: int = 5
+    backoff_base_sec: float = 1.0
+    backoff_max_sec: float = 60.0
+    timeout_sec: float = 30.0
+    # "works": build the entry from a single CrossRef works query (DOI content negotiation only as fallback)
+    # "negotiation": CrossRef search, then doi.org content negotiation, then the works record for the abstract
+    mode: Literal["works", "negotiation"] = "negotiation"
+    # contact e-mail sent to CrossRef to use its "polite" pool
+    mailto: Optional[str] = os.environ.get("AISURVEYWRITER_CROSSREF_MAILTO")
+
+    crossref_url: str = CROSSREF_API_URL
+    doi_url: str = DOI_URL
+
+class CrossrefResolver:
+    """
+    Resolves references (title and authors) to bibtex entries through CrossRef and DOI
+    content negotiation. A single HTTP session (connection pool) and rate limiter are
+    shared by every worker thread, and results go through the bibliography cache.
+    """
+    def __init__(self, settings: Optional[CrossrefSettings] = None):
+        self.settings = settings or CrossrefSettings()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, self.settings.max_workers))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        if self.settings.mailto:
+            self._session.headers["User-Agent"] = f"aisurveywriter (mailto:{self.settings.mailto})"
+
+        self._limiter = RateLimiter(self.settings.requests_per_second, burst=max(1, self.settings.max_workers))
+
+    def _get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None) -> Optional[requests.Response]:
+        """
+        GET with rate limiting and exponential backoff on 429/5xx and connection errors.
+        Returns the last response (or None if it never connected) once retries are exhausted
+        """
+        response = None
+        for attempt in range(self.settings.max_retries + 1):
+            self._limiter.acquire()
+            try:
+                response = self._session.get(url, params=params, headers=headers, timeout=self.settings.timeout_sec)
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                reason = f"status {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry_after = None
+                reason = repr(e)
+
+            if attempt == self.settings.max_retries:
+                break
+
+            # jitter keeps concurrent workers from retrying in lockstep
+            delay = min(self.settings.backoff_max_sec, self.settings.backoff_base_sec * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            named_log(self, f"request to {url} failed ({reason}), retrying in {delay:.1f} s ({attempt+1}/{self.settings.max_retries})")
+            sleep(delay)
+
+        return response
+
+    def search_doi(self, title: Optional[str], author: Optional[str]) -> Optional[str]:
+        """
+        Search CrossRef API using title and author to retrieve the DOI.
+        Results (including not found) are stored in the bibliography cache.
+        """
+        bib_cache = get_bib_cache()
+        cache_key = BibCache.query_key(title, author)
+        if bib_cache and (doi := bib_cache.get(DOI_NS, cache_key)) is not MISS:
+            return doi
+
+        params = {"rows": 1}
+        if title:
+            params["query.title"] = title
+        if author:
+            params["query.author"] = author
+        if self.settings.mailto:
+            params["mailto"] = self.settings.mailto
+        response = self._get(f"{self.settings.crossref_url}/works", params=params)
+        if response is not None and response.status_code == 200:
+            items = response.json().get("message", {}).get("items", [])
+            doi = items[0].get("DOI") if items else None
+            if bib_cache:
+                bib_cache.set(DOI_NS, cache_key, doi)
+            return doi
+        return None
+
+    def get_bibtext(self, doi: str) -> Optional[str]:
+        """
+        Use DOI Content Negotiation to retrieve a string with the bibtex entry.
+        """
+        bib_cache = get_bib_cache()
+        if bib_cache and (bibtext := bib_cache.get(BIBTEX_NS, doi)) is not MISS:
+            return bibtext
+
+        response = self._get(f"{self.settings.doi_url}/{doi}", headers={"Accept": "application/x-bibtex"})
+        if response is not None and response.status_code == 200:
+            bibtext = response.text
+            if bib_cache:
+                bib_cache.set(BIBTEX_NS, doi, bibtext)
+            return bibtext
+        if response is not None and response.status_code == 404 and bib_cache:
+            bib_cache.set(BIBTEX_NS, doi, None)
+        return None
+
+    def get_abstract(self, doi: str) -> Optional[str]:
+        """
+        Retrieve the abstract of a paper using the CrossRef API.
+        """
+        bib_cache = get_bib_cache()
+        if bib_cache and (abstract := bib_cache.get(ABSTRACT_NS, doi)) is not MISS:
+            return abstract
+
+        params = {"mailto": self.settings.mailto} if self.settings.mailto else None
+        response = self._get(f"{self.settings.crossref_url}/works/{doi}", params=params)
+        if response is None or response.status_code != 200:
+            raise Exception(f"Erro ao acessar API: {response.status_code if response is not None else 'no response'}")
+
+        match = re.search(r'(?<="abstract":").*?(?=","DOI")', response.text)
+        if not match:
+            if bib_cache:
+                bib_cache.set(ABSTRACT_NS, doi, None)
+            return None
+
+        abstract = clean_jats_abstract(match.group(0))
+
+        if bib_cache:
+            bib_cache.set(ABSTRACT_NS, doi, abstract)
+        return abstract
+
+    def search_work(self, title: Optional[str], author: Optional[str]) -> Optional[dict]:
+        """
+        Search CrossRef API using title and author, returning the works record of the best match
+        with only the fields needed for a bibtex entry (WORK_FIELDS).
+        Results (including not found) are stored in the bibliography cache.
+        """
+        bib_cache = get_bib_cache()
+        cache_key = BibCache.query_key(title, author)
+        if bib_cache and (doi := bib_cache.get(DOI_NS, cache_key)) is not MISS:
+            if doi is None:
+                return None
+            # the DOI may be known from a previous lookup without its record
+            return self.get_work(doi)
+
+        params = {"rows": 1, "select": ",".join(WORK_FIELDS)}
+        if title:
+            params["query.title"] = title
+        if author:
+            params["query.author"] = author
+        if self.settings.mailto:
+            params["mailto"] = self.settings.mailto
+        response = self._get(f"{self.settings.crossref_url}/works", params=params)
+        if response is None or response.status_code != 200:
+            return None
+
+        items = response.json().get("message", {}).get("items", [])
+        work = items[0] if items and items[0].get("DOI") else None
+        if bib_cache:
+            bib_cache.set(DOI_NS, cache_key, work["DOI"] if work else None)
+            if work:
+                bib_cache.set(WORK_NS, work["DOI"], work)
+        return work
+
+    def get_work(self, doi: str) -> Optional[dict]:
+        """
+        Get the works record (WORK_FIELDS) of a DOI. Results (including unknown DOIs)
+        are stored in the bibliography cache.
+        """
+        bib_cache = get_bib_cache()
+        if bib_cache and (work := bib_cache.get(WORK_NS, doi)) is not MISS:
+            return work
+
+        params = {"mailto": self.settings.mailto} if self.settings.mailto else None
+        response = self._get(f"{self.settings.crossref_url}/works/{doi}", params=params)
+        if response is None or response.status_code != 200:
+            if response is not None and response.status_code == 404 and bib_cache:
+                bib_cache.set(WORK_NS, doi, None)
+            return None
+
+        message = response.json().get("message", {})
+        work = {key: message[key] for key in WORK_FIELDS if key in message}
+        if bib_cache:
+            bib_cache.set(WORK_NS, doi, work)
+        return work
+
+    def get_bibtex_entry(self, title: Optional[str], author: Optional[str]) -> Optional[dict]:
+        """
+        Retrieve BibTeX entry using title and author.
+        """
+        if self.settings.mode == "works":
+            work = self.search_work(title, author)
+            if not work:
+                print(f"DOI not found for given title and author: {title}. {author}")
+                return None
+            return self._entry_from_work(work)
+        
+        doi = self.search_doi(title, author)
+        if not doi:
+            print(f"DOI not found for given title and author: {title}. {author}")
+            return None
+        return self._entry_from_negotiation(doi)
+
+    def get_bibtex_entry_by_doi(self, doi: str) -> Optional[dict]:
+        """
+        Retrieve BibTeX entry of a known DOI (e.g. printed in a bibliography), without searching
+        """
+        if self.settings.mode == "works":
+            work = self.get_work(doi)
+            if not work:
+                print(f"DOI not found: {doi}")
+                return None
+            return self._entry_from_work(work)
+        return self._entry_from_negotiation(doi)
+
+    def _entry_from_work(self, work: dict) -> Optional[dict]:
+        if entry := work_to_bibtex_entry(work):
+            return entry
+        # record too incomplete to build the entry locally
+        return self._entry_from_negotiation(work["DOI"])
+
+    def _entry_from_negotiation(self, doi: str) -> Optional[dict]:
+        bibtext = self.get_bibtext(doi)
+        if not bibtext:
+            print("BibTeX entry not found.")
+            return None
+
+        parser = BibTexParser()
+        parser.ignore_nonstandard_types = False
+        bibdb = bibtexparser.loads(bibtext, parser)
+        entry, = bibdb.entries
+        entry['link'] = f'https://doi.org/{doi}'
+
+        if 'author' in entry:
+            entry['author'] = ' and '.join(entry['author'].rstrip(';').split('; '))
+
+        entry['ID'] = doi.split('/')[-1]
+
+        # Retrieve and add abstract
+        abstract = self.get_abstract(doi)
+        if abstract:
+            entry['abstract'] = abstract
+
+        return entry
+
+    def resolve_many(self, queries: Iterable[tuple[Optional[str], Optional[str]]]) -> List[Optional[dict] | Exception]:
+        """
+        Resolve (title, author) queries concurrently with up to settings.max_workers threads.
+        Results are in the same order as the queries: the bibtex entry, None if it was not
+        found, or the exception raised while resolving it
+        """
+        return self._map(lambda query: self.get_bibtex_entry(*query), queries)
+
+    def resolve_dois(self, dois: Iterable[str]) -> List[Optional[dict] | Exception]:
+        """
+        Same as resolve_many, for known DOIs
+        """
+        return self._map(self.get_bibtex_entry_by_doi, dois)
+
+    def _map(self, func, items: Iterable) -> list:
+        def call(item):
+            try:
+                return func(item)
+            except Exception as e:
+                return e
+
+        items = list(items)
+        if self.settings.max_workers <= 1 or len(items) <= 1:
+            return [call(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=self.settings.max_workers) as executor:
+            return list(executor.map(call, items))
+
+    def close(self):
+        self._session.close()
+
+
+# process-wide resolver used by the bibliography lookups in utils.helpers
+_crossref_settings = CrossrefSettings()
+_crossref_resolver: Optional[CrossrefResolver] = None
+_crossref_lock = threading.Lock()
+
+def configure_crossref(settings: CrossrefSettings):
+    """
+    Set the settings of the CrossRef resolver used by this process
+    """
+    global _crossref_settings, _crossref_resolver
+    with _crossref_lock:
+        if _crossref_resolver is not None:
+            _crossref_resolver.close()
+        _crossref_settings = settings
+        _crossref_resolver = None
+
+def crossref_settings() -> CrossrefSettings:
+    return _crossref_settings
+
+def get_crossref_resolver() -> CrossrefResolver:
+    """
+    Get the process-wide CrossRef resolver, creating it on first use
+    """
+    global _crossref_resolver
+    with _crossref_lock:
+        if _crossref_resolver is None:
+            _crossref_resolver = CrossrefResolver(_crossref_settings)
+        return _crossref_resolver
@@ -4,20 +4,18 @@ import os
 from pathlib import Path
 import undetected_chromedriver as uc
 from fake_useragent import UserAgent
-import requests
 import bibtexparser
-from bibtexparser.bparser import BibTexParser
 from bibtexparser.bibdatabase import BibDatabase
-import re
-import html
 import base64
 from io import BytesIO
 from PIL import Image
 import random
 import string
+import hashlib
 import yaml
 from pydantic import BaseModel
 
+from .crossref import get_crossref_resolver
 
 def load_pydantic_yaml(path: str, model: BaseModel):
     """
@@ -32,6 +30,20 @@ def save_pydantic_yaml(obj: BaseModel, path: str):
     with open(path, "w", encoding="utf-8") as file:
         yaml.safe_dump(obj.model_dump(), file, allow_unicode=True)
 
+def default_cache_dir() -> str:
+    """
+    Directory shared by all on-disk caches. Can be overriden with the
+    AISURVEYWRITER_CACHE_DIR environment variable.
+    """
+    return os.environ.get("AISURVEYWRITER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "aisurveywriter"))
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            sha.update(chunk)
+    return sha.hexdigest()
+
 def is_pdf(path: str) -> bool:
     with open(path, "rb") as f:
         header = f.read(4)
@@ -116,90 +128,34 @@ def get_all_files_from_paths(*args, skip_ext: List[str] = None, stem_sort=False,
 def search_crossref(title, author):
     """
     Search CrossRef API using title and author to retrieve the DOI.
+    Results (including not found) are stored in the bibliography cache.
     """
-    url = "https://api.crossref.org/works"
-    params = {"rows": 1}
-    if title:
-        params["query.title"] = title
-    if author:
-        params["query.author"] = author
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        items = data.get("message", {}).get("items", [])
-        if items:
-            return items[0].get("DOI")
-    return None
-
-def get_bibtext(doi, cache={}):
+    return get_crossref_resolver().search_doi(title, author)
+
+def get_bibtext(doi, cache: dict = None):
     """
     Use DOI Content Negotiation to retrieve a string with the bibtex entry.
+    Results are stored in the bibliography cache, and in "cache" if provided.
     """
-    if doi in cache:
+    if cache is not None and doi in cache:
         return cache[doi]
-    url = f'https://doi.org/{doi}'
-    headers = {'Accept': 'application/x-bibtex'}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        bibtext = response.text
+    bibtext = get_crossref_resolver().get_bibtext(doi)
+    if bibtext and cache is not None:
         cache[doi] = bibtext
-        return bibtext
-    return None
+    return bibtext
 
 def get_abstract(doi):
     """
     Retrieve the abstract of a paper using the CrossRef API.
+    Results (including papers without abstract) are stored in the bibliography cache.
     """
-    url = f"http://api.crossref.org/works/{doi}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(f"Erro ao acessar API: {response.status_code}")
-    
-    data = response.text
-    
-    match = re.search(r'(?<="abstract":").*?(?=","DOI")', data)
-    
-    if not match:
-        return None
-
-    abstract = match.group(0)
-    abstract = re.sub(r'<jats:p>|<\/jats:p>', '\n', abstract)
-    abstract = re.sub(r'<[^>]*>', ' ', abstract)
-    abstract = html.unescape(abstract)
-    
-    return abstract
-
-def get_bibtex_entry(title, author, bibtext_cache={}):
+    return get_crossref_resolver().get_abstract(doi)
+
+def get_bibtex_entry(title, author):
     """
     Retrieve BibTeX entry using title and author.
     """
-    doi = search_crossref(title, author)
-    if not doi:
-        print(f"DOI not found for given title and author: {title}. {author}")
-        return None
-    
-    bibtext = get_bibtext(doi, cache=bibtext_cache)
-    if not bibtext:
-        print("BibTeX entry not found.")
-        return None
-    
-    parser = BibTexParser()
-    parser.ignore_nonstandard_types = False
-    bibdb = bibtexparser.loads(bibtext, parser)
-    entry, = bibdb.entries
-    entry['link'] = f'https://doi.org/{doi}'
-    
-    if 'author' in entry:
-        entry['author'] = ' and '.join(entry['author'].rstrip(';').split('; '))
-    
-    entry['ID'] = doi.split('/')[-1]
-    
-    # Retrieve and add abstract
-    abstract = get_abstract(doi)
-    if abstract:
-        entry['abstract'] = abstract
-    
-    return entry
+    return get_crossref_resolver().get_bibtex_entry(title, author)
 
 def bib_entries_to_str(entries):
     """
@@ -0,0 +1,150 @@
+from typing import Optional
+from collections import deque
+from time import monotonic, sleep
+import threading
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows "rate" acquisitions per second on average,
+    with bursts of up to "burst" acquisitions
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = max(1, burst)
+
+        self._tokens = float(self.burst)
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1):
+        """
+        Block until "tokens" tokens are available and take them
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            sleep(wait)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        Take "tokens" tokens if they are available now, without blocking
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+
+class _WindowRequest:
+    __slots__ = ("time", "tokens")
+
+    def __init__(self, time: float, tokens: int):
+        self.time = time
+        self.tokens = tokens
+
+class RequestRateLimiter:
+    """
+    Thread-safe sliding window (one minute) limiter of requests per minute and tokens per minute,
+    as enforced by LLM providers. A request only blocks when it would exceed one of the budgets.
+
+    The tokens of a request are reserved with an estimate when it starts (acquire) and corrected
+    with the actual usage when it finishes (record).
+    """
+    WINDOW_SEC = 60.0
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._window: deque[_WindowRequest] = deque()
+        self._window_tokens = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._window and now - self._window[0].time >= self.WINDOW_SEC:
+            self._window_tokens -= self._window.popleft().tokens
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        if not self._window:
+            return 0
+        if self.requests_per_minute and len(self._window) + 1 > self.requests_per_minute:
+            return self._window[0].time + self.WINDOW_SEC - now
+        if self.tokens_per_minute and self._window_tokens + tokens > self.tokens_per_minute:
+            # wait until enough of the oldest requests leave the window
+            excess = self._window_tokens + tokens - self.tokens_per_minute
+            for request in self._window:
+                excess -= request.tokens
+                if excess <= 0:
+                    return request.time + self.WINDOW_SEC - now
+            return self._window[-1].time + self.WINDOW_SEC - now
+        return 0
+
+    def acquire(self, tokens: int = 0) -> _WindowRequest:
+        """
+        Block until a request of (an estimated) "tokens" tokens fits in the budgets, and reserve it.
+        Returns the reservation, to be passed to record() with the actual usage.
+        """
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    request = _WindowRequest(now, tokens)
+                    self._window.append(request)
+                    self._window_tokens += tokens
+                    return request
+            sleep(wait)
+
+    def record(self, request: _WindowRequest, tokens: int):
+        """
+        Replace the estimated tokens of a request with its actual usage
+        """
+        with self._lock:
+            if request in self._window:
+                self._window_tokens += tokens - request.tokens
+            request.tokens = tokens
+
+    def usage(self) -> tuple[int, int]:
+        """
+        (requests, tokens) in the current window
+        """
+        with self._lock:
+            self._prune(monotonic())
+            return len(self._window), self._window_tokens
+
+
+# process-wide limiters, one for each (provider, model): every handler of the same model shares its budgets
+_request_limiters: dict[tuple[str, str], RequestRateLimiter] = {}
+_request_limiters_lock = threading.Lock()
+
+def get_request_rate_limiter(provider: str, model: str, requests_per_minute: Optional[float] = None,
+                             tokens_per_minute: Optional[int] = None) -> Optional[RequestRateLimiter]:
+    """
+    The limiter shared by every request to this provider and model, with the given budgets
+    (updating them if it already exists). None if no budget is given.
+    """
+    if not requests_per_minute and not tokens_per_minute:
+        return None
+    key = (provider.strip().lower(), model.strip().lower())
+    with _request_limiters_lock:
+        limiter = _request_limiters.get(key)
+        if limiter is None:
+            limiter = _request_limiters[key] = RequestRateLimiter(requests_per_minute, tokens_per_minute)
+        else:
+            limiter.requests_per_minute = requests_per_minute
+            limiter.tokens_per_minute = tokens_per_minute
+        return limiter